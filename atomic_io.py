@@ -0,0 +1,137 @@
+import os
+import json
+import stat
+import time
+import shutil
+import socket
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: locks are no-ops
+    fcntl = None
+
+# ---------- config ----------
+LOCK_DIR = ".locks"             # per-scene advisory lock files, one per stage
+SCRATCH_PREFIX = ".scratch-"    # per-run scratch folders inside a scene
+LOCK_POLL_S = 0.2
+
+# ---------- atomic outputs ----------
+def _umask() -> int:
+    # read once at import: os.umask can only be queried by setting it, which is not thread-safe
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+UMASK = _umask()
+
+def fsync_dir(path):
+    """Persist a rename in `path` (no-op where directories cannot be opened)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_path(path, suffix=None):
+    """
+    Yield a unique temporary path next to `path` for a writer that needs a file name (np.savez, cv2.imwrite).
+    On success the file is fsynced and renamed over `path`; on error it is removed and `path` is untouched.
+    suffix defaults to the extension of `path`, so writers that pick a format from it keep working.
+    """
+    path = os.fspath(path)
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp" + (os.path.splitext(path)[1] if suffix is None else suffix), dir=folder)
+    os.close(fd)
+    try:
+        yield tmp
+        with open(tmp, "rb+") as f:
+            os.fsync(f.fileno())
+        # mkstemp creates 0600: give the output the mode of the file it replaces, else the umask default
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~UMASK
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    fsync_dir(folder)
+
+@contextmanager
+def atomic_write(path, mode="w", encoding="utf-8", newline=None):
+    """open() replacement for outputs: readers see the old file or the complete new one, never a partial write."""
+    with atomic_path(path, suffix="") as tmp:
+        with open(tmp, mode, **({} if "b" in mode else {"encoding": encoding, "newline": newline})) as f:
+            yield f
+            f.flush()
+
+def write_text_atomic(path, text: str):
+    with atomic_write(path) as f:
+        f.write(text)
+
+def write_json_atomic(path, obj, indent=2, **dump_kwargs):
+    write_text_atomic(path, json.dumps(obj, indent=indent, **dump_kwargs) + "\n")
+
+def check_writable(path):
+    """Raise OSError if no file can be created next to `path` (without touching `path` itself)."""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".write-check.", dir=folder)
+    os.close(fd)
+    os.unlink(tmp)
+
+# ---------- locks ----------
+@contextmanager
+def file_lock(path, timeout=None):
+    """
+    Exclusive advisory lock (flock) on `path`, created if needed. Waits up to `timeout` seconds
+    (forever if None) and raises TimeoutError after that. Released when the holder exits or dies.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        holder = os.pread(fd, 256, 0).decode("utf-8", "replace").strip() or "unknown"
+                        raise TimeoutError(f"{path} is held by {holder}")
+                    time.sleep(LOCK_POLL_S)
+            # who holds it, for the timeout message of the next waiter
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, f"pid {os.getpid()} on {socket.gethostname()}\n".encode(), 0)
+        yield path
+    finally:
+        os.close(fd)
+
+def stage_lock(scene_dir, stage: str, timeout=None):
+    """One writer per (scene, stage): SCENE/.locks/<stage>.lock."""
+    return file_lock(Path(scene_dir) / LOCK_DIR / f"{stage}.lock", timeout)
+
+# ---------- scratch ----------
+@contextmanager
+def scratch_dir(parent, tag: str = "tmp", keep: bool = False):
+    """A private temporary folder inside `parent` (same filesystem, so results can be renamed out of it)."""
+    path = Path(tempfile.mkdtemp(prefix=f"{SCRATCH_PREFIX}{tag}-", dir=parent))
+    try:
+        yield path
+    finally:
+        if not keep:
+            shutil.rmtree(path, ignore_errors=True)
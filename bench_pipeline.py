@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import math
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from atomic_io import write_json_atomic
+from colmap_model import write_cameras_binary, write_cameras_text, write_images_binary, write_images_text
+from telemetry import ENV_LOG, Telemetry, load_records
+
+# ---------- config ----------
+HERE = Path(__file__).resolve().parent
+SIZES = [100, 1000, 5000]
+RESULTS_NAME = "bench_results.json"
+BASELINE_NAME = "bench_baseline.json"
+SCENE_DATE = "010125"
+TOLERANCE = 0.5          # flag a phase more than 50% slower than the baseline
+MIN_WALL_S = 0.05        # ... unless both runs are below this (noise)
+MAX_EXPONENT_GROWTH = 0.25
+
+# ---------- synthetic scene ----------
+def look_at_w2c(center, target, up=(0.0, 0.0, 1.0)):
+    """COLMAP world-to-camera (qvec wxyz, tvec) of a camera at center looking at target (x right, y down, z forward)."""
+    z = target - center
+    z /= np.linalg.norm(z)
+    x = np.cross(z, up)
+    x /= np.linalg.norm(x)
+    y = np.cross(z, x)
+    R = np.stack([x, y, z])   # rows: camera axes in world coordinates
+    return rotmat2qvec(R), -R @ center
+
+def rotmat2qvec(R):
+    """Rotation matrix -> unit quaternion (w, x, y, z) with w >= 0."""
+    w = math.sqrt(max(0.0, 1.0 + R[0, 0] + R[1, 1] + R[2, 2])) / 2
+    x = math.copysign(math.sqrt(max(0.0, 1.0 + R[0, 0] - R[1, 1] - R[2, 2])) / 2, R[2, 1] - R[1, 2])
+    y = math.copysign(math.sqrt(max(0.0, 1.0 - R[0, 0] + R[1, 1] - R[2, 2])) / 2, R[0, 2] - R[2, 0])
+    z = math.copysign(math.sqrt(max(0.0, 1.0 - R[0, 0] - R[1, 1] + R[2, 2])) / 2, R[1, 0] - R[0, 1])
+    q = np.array([w, x, y, z])
+    return q / np.linalg.norm(q)
+
+def random_rig(n, rng, radius=4.0):
+    """n cameras on a noisy ring around the origin, all looking near the origin."""
+    qvecs, tvecs = np.empty((n, 4)), np.empty((n, 3))
+    for k in range(n):
+        a = 2 * math.pi * k / n + rng.normal(0, 0.02)
+        center = np.array([radius * math.cos(a), radius * math.sin(a), 1.0 + rng.normal(0, 0.3)])
+        qvecs[k], tvecs[k] = look_at_w2c(center, rng.normal(0, 0.2, 3))
+    return qvecs, tvecs
+
+def dummy_jpeg(width, height, rng, quality=90) -> bytes:
+    """A noisy gradient so the sharpness score has something to measure."""
+    import cv2
+    grad = np.linspace(0, 200, width, dtype=np.float32)[None, :, None]
+    img = np.clip(grad + rng.normal(0, 25, (height, width, 3)), 0, 255).astype(np.uint8)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return buf.tobytes()
+
+def synth_scene(root: Path, frames: int, width: int = 320, height: int = 240, points: int = 200,
+                variants: int = 8, seed: int = 0) -> Path:
+    """
+    Build root/<date>-SynthN/ with the capture layout (SynthN-Clean/images, SynthN-Clutter/images, half the
+    frames each) and the COLMAP output of SynthN-All (undistortion_images linked like make_all.py names them,
+    undistortion_sparse/0 in both .bin and .txt). Returns the BASE folder.
+    """
+    rng = np.random.default_rng(seed)
+    name = f"Synth{frames}"
+    base = root / f"{SCENE_DATE}-{name}"
+    if base.exists():
+        shutil.rmtree(base)
+    scene = base / f"{base.name}-All"
+    und = scene / "undistortion_images"
+    model = scene / "undistortion_sparse" / "0"
+    for d in (base / f"{base.name}-Clean" / "images", base / f"{base.name}-Clutter" / "images", und, model):
+        d.mkdir(parents=True)
+
+    # a few distinct images reused round-robin: content does not matter, decode cost does
+    jpegs = [dummy_jpeg(width, height, rng) for _ in range(variants)]
+    names = []
+    for k in range(frames):
+        kind, prefix = ("Clutter", "clutter_") if k % 2 else ("Clean", "extra_")
+        src = base / f"{base.name}-{kind}" / "images" / f"IMG_{k:05d}.jpg"
+        src.write_bytes(jpegs[k % variants])
+        os.link(src, und / f"{prefix}{src.name}")
+        names.append(f"{prefix}{src.name}")
+
+    qvecs, tvecs = random_rig(frames, rng)
+    images = {
+        "image_ids": np.arange(1, frames + 1),
+        "qvecs": qvecs,
+        "tvecs": tvecs,
+        "camera_ids": np.ones(frames, dtype=np.int64),
+        "names": names,
+    }
+    f = 0.9 * width
+    cameras = {1: ("OPENCV", width, height, (f, f, width / 2, height / 2, 0.01, -0.02, 0.001, 0.001))}
+    obs = [np.column_stack([rng.uniform(0, width, points), rng.uniform(0, height, points),
+                            rng.integers(-1, 10 * points, points)]) for _ in range(frames)]
+    write_cameras_binary(model / "cameras.bin", cameras)
+    write_images_binary(model / "images.bin", images, obs)
+    write_cameras_text(model / "cameras.txt", cameras)
+    write_images_text(model / "images.txt", images, obs)
+    for fn in ("points3D.bin", "points3D.txt"):
+        (model / fn).write_bytes(b"\x00" * 8 if fn.endswith(".bin") else b"")
+    return base
+
+# ---------- stages ----------
+def stage_commands(root: Path, base: Path, model_formats) -> list:
+    """(label, command, cleanup) of every timed stage, in pipeline order; every run does the full work."""
+    py = sys.executable
+    scene = base / f"{base.name}-All"
+    model = scene / "undistortion_sparse" / "0"
+    cmds = [("make_all", [py, str(HERE / "make_all.py"), str(base), "--force"],
+             lambda: shutil.rmtree(scene / "images", ignore_errors=True))]
+    for fmt in model_formats:
+        cmds.append((f"colmap2nerf[{fmt}]",
+                     [py, str(HERE / "colmap2nerf.py"), "--images", str(scene / "undistortion_images"),
+                      "--text", str(model), "--model_format", fmt, "--out", str(scene / "transforms.json"),
+                      "--aabb_scale", "32", "--force", "--no_sharpness_cache"], None))
+    cmds += [
+        ("make_split", [py, str(HERE / "make_split.py"), str(scene), "--force"], None),
+        ("create_meta_data", [py, str(HERE / "create_meta_data.py"), str(root), "--all", "--force"], None),
+        ("check_num_poses", [py, str(HERE / "check_num_poses.py"), str(root), "--no_cache", "--plot", "none"], None),
+    ]
+    return cmds
+
+def run_stage(label: str, cmd: list, cleanup, log_path: Path, repeat: int) -> dict:
+    """
+    Run a stage `repeat` times with its telemetry routed to log_path; returns {phase: best wall_s}.
+    "process" is the wall time of the whole command, the other phases come from the stage itself.
+    """
+    best = {}
+    env = dict(os.environ, **{ENV_LOG: str(log_path)})
+    for _ in range(repeat):
+        if cleanup:
+            cleanup()
+        log_path.unlink(missing_ok=True)
+        out_path = log_path.with_name(f"bench_{label}.log")
+        with open(out_path, "w") as out:
+            ret = Telemetry(log_path, None, label).run(cmd, "process", cwd=HERE, env=env,
+                                                       stdout=out, stderr=subprocess.STDOUT)
+        if ret != 0:
+            raise RuntimeError(f"{label} failed (exit {ret}), see {out_path}: {' '.join(cmd)}")
+        for r in load_records([log_path]):
+            best[r["phase"]] = min(best.get(r["phase"], math.inf), r["wall_s"])
+    return best
+
+# ---------- compare ----------
+def scaling_exponents(results: dict) -> dict:
+    """key -> {"sizes": [n0, n1], "b": b} with wall ~ frames^b between the two largest sizes that have the key."""
+    sizes = sorted(results, key=int)
+    out = {}
+    for key in {k for r in results.values() for k in r}:
+        have = [s for s in sizes if results[s].get(key, 0) > 0]
+        if len(have) >= 2:
+            s0, s1 = have[-2], have[-1]
+            b = math.log(results[s1][key] / results[s0][key]) / math.log(int(s1) / int(s0))
+            out[key] = {"sizes": [int(s0), int(s1)], "b": round(b, 3)}
+    return out
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Regressions of current against baseline: slower phases at equal size, and worse scaling exponents
+    measured between the same two sizes (fixed start-up costs make exponents of other pairs incomparable).
+    """
+    found = []
+    for size, phases in current["results"].items():
+        for key, wall in sorted(phases.items()):
+            ref = baseline["results"].get(size, {}).get(key)
+            if ref is None or max(ref, wall) < MIN_WALL_S:
+                continue
+            if wall > ref * (1 + tolerance):
+                found.append(f"{size:>6} frames  {key}: {wall:.3f}s vs {ref:.3f}s (x{wall / max(ref, 1e-9):.2f})")
+    for key, exp in sorted(current["exponents"].items()):
+        ref = baseline.get("exponents", {}).get(key)
+        if ref is None or ref["sizes"] != exp["sizes"]:
+            continue
+        if current["results"][str(exp["sizes"][1])][key] < MIN_WALL_S:
+            continue
+        if exp["b"] > ref["b"] + MAX_EXPONENT_GROWTH:
+            found.append(f"scaling  {key}: frames^{exp['b']} vs frames^{ref['b']} ({exp['sizes'][0]} -> {exp['sizes'][1]} frames)")
+    return found
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Time the pipeline stages on synthetic COLMAP scenes of growing size "
+                                             "and compare against a baseline file")
+    ap.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Frames per synthetic scene")
+    ap.add_argument("--width", type=int, default=320, help="Dummy JPEG width")
+    ap.add_argument("--height", type=int, default=240, help="Dummy JPEG height")
+    ap.add_argument("--points", type=int, default=200, help="2D observations per image in the model")
+    ap.add_argument("--model_formats", nargs="+", default=["bin", "txt"], choices=["bin", "txt"],
+                    help="Model formats colmap2nerf.py is timed on")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest is kept")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--work_dir", type=Path, default=None, help="Where the scenes are generated (default: a temp dir)")
+    ap.add_argument("--keep", action="store_true", help="Keep the generated scenes")
+    ap.add_argument("--out", type=Path, default=HERE / RESULTS_NAME, help="Results file")
+    ap.add_argument("--baseline", type=Path, default=HERE / BASELINE_NAME, help="Baseline to compare against")
+    ap.add_argument("--save_baseline", action="store_true", help="Write the results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed slowdown vs the baseline (0.5 = 50%%)")
+    args = ap.parse_args()
+
+    work = args.work_dir or Path(tempfile.mkdtemp(prefix="bench_"))
+    results = {}
+    try:
+        for n in sorted(args.sizes):
+            # one scene per dataset root, so create_meta_data/check_num_poses only see this size
+            root = work / f"n{n}"
+            root.mkdir(parents=True, exist_ok=True)
+            print(f"[bench] generating {n} frames in {root}")
+            base = synth_scene(root, n, args.width, args.height, args.points, seed=args.seed)
+            results[str(n)] = {}
+            for label, cmd, cleanup in stage_commands(root, base, args.model_formats):
+                phases = run_stage(label, cmd, cleanup, root / "bench_telemetry.jsonl", args.repeat)
+                results[str(n)].update({f"{label}:{p}": w for p, w in phases.items()})
+                print(f"[bench] {n:>6} frames  {label:22s} {phases['process']:8.3f}s")
+    finally:
+        if not args.keep and args.work_dir is None:
+            shutil.rmtree(work, ignore_errors=True)
+
+    current = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "numpy": np.__version__,
+                    "cpus": os.cpu_count()},
+        "params": {"width": args.width, "height": args.height, "points": args.points, "repeat": args.repeat,
+                   "seed": args.seed, "model_formats": args.model_formats},
+        "results": results,
+        "exponents": scaling_exponents(results),
+    }
+    for path in [args.out] + ([args.baseline] if args.save_baseline else []):
+        write_json_atomic(path, current)
+
+    print()
+    print("================ SUMMARY ================")
+    keys = sorted({k for r in results.values() for k in r if k.endswith(":process") or k.endswith(":total")})
+    print(f"{'stage:phase':40s} " + " ".join(f"{s + ' fr':>10s}" for s in results) + f" {'exponent':>9s}")
+    for key in keys:
+        row = " ".join(f"{results[s].get(key, float('nan')):10.3f}" for s in results)
+        print(f"{key[:40]:40s} {row} {current['exponents'].get(key, {}).get('b', float('nan')):9.2f}")
+    print(f"Results: {args.out}")
+    if args.save_baseline:
+        print(f"Baseline saved: {args.baseline}")
+        return
+    if not args.baseline.is_file():
+        print(f"No baseline at {args.baseline} (use --save_baseline)")
+        return
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("params") != current["params"]:
+        print(f"[WARN] baseline parameters differ: {baseline.get('params')}")
+    regressions = compare(current, baseline, args.tolerance)
+    print(f"Regressions vs {args.baseline} ({baseline.get('generated_at')}, {baseline.get('host')}): {len(regressions)}")
+    for r in regressions:
+        print(f"  ✖ {r}")
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,176 @@
 #!/usr/bin/env python3
-import json, sys
+import os, csv, sys, argparse
 from pathlib import Path
-import pandas as pd
-import matplotlib.pyplot as plt
+
+from atomic_io import atomic_write
+from transforms_summary import count_frames
 
 # ====== EDIT THIS ======
 BASE_DIR = Path("./")
 # =======================
 
+KINDS = ["transforms.json", "transforms_clutter.json", "transforms_extra.json"]
+CSV_NAME = "frame_counts_by_scene.csv"
+CSV_FIELDS = ["scene", "kind", "frames", "path", "mtime_ns"]
+
 def load_frames_count(json_path: Path) -> int:
     try:
-        with json_path.open("r") as f:
-            data = json.load(f)
-        frames = data.get("frames", [])
-        return len(frames)
+        return count_frames(json_path)
     except Exception:
         return 0
 
-# collect all scenes under BASE_DIR that have *-All with the jsons
-records = []
-for scene_all in BASE_DIR.rglob("*-All"):
-    scene = scene_all.parent.name  # e.g., 090625-TUCCookie
-    for kind in ["transforms.json", "transforms_clutter.json", "transforms_extra.json"]:
-        p = scene_all / kind
-        if p.exists():
-            n = load_frames_count(p)
-            records.append({"scene": scene, "kind": kind.replace(".json",""), "frames": n})
+def find_scene_alls(base_dir: Path) -> list:
+    """Every *-All folder under base_dir (like rglob), without descending into them or into image folders."""
+    found = []
+    for d, dirs, _ in os.walk(base_dir):
+        keep = []
+        for x in dirs:
+            if x.endswith("-All"):
+                found.append(Path(d) / x)
+            elif not (x.startswith(".") or x.startswith("images") or x.startswith("undistortion_")):
+                keep.append(x)
+        dirs[:] = keep
+    return sorted(found)
+
+def load_cached_counts(csv_path: Path) -> dict:
+    """path -> (mtime_ns, frames) from a previous CSV; rows without a path/mtime are ignored."""
+    cached = {}
+    try:
+        with csv_path.open("r", newline="") as f:
+            for row in csv.DictReader(f):
+                if row.get("path") and row.get("mtime_ns"):
+                    cached[row["path"]] = (int(row["mtime_ns"]), int(row["frames"]))
+    except (OSError, ValueError):
+        pass
+    return cached
+
+def collect_counts(base_dir: Path, cached: dict) -> tuple:
+    """Records for every transforms*.json; files whose mtime matches the cache are not read."""
+    records, reused = [], 0
+    for scene_all in find_scene_alls(base_dir):
+        scene = scene_all.parent.name  # e.g., 090625-TUCCookie
+        for kind in KINDS:
+            p = scene_all / kind
+            try:
+                mtime = p.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            hit = cached.get(str(p))
+            if hit is not None and hit[0] == mtime:
+                n = hit[1]
+                reused += 1
+            else:
+                n = load_frames_count(p)
+            records.append({"scene": scene, "kind": kind.replace(".json",""), "frames": n, "path": str(p), "mtime_ns": mtime})
+    return records, reused
+
+def save_csv(records: list, out_csv: Path):
+    """Tidy CSV sorted by kind, then frames descending (path/mtime_ns let the next run skip unchanged files)."""
+    rows = sorted(records, key=lambda r: (r["kind"], -r["frames"]))
+    with atomic_write(out_csv, newline="") as f:
+        w = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+
+def has_display() -> bool:
+    return sys.platform in ("darwin", "win32") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
 
-if not records:
-    sys.exit("No transforms*.json found. Check BASE_DIR.")
+def annotate_bars(ax, xs, heights, labels, fontsize=6, pad=2):
+    """
+    Vertical count labels above the bars as one PathCollection (instead of one Text artist per bar).
+    Glyph paths are in points, placed at (x, height + pad) in data coordinates.
+    """
+    from matplotlib.collections import PathCollection
+    from matplotlib.textpath import TextPath
+    from matplotlib.transforms import Affine2D
 
-df = pd.DataFrame(records)
+    paths = []
+    for label in labels:
+        tp = TextPath((0, 0), label, size=fontsize)
+        ext = tp.get_extents()
+        # rotate 90° and anchor at bottom-center, like ha="center", va="bottom", rotation=90
+        t = Affine2D().translate(-ext.x0, -(ext.y0 + ext.y1) / 2).rotate_deg(90)
+        paths.append(t.transform_path(tp))
+    coll = PathCollection(
+        paths,
+        offsets=list(zip(xs, [h + pad for h in heights])),
+        offset_transform=ax.transData,
+        transform=Affine2D().scale(1 / 72.0) + ax.figure.dpi_scale_trans,  # points -> pixels at the dpi being rendered
+        facecolors="black", edgecolors="none", clip_on=False,  # Text artists are not clipped either
+    )
+    ax.add_collection(coll, autolim=False)
+    return coll
 
-def plot_kind(kind: str):
+def plot_kind(df, kind: str, plt, out_dir: Path = None, formats=("png",)):
     d = df[df["kind"] == kind].copy()
     if d.empty:
         print(f"[warn] no {kind} found")
         return
     d = d.sort_values("frames", ascending=False)
 
-    plt.figure(figsize=(28,6))
-    bars = plt.bar(d["scene"], d["frames"])
-    plt.title(f"Number of frames per scene — {kind}")
-    plt.xlabel("Scene")
-    plt.ylabel("Frames")
-    plt.xticks(rotation=90, ha="right", fontsize=6)
+    fig, ax = plt.subplots(figsize=(28,6))
+    bars = ax.bar(d["scene"], d["frames"])
+    ax.set_title(f"Number of frames per scene — {kind}")
+    ax.set_xlabel("Scene")
+    ax.set_ylabel("Frames")
+    ax.tick_params(axis="x", labelrotation=90, labelsize=6)
 
     # annotate each bar with frame count
-    for bar, frame in zip(bars, d["frames"]):
-        plt.text(
-            bar.get_x() + bar.get_width()/2,  # x position (center of bar)
-            bar.get_height() + 2,             # y position (slightly above bar)
-            str(frame),                       # text
-            ha="center", va="bottom", fontsize=6, rotation=90
-        )
-    plt.margins(x=0.001) 
-    plt.tight_layout()
-
-for k in ["transforms", "transforms_clutter", "transforms_extra"]:
-    plot_kind(k)
-
-# also save a tidy CSV for reference
-out_csv = BASE_DIR / "frame_counts_by_scene.csv"
-df.sort_values(["kind","frames"], ascending=[True, False]).to_csv(out_csv, index=False)
-print(f"Saved CSV: {out_csv}")
-
-plt.show()
+    annotate_bars(ax, [b.get_x() + b.get_width()/2 for b in bars], [b.get_height() for b in bars], [str(f) for f in d["frames"]])
+    ax.margins(x=0.001)
+    fig.tight_layout()
+    if out_dir is not None:
+        for fmt in formats:
+            path = out_dir / f"frames_per_scene_{kind}.{fmt}"
+            fig.savefig(path)
+            print(f"Saved plot: {path}")
+        plt.close(fig)
+
+def plot_counts(records: list, mode: str, out_dir: Path, formats):
+    """mode: 'show' (interactive window) or 'save' (Agg backend, one file per kind and format)."""
+    import matplotlib
+    if mode == "save":
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    df = pd.DataFrame(records)
+    for k in ["transforms", "transforms_clutter", "transforms_extra"]:
+        plot_kind(df, k, plt, out_dir if mode == "save" else None, formats)
+    if mode == "show":
+        plt.show()
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Count frames of every transforms*.json and plot them per scene")
+    ap.add_argument("base_dir", type=Path, nargs="?", default=BASE_DIR)
+    ap.add_argument("--no_cache", action="store_true", help=f"Recount every file instead of reusing {CSV_NAME}")
+    ap.add_argument("--plot", choices=["auto", "show", "save", "none"], default="auto",
+                    help="auto: show if a display is available, else save; none: only count and write the CSV")
+    ap.add_argument("--plot_dir", type=Path, default=None, help="Where saved plots go (default: BASE_DIR)")
+    ap.add_argument("--formats", nargs="+", default=["png", "svg"], help="File formats of saved plots")
+    return ap.parse_args()
+
+def main():
+    args = parse_args()
+    base_dir = args.base_dir
+    out_csv = base_dir / CSV_NAME
+    records, reused = collect_counts(base_dir, {} if args.no_cache else load_cached_counts(out_csv))
+
+    if not records:
+        sys.exit("No transforms*.json found. Check BASE_DIR.")
+    print(f"Counted {len(records)} files ({reused} unchanged since the last CSV)")
+
+    # also save a tidy CSV for reference
+    save_csv(records, out_csv)
+    print(f"Saved CSV: {out_csv}")
+
+    mode = args.plot
+    if mode == "auto":
+        mode = "show" if has_display() else "save"
+    if mode != "none":
+        plot_dir = args.plot_dir or base_dir
+        plot_dir.mkdir(parents=True, exist_ok=True)
+        plot_counts(records, mode, plot_dir, args.formats)
 
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 set -euo pipefail
 
 # Usage: ./check_jpg_sizes.sh [PARENT_DIR]
+# Header-only equivalent without exiftool: python3 image_probe.py [PARENT_DIR]
 PARENT="${1:-.}"
 
 command -v exiftool >/dev/null 2>&1 || {
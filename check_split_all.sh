@@ -1,6 +1,8 @@
 #!/usr/bin/env bash
 set -euo pipefail
 
+# All checks (split, sizes, registration, clutter/extra coverage) for every scene in one process: python3 validate_dataset.py .
+
 ok_scenes=()
 bad_scenes=()
 
@@ -11,24 +11,39 @@
 import argparse
 from glob import glob
 import os
-from pathlib import Path, PurePosixPath
+from pathlib import Path
 
 import numpy as np
 import json
 import sys
 import math
-import cv2
-import os
 import shutil
+from contextlib import ExitStack, nullcontext
+
+from atomic_io import atomic_path, atomic_write, check_writable, stage_lock, write_json_atomic
+from colmap_model import detect_model_format, read_model_cameras, read_model_images
+from scene_split import SPLIT_KEYWORDS, SPLIT_NAME, SPLIT_INDEX_NAME, frame_kinds, split_indices, write_split
+from transforms_summary import SUMMARY_NAME, write_summary
+from stage_cache import StageCache, fingerprint_files, fingerprint_tree, tool_versions
+from telemetry import LOG_NAME, Telemetry, scene_name
+
+# cv2 and detectron2 are imported where they are used, so importing this module for convert() stays cheap
+
+def root_dir():
+    return os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 
-ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
-SCRIPTS_FOLDER = os.path.join(ROOT_DIR, "scripts")
+def scripts_folder():
+    return os.path.join(root_dir(), "scripts")
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Convert a text colmap export to nerf format transforms.json; optionally convert video to images, and optionally run colmap in the first place.")
 
     parser.add_argument("--video_in", default="", help="Run ffmpeg first to convert a provided video file into a set of images. Uses the video_fps parameter also.")
     parser.add_argument("--video_fps", default=2)
+    parser.add_argument("--video_select", default="all", choices=["all", "window", "topk"], help="all: write every frame at --video_fps. window: decode --video_candidates frames per output frame and write only the sharpest of each group. topk: write only the --video_topk sharpest candidates. window/topk stream frames from ffmpeg and score them in memory, only selected frames reach the disk.")
+    parser.add_argument("--video_candidates", default=5, help="Candidate frames decoded per output frame (--video_select window/topk), i.e. frames are decoded at video_fps * video_candidates.")
+    parser.add_argument("--video_topk", default=0, help="Number of frames kept by --video_select topk.")
+    parser.add_argument("--video_reduce", default=4, help="Score the sharpness of video frames on a 1/N downscaled grayscale copy.")
     parser.add_argument("--time_slice", default="", help="Time (in seconds) in the format t1,t2 within which the images should be generated from the video. E.g.: \"--time_slice '10,300'\" will generate images only from 10th second to 300th second of the video.")
     parser.add_argument("--run_colmap", action="store_true", help="run colmap first on the image folder")
     parser.add_argument("--colmap_matcher", default="sequential", choices=["exhaustive","sequential","spatial","transitive","vocab_tree"], help="Select which matcher colmap should use. Sequential for videos, exhaustive for ad-hoc images.")
@@ -36,14 +51,29 @@ def parse_args():
     parser.add_argument("--colmap_camera_model", default="OPENCV", choices=["SIMPLE_PINHOLE", "PINHOLE", "SIMPLE_RADIAL", "RADIAL", "OPENCV", "SIMPLE_RADIAL_FISHEYE", "RADIAL_FISHEYE", "OPENCV_FISHEYE"], help="Camera model")
     parser.add_argument("--colmap_camera_params", default="", help="Intrinsic parameters, depending on the chosen model. Format: fx,fy,cx,cy,dist")
     parser.add_argument("--images", default="images", help="Input path to the images.")
-    parser.add_argument("--text", default="colmap_text", help="Input path to the colmap text files (set automatically if --run_colmap is used).")
+    parser.add_argument("--text", default="colmap_text", help="Input path to the colmap model folder, holding either cameras.bin/images.bin or cameras.txt/images.txt (set automatically if --run_colmap is used).")
+    parser.add_argument("--model_format", default="auto", choices=["auto", "bin", "txt"], help="Format of the colmap model in --text. auto reads the .bin files when present and falls back to .txt.")
     parser.add_argument("--aabb_scale", default=32, choices=["1", "2", "4", "8", "16", "32", "64", "128"], help="Large scene scale factor. 1=scene fits in unit cube; power of 2 up to 128")
     parser.add_argument("--skip_early", default=0, help="Skip this many images from the start.")
     parser.add_argument("--keep_colmap_coords", action="store_true", help="Keep transforms.json in COLMAP's original frame of reference (this will avoid reorienting and repositioning the scene for preview and rendering).")
     parser.add_argument("--out", default="transforms.json", help="Output JSON file path.")
     parser.add_argument("--vocab_path", default="", help="Vocabulary tree path.")
     parser.add_argument("--overwrite", action="store_true", help="Do not ask for confirmation for overwriting existing images and COLMAP data.")
-    parser.add_argument("--mask_categories", nargs="*", type=str, default=[], help="Object categories that should be masked out from the training images. See `scripts/category2id.json` for supported categories.")
+    parser.add_argument("--center_mode", default="upper", choices=["full", "upper", "sample"], help="How to visit camera pairs when computing the center of attention. full=all ordered pairs, upper=each pair once (same result, half the work), sample=a random subset of --center_samples pairs for very large scenes.")
+    parser.add_argument("--center_mem_mb", default=256, help="Memory cap (MB) for one block of camera pairs in the center of attention solve.")
+    parser.add_argument("--center_samples", default=1000000, help="Number of camera pairs used by --center_mode sample.")
+    parser.add_argument("--sharpness_workers", default=8, help="Number of threads used to score image sharpness.")
+    parser.add_argument("--sharpness_reduce", default=1, choices=["1", "2", "4", "8"], help="Score sharpness on a 1/N grayscale JPEG decode instead of the full-resolution image.")
+    parser.add_argument("--no_sharpness_cache", action="store_true", help="Do not read or write sharpness_cache.json next to the output file.")
+    parser.add_argument("--compact", action="store_true", help="Write the transforms JSONs without indentation.")
+    parser.add_argument("--float_precision", default="", help="Round transform matrices and sharpness to this many decimals in the transforms JSONs.")
+    parser.add_argument("--npz", action="store_true", help="Also write a binary sidecar (transforms.npz) with the pose array and a name index.")
+    parser.add_argument("--incremental", action="store_true", help="Reuse the per-frame state of the last run (colmap2nerf_state.npz) and only score and pair the newly registered frames. Falls back to a full run if earlier frames changed.")
+    parser.add_argument("--force", action="store_true", help="Convert even if the model, images and parameters did not change since the last run.")
+    parser.add_argument("--explain", action="store_true", help="Report why the conversion is rerun.")
+    parser.add_argument("--mask_categories", nargs="*", type=str, default=[], help="Object categories that should be masked out from the extra (Clean) images. See `scripts/category2id.json` for supported categories.")
+    parser.add_argument("--mask_batch", default=4, help="Images per inference batch of the masking model.")
+    parser.add_argument("--mask_workers", default=4, help="Threads decoding images ahead of the masking model, and threads writing the masks.")
     args = parser.parse_args()
     return args
 
@@ -59,11 +89,11 @@ def run_ffmpeg(args):
 
     # On Windows, if FFmpeg isn't found, try automatically downloading it from the internet
     if os.name == "nt" and os.system(f"where {ffmpeg_binary} >nul 2>nul") != 0:
-        ffmpeg_glob = os.path.join(ROOT_DIR, "external", "ffmpeg", "*", "bin", "ffmpeg.exe")
+        ffmpeg_glob = os.path.join(root_dir(), "external", "ffmpeg", "*", "bin", "ffmpeg.exe")
         candidates = glob(ffmpeg_glob)
         if not candidates:
             print("FFmpeg not found. Attempting to download FFmpeg from the internet.")
-            do_system(os.path.join(SCRIPTS_FOLDER, "download_ffmpeg.bat"))
+            do_system(os.path.join(scripts_folder(), "download_ffmpeg.bat"))
             candidates = glob(ffmpeg_glob)
 
         if candidates:
@@ -90,18 +120,120 @@ def run_ffmpeg(args):
     if time_slice:
         start, end = time_slice.split(",")
         time_slice_value = f",select='between(t\,{start}\,{end})'"
+    if args.video_select != "all":
+        if args.video_select == "topk" and int(args.video_topk) <= 0:
+            print("--video_select topk needs --video_topk > 0")
+            sys.exit(1)
+        vf = f"fps={fps * int(args.video_candidates)}{time_slice_value}"
+        cmd = [ffmpeg_binary, "-v", "error", "-i", args.video_in, "-vf", vf, "-f", "image2pipe", "-vcodec", "ppm", "-"]
+        kept = stream_select_frames(cmd, args.images, args.video_select, int(args.video_candidates), int(args.video_topk), int(args.video_reduce))
+        print(f"kept {kept} frames in {args.images}")
+        return
     do_system(f"{ffmpeg_binary} -i {video} -qscale:v 1 -qmin 1 -vf \"fps={fps}{time_slice_value}\" {images}/%04d.jpg")
 
+def iter_ppm_frames(stream):
+    """Decode a stream of binary PPM (P6, 8 bit) images, e.g. ffmpeg -f image2pipe -vcodec ppm, into RGB arrays."""
+    while True:
+        tokens = []
+        while len(tokens) < 4:
+            line = stream.readline()
+            if not line:
+                if tokens:
+                    raise ValueError("truncated PPM header")
+                return
+            tokens += line.split(b"#")[0].split()
+        if tokens[0] != b"P6" or tokens[3] != b"255":
+            raise ValueError(f"unsupported PPM header {tokens}")
+        w, h = int(tokens[1]), int(tokens[2])
+        data = stream.read(w * h * 3)
+        if len(data) != w * h * 3:
+            raise ValueError("truncated PPM frame")
+        yield np.frombuffer(data, dtype=np.uint8).reshape(h, w, 3)
+
+def frame_sharpness(rgb, reduce=4):
+    """Sharpness score of a decoded frame, on a 1/reduce grayscale copy."""
+    import cv2
+    if reduce > 1:
+        rgb = cv2.resize(rgb, (max(1, rgb.shape[1] // reduce), max(1, rgb.shape[0] // reduce)), interpolation=cv2.INTER_AREA)
+    return variance_of_laplacian(cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY))
+
+def select_frames(frames, mode="window", per_window=5, topk=0, reduce=4):
+    """
+    Pick frames from a stream of RGB arrays without storing it. Yields (candidate index, score, frame):
+    window: the sharpest of every per_window consecutive frames, as soon as its group is complete.
+    topk: the topk sharpest frames, in stream order at the end; they are held JPEG-encoded (bytes).
+    """
+    import cv2
+    import heapq
+    if mode == "window":
+        best = None
+        for i, img in enumerate(frames):
+            score = frame_sharpness(img, reduce)
+            if best is None or score > best[1]:
+                best = (i, score, img)
+            if (i + 1) % per_window == 0:
+                yield best
+                best = None
+        if best is not None:
+            yield best
+    elif mode == "topk":
+        heap = []  # (score, index, jpeg) with the weakest kept frame on top
+        for i, img in enumerate(frames):
+            score = frame_sharpness(img, reduce)
+            if len(heap) < topk or score > heap[0][0]:
+                ok, buf = cv2.imencode(".jpg", img[:, :, ::-1], [cv2.IMWRITE_JPEG_QUALITY, 100])
+                item = (score, i, buf.tobytes())
+                heapq.heappush(heap, item) if len(heap) < topk else heapq.heapreplace(heap, item)
+        for score, i, jpeg in sorted(heap, key=lambda t: t[1]):
+            yield i, score, jpeg
+    else:
+        raise ValueError(f"unknown frame selection mode: {mode}")
+
+def stream_select_frames(cmd, out_dir, mode="window", per_window=5, topk=0, reduce=4, workers=4):
+    """
+    Run cmd (ffmpeg writing PPM frames to stdout), keep the frames chosen by select_frames and write
+    them to out_dir as <n>.jpg (n: output number for window, candidate number for topk). Returns the count.
+    """
+    import cv2
+    import subprocess
+    from concurrent.futures import ThreadPoolExecutor
+
+    def save(name, frame):
+        with atomic_path(os.path.join(out_dir, name)) as tmp:
+            if isinstance(frame, bytes):
+                with open(tmp, "wb") as f:
+                    f.write(frame)
+            elif not cv2.imwrite(tmp, frame[:, :, ::-1], [cv2.IMWRITE_JPEG_QUALITY, 100]):
+                raise OSError(f"cannot write {name}")
+
+    print(f"==== streaming: {' '.join(cmd)}")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=1 << 20)
+    writes = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+            for n, (i, score, frame) in enumerate(select_frames(iter_ppm_frames(proc.stdout), mode, per_window, topk, reduce)):
+                name = f"{(n if mode == 'window' else i) + 1:04d}.jpg"
+                writes.append(ex.submit(save, name, frame))
+            for fut in writes:
+                fut.result()
+    finally:
+        proc.stdout.close()
+        ret = proc.wait()
+    if ret:
+        print("FATAL: command failed")
+        sys.exit(ret)
+    return len(writes)
+
 def run_colmap(args):
     colmap_binary = "colmap"
 
     # On Windows, if FFmpeg isn't found, try automatically downloading it from the internet
     if os.name == "nt" and os.system(f"where {colmap_binary} >nul 2>nul") != 0:
-        colmap_glob = os.path.join(ROOT_DIR, "external", "colmap", "*", "COLMAP.bat")
+        colmap_glob = os.path.join(root_dir(), "external", "colmap", "*", "COLMAP.bat")
         candidates = glob(colmap_glob)
         if not candidates:
             print("COLMAP not found. Attempting to download COLMAP from the internet.")
-            do_system(os.path.join(SCRIPTS_FOLDER, "download_colmap.bat"))
+            do_system(os.path.join(scripts_folder(), "download_colmap.bat"))
             candidates = glob(colmap_glob)
 
         if candidates:
@@ -139,15 +271,145 @@ def run_colmap(args):
     do_system(f"mkdir {text}")
     do_system(f"{colmap_binary} model_converter --input_path {sparse}/0 --output_path {text} --output_type TXT")
 
+def camera_from_params(model_name, width, height, params):
+    # params are the COLMAP intrinsics in model order, e.g.
+    # SIMPLE_RADIAL: f, cx, cy, k
+    # OPENCV: fx, fy, cx, cy, k1, k2, p1, p2
+    # RADIAL: f, cx, cy, k1, k2
+    p = [float(x) for x in params]
+    camera = {}
+    camera["w"] = float(width)
+    camera["h"] = float(height)
+    camera["fl_x"] = p[0]
+    camera["fl_y"] = p[0]
+    camera["k1"] = 0
+    camera["k2"] = 0
+    camera["k3"] = 0
+    camera["k4"] = 0
+    camera["p1"] = 0
+    camera["p2"] = 0
+    camera["cx"] = camera["w"] / 2
+    camera["cy"] = camera["h"] / 2
+    camera["is_fisheye"] = False
+    if model_name == "SIMPLE_PINHOLE":
+        camera["cx"] = p[1]
+        camera["cy"] = p[2]
+    elif model_name == "PINHOLE":
+        camera["fl_y"] = p[1]
+        camera["cx"] = p[2]
+        camera["cy"] = p[3]
+    elif model_name == "SIMPLE_RADIAL":
+        camera["cx"] = p[1]
+        camera["cy"] = p[2]
+        camera["k1"] = p[3]
+    elif model_name == "RADIAL":
+        camera["cx"] = p[1]
+        camera["cy"] = p[2]
+        camera["k1"] = p[3]
+        camera["k2"] = p[4]
+    elif model_name == "OPENCV":
+        camera["fl_y"] = p[1]
+        camera["cx"] = p[2]
+        camera["cy"] = p[3]
+        camera["k1"] = p[4]
+        camera["k2"] = p[5]
+        camera["p1"] = p[6]
+        camera["p2"] = p[7]
+    elif model_name == "SIMPLE_RADIAL_FISHEYE":
+        camera["is_fisheye"] = True
+        camera["cx"] = p[1]
+        camera["cy"] = p[2]
+        camera["k1"] = p[3]
+    elif model_name == "RADIAL_FISHEYE":
+        camera["is_fisheye"] = True
+        camera["cx"] = p[1]
+        camera["cy"] = p[2]
+        camera["k1"] = p[3]
+        camera["k2"] = p[4]
+    elif model_name == "OPENCV_FISHEYE":
+        camera["is_fisheye"] = True
+        camera["fl_y"] = p[1]
+        camera["cx"] = p[2]
+        camera["cy"] = p[3]
+        camera["k1"] = p[4]
+        camera["k2"] = p[5]
+        camera["k3"] = p[6]
+        camera["k4"] = p[7]
+    else:
+        print("Unknown camera model ", model_name)
+    # fl = 0.5 * w / tan(0.5 * angle_x);
+    camera["camera_angle_x"] = math.atan(camera["w"] / (camera["fl_x"] * 2)) * 2
+    camera["camera_angle_y"] = math.atan(camera["h"] / (camera["fl_y"] * 2)) * 2
+    camera["fovx"] = camera["camera_angle_x"] * 180 / math.pi
+    camera["fovy"] = camera["camera_angle_y"] * 180 / math.pi
+    return camera
+
 def variance_of_laplacian(image):
+    import cv2
     return cv2.Laplacian(image, cv2.CV_64F).var()
 
-def sharpness(imagePath):
-    image = cv2.imread(imagePath)
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+REDUCED_GRAYSCALE = {
+    2: "IMREAD_REDUCED_GRAYSCALE_2",
+    4: "IMREAD_REDUCED_GRAYSCALE_4",
+    8: "IMREAD_REDUCED_GRAYSCALE_8",
+}
+
+def sharpness(imagePath, reduce=1):
+    import cv2
+    if reduce == 1:
+        image = cv2.imread(imagePath)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    else:
+        # let libjpeg decode straight to a 1/2, 1/4 or 1/8 grayscale image
+        gray = cv2.imread(imagePath, getattr(cv2, REDUCED_GRAYSCALE[reduce]))
     fm = variance_of_laplacian(gray)
     return fm
 
+def load_sharpness_cache(cache_path):
+    try:
+        with open(cache_path, "r") as f:
+            return json.load(f).get("entries", {})
+    except (OSError, ValueError):
+        return {}
+
+def save_sharpness_cache(cache_path, entries):
+    write_json_atomic(cache_path, {"version": 1, "entries": entries}, indent=None)
+
+def compute_sharpness(paths, workers=8, reduce=1, cache_path=None, verbose=True):
+    """
+    Sharpness of every image in `paths`, in the same order. Images are scored on a thread pool
+    (OpenCV releases the GIL while decoding and filtering). When cache_path is given, scores are
+    reused for files whose path, mtime, size and reduce factor are unchanged.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    entries = load_sharpness_cache(cache_path) if cache_path else {}
+    keys = []
+    for p in paths:
+        st = os.stat(p)
+        keys.append((os.path.realpath(p), {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "reduce": reduce}))
+
+    scores = [None] * len(paths)
+    todo = []
+    for i, (key, stamp) in enumerate(keys):
+        hit = entries.get(key)
+        if hit is not None and all(hit.get(k) == v for k, v in stamp.items()):
+            scores[i] = hit["sharpness"]
+        else:
+            todo.append(i)
+    if verbose:
+        print(f"sharpness: {len(paths) - len(todo)} cached, {len(todo)} to score (workers={workers}, reduce={reduce})")
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+            for i, b in zip(todo, ex.map(lambda i: sharpness(paths[i], reduce), todo)):
+                scores[i] = b
+                key, stamp = keys[i]
+                entries[key] = {**stamp, "sharpness": b}
+        if cache_path:
+            save_sharpness_cache(cache_path, entries)
+    return scores
+
 def qvec2rotmat(qvec):
     return np.array([
         [
@@ -165,6 +427,40 @@ def qvec2rotmat(qvec):
         ]
     ])
 
+def qvec2rotmat_batch(qvecs):
+    # (N,4) -> (N,3,3), same terms as qvec2rotmat
+    w, x, y, z = np.asarray(qvecs, dtype=np.float64).T
+    R = np.empty((len(w), 3, 3))
+    R[:,0,0] = 1 - 2 * y**2 - 2 * z**2
+    R[:,0,1] = 2 * x * y - 2 * w * z
+    R[:,0,2] = 2 * z * x + 2 * w * y
+    R[:,1,0] = 2 * x * y + 2 * w * z
+    R[:,1,1] = 1 - 2 * x**2 - 2 * z**2
+    R[:,1,2] = 2 * y * z - 2 * w * x
+    R[:,2,0] = 2 * z * x - 2 * w * y
+    R[:,2,1] = 2 * y * z + 2 * w * x
+    R[:,2,2] = 1 - 2 * x**2 - 2 * y**2
+    return R
+
+def invert_rigid(R, t):
+    # closed-form inverse of the (N,4,4) rigid transforms [R|t]: [R^T | -R^T t]
+    Rt = np.transpose(R, (0, 2, 1))
+    m = np.zeros((len(R), 4, 4))
+    m[:,0:3,0:3] = Rt
+    m[:,0:3,3] = -np.einsum("nij,nj->ni", Rt, t)
+    m[:,3,3] = 1
+    return m
+
+def poses_from_colmap(qvecs, tvecs, keep_colmap_coords=False):
+    """(N,4) world-to-camera quaternions and (N,3) translations -> (N,4,4) camera-to-world poses."""
+    c2w = invert_rigid(qvec2rotmat_batch(-np.asarray(qvecs)), np.asarray(tvecs, dtype=np.float64))
+    if not keep_colmap_coords:
+        c2w[:,0:3,2] *= -1 # flip the y and z axis
+        c2w[:,0:3,1] *= -1
+        c2w = c2w[:,[1,0,2,3],:]
+        c2w[:,2,:] *= -1 # flip whole world upside down
+    return c2w
+
 def rotmat(a, b):
     a, b = a / np.linalg.norm(a), b / np.linalg.norm(b)
     v = np.cross(a, b)
@@ -190,179 +486,280 @@ def closest_point_2_lines(oa, da, ob, db): # returns point closest to both rays
         tb = 0
     return (oa+ta*da+ob+tb*db) * 0.5, denom
 
-if __name__ == "__main__":
-    args = parse_args()
-    if args.video_in != "":
-        run_ffmpeg(args)
-    if args.run_colmap:
-        run_colmap(args)
-    AABB_SCALE = int(args.aabb_scale)
-    SKIP_EARLY = int(args.skip_early)
-    IMAGE_FOLDER = args.images
-    TEXT_FOLDER = args.text
-    OUT_PATH = args.out
+# rough number of bytes of float64 temporaries held per ray pair inside a block
+_PAIR_BYTES = 256
 
-    # Check that we can save the output before we do a lot of work
-    try:
-        open(OUT_PATH, "a").close()
-    except Exception as e:
-        print(f"Could not save transforms JSON to {OUT_PATH}: {e}")
-        sys.exit(1)
+def _accumulate_pairs(oa, da, ob, db):
+    # batched closest_point_2_lines over broadcastable ray arrays; returns (sum p*w, sum w) over valid pairs
+    c = np.cross(da, db)
+    denom = np.einsum("...i,...i->...", c, c)
+    t = ob - oa
+    ta = np.einsum("...i,...i->...", t, np.cross(db, c)) / (denom + 1e-10) # det([t, db, c]) = t . (db x c)
+    tb = np.einsum("...i,...i->...", t, np.cross(da, c)) / (denom + 1e-10)
+    ta = np.minimum(ta, 0)
+    tb = np.minimum(tb, 0)
+    p = (oa + ta[..., None] * da + ob + tb[..., None] * db) * 0.5
+    w = np.where(denom > 0.00001, denom, 0.0)
+    return (p * w[..., None]).reshape(-1, 3).sum(0), w.sum()
 
-    print(f"outputting to {OUT_PATH}...")
-    cameras = {}
-    with open(os.path.join(TEXT_FOLDER,"cameras.txt"), "r") as f:
-        camera_angle_x = math.pi / 2
-        for line in f:
-            # 1 SIMPLE_RADIAL 2048 1536 1580.46 1024 768 0.0045691
-            # 1 OPENCV 3840 2160 3178.27 3182.09 1920 1080 0.159668 -0.231286 -0.00123982 0.00272224
-            # 1 RADIAL 1920 1080 1665.1 960 540 0.0672856 -0.0761443
-            if line[0] == "#":
-                continue
-            els = line.split(" ")
-            camera = {}
-            camera_id = int(els[0])
-            camera["w"] = float(els[2])
-            camera["h"] = float(els[3])
-            camera["fl_x"] = float(els[4])
-            camera["fl_y"] = float(els[4])
-            camera["k1"] = 0
-            camera["k2"] = 0
-            camera["k3"] = 0
-            camera["k4"] = 0
-            camera["p1"] = 0
-            camera["p2"] = 0
-            camera["cx"] = camera["w"] / 2
-            camera["cy"] = camera["h"] / 2
-            camera["is_fisheye"] = False
-            if els[1] == "SIMPLE_PINHOLE":
-                camera["cx"] = float(els[5])
-                camera["cy"] = float(els[6])
-            elif els[1] == "PINHOLE":
-                camera["fl_y"] = float(els[5])
-                camera["cx"] = float(els[6])
-                camera["cy"] = float(els[7])
-            elif els[1] == "SIMPLE_RADIAL":
-                camera["cx"] = float(els[5])
-                camera["cy"] = float(els[6])
-                camera["k1"] = float(els[7])
-            elif els[1] == "RADIAL":
-                camera["cx"] = float(els[5])
-                camera["cy"] = float(els[6])
-                camera["k1"] = float(els[7])
-                camera["k2"] = float(els[8])
-            elif els[1] == "OPENCV":
-                camera["fl_y"] = float(els[5])
-                camera["cx"] = float(els[6])
-                camera["cy"] = float(els[7])
-                camera["k1"] = float(els[8])
-                camera["k2"] = float(els[9])
-                camera["p1"] = float(els[10])
-                camera["p2"] = float(els[11])
-            elif els[1] == "SIMPLE_RADIAL_FISHEYE":
-                camera["is_fisheye"] = True
-                camera["cx"] = float(els[5])
-                camera["cy"] = float(els[6])
-                camera["k1"] = float(els[7])
-            elif els[1] == "RADIAL_FISHEYE":
-                camera["is_fisheye"] = True
-                camera["cx"] = float(els[5])
-                camera["cy"] = float(els[6])
-                camera["k1"] = float(els[7])
-                camera["k2"] = float(els[8])
-            elif els[1] == "OPENCV_FISHEYE":
-                camera["is_fisheye"] = True
-                camera["fl_y"] = float(els[5])
-                camera["cx"] = float(els[6])
-                camera["cy"] = float(els[7])
-                camera["k1"] = float(els[8])
-                camera["k2"] = float(els[9])
-                camera["k3"] = float(els[10])
-                camera["k4"] = float(els[11])
+def _rays(mats):
+    mats = np.asarray(mats, dtype=np.float64)
+    d = mats[:, 0:3, 2]
+    return mats[:, 0:3, 3], d / np.linalg.norm(d, axis=1, keepdims=True)
+
+def pair_sums(mats, mode="upper", mem_mb=256, samples=1000000, seed=0):
+    """
+    Unnormalized center of attention: (sum of p*w, sum of w) over the camera pairs visited by
+    `mode` (see center_of_attention). Kept separate so the sums can be stored and extended.
+    """
+    o, d = _rays(mats)
+    n = o.shape[0]
+    budget = max(1, int(mem_mb * 1024 * 1024) // _PAIR_BYTES)
+
+    totp = np.zeros(3)
+    totw = 0.0
+    if mode == "sample" and samples < n * (n - 1) // 2:
+        rng = np.random.default_rng(seed)
+        remaining = int(samples)
+        while remaining > 0:
+            k = min(remaining, budget)
+            i = rng.integers(0, n, k)
+            j = rng.integers(0, n, k)
+            p, w = _accumulate_pairs(o[i], d[i], o[j], d[j]) # i == j gives a zero weight
+            totp += p
+            totw += w
+            remaining -= k
+    else:
+        rows = max(1, budget // max(n, 1))
+        for i0 in range(0, n, rows):
+            i1 = min(n, i0 + rows)
+            j0 = 0 if mode == "full" else i0 + 1
+            if j0 >= n:
+                break
+            oa, da = o[i0:i1, None], d[i0:i1, None]
+            ob, db = o[None, j0:], d[None, j0:]
+            if mode == "full":
+                p, w = _accumulate_pairs(oa, da, ob, db)
             else:
-                print("Unknown camera model ", els[1])
-            # fl = 0.5 * w / tan(0.5 * angle_x);
-            camera["camera_angle_x"] = math.atan(camera["w"] / (camera["fl_x"] * 2)) * 2
-            camera["camera_angle_y"] = math.atan(camera["h"] / (camera["fl_y"] * 2)) * 2
-            camera["fovx"] = camera["camera_angle_x"] * 180 / math.pi
-            camera["fovy"] = camera["camera_angle_y"] * 180 / math.pi
+                # keep only j > i inside the block
+                keep = np.arange(j0, n)[None, :] > np.arange(i0, i1)[:, None]
+                ia, ja = np.nonzero(keep)
+                p, w = _accumulate_pairs(oa[ia, 0], da[ia, 0], ob[0, ja], db[0, ja])
+            totp += p
+            totw += w
+    return totp, totw
+
+def cross_pair_sums(mats_a, mats_b, mem_mb=256):
+    """pair_sums over every pair (a, b) with a from mats_a and b from mats_b, each pair once."""
+    oa, da = _rays(mats_a)
+    ob, db = _rays(mats_b)
+    budget = max(1, int(mem_mb * 1024 * 1024) // _PAIR_BYTES)
+    rows = max(1, budget // max(len(ob), 1))
+    totp = np.zeros(3)
+    totw = 0.0
+    for i0 in range(0, len(oa), rows):
+        p, w = _accumulate_pairs(oa[i0:i0 + rows, None], da[i0:i0 + rows, None], ob[None], db[None])
+        totp += p
+        totw += w
+    return totp, totw
+
+def center_of_attention(mats, mode="upper", mem_mb=256, samples=1000000, seed=0):
+    """
+    Weighted average of the closest points between all pairs of camera rays (origin mats[:,0:3,3],
+    direction mats[:,0:3,2]), equal to the closest_point_2_lines double loop.
+    mode: "full" visits every ordered pair like the original loop, "upper" visits each unordered pair
+    once (the pair terms are symmetric, so the result is the same at half the cost), "sample" uses a
+    seeded random subset of `samples` pairs for very large scenes.
+    mem_mb caps the size of the temporaries of one block of pairs.
+    """
+    totp, totw = pair_sums(mats, mode, mem_mb, samples, seed)
+    if totw > 0.0:
+        totp /= totw
+    return totp
+
+def transforms_paths(out_path):
+    paths = {"all": out_path}
+    for kind in SPLIT_KEYWORDS:
+        path = out_path.replace("transforms.json", f"transforms_{kind}.json")
+        if path != out_path:  # an --out not named transforms.json has no subset files
+            paths[kind] = path
+    return paths
+
+def _frame_json(frame, compact, precision):
+    frame = dict(frame)
+    m = np.asarray(frame["transform_matrix"])
+    if precision is not None:
+        m = np.round(m, precision)
+        frame["sharpness"] = round(float(frame["sharpness"]), precision)
+    frame["transform_matrix"] = m.tolist()
+    if compact:
+        return json.dumps(frame, separators=(",", ":"))
+    # indented like json.dump(out, indent=2) places an element of out["frames"]
+    return "\n    ".join(json.dumps(frame, indent=2).split("\n"))
+
+def write_transforms(out_path, header, frames, compact=False, precision=None):
+    """
+    Stream `frames` once into transforms.json and its clutter/extra subsets. `header` is the output
+    dict without frames. Returns the frame numbers written per kind.
+    compact drops the indentation; precision rounds the matrices and sharpness to that many decimals.
+    """
+    header = dict(header)
+    header["frames"] = []
+    if compact:
+        head, tail = json.dumps(header, separators=(",", ":")).split("[]")
+        start, sep, close = "[", ",", "]"
+    else:
+        head, tail = json.dumps(header, indent=2).split("[]")
+        start, sep, close = "[\n    ", ",\n    ", "\n  ]"
+
+    index = {kind: [] for kind in ["all", *SPLIT_KEYWORDS]}
+    # every file is renamed into place only once all of them are complete
+    with ExitStack() as stack:
+        files = {kind: stack.enter_context(atomic_write(path)) for kind, path in transforms_paths(out_path).items()}
+        for i, frame in enumerate(frames):
+            text = _frame_json(frame, compact, precision)
+            for kind in frame_kinds(frame["file_path"]):
+                index[kind].append(i)
+                if kind in files:
+                    files[kind].write((sep if len(index[kind]) > 1 else head + start) + text)
+        for kind, f in files.items():
+            f.write(close + tail if index[kind] else head + "[]" + tail)
+    return index
+
+def write_pose_npz(out_path, c2w, file_paths, sharpness):
+    """Binary sidecar next to transforms.json: the (N,4,4) pose array plus a name index."""
+    npz_path = os.path.splitext(out_path)[0] + ".npz"
+    index = split_indices(file_paths)
+    with atomic_path(npz_path) as tmp:
+        np.savez(
+            tmp,
+            transform_matrix=np.asarray(c2w, dtype=np.float64),
+            file_path=np.array(file_paths, dtype=str),
+            sharpness=np.asarray(sharpness, dtype=np.float64),
+            **{f"{kind}_index": np.array(index[kind], dtype=np.int64) for kind in SPLIT_KEYWORDS},
+        )
+    return npz_path
+
+# per-frame state of the last run, used by --incremental
+STATE_NAME = "colmap2nerf_state.npz"
+STATE_VERSION = 2
+
+def save_state(path, params, names, c2w_raw, sharpness, up_sum, pair_mode, pair_p, pair_w, pair_R):
+    """
+    names/c2w_raw/sharpness per frame (c2w_raw as read from COLMAP, before any flip or rotation),
+    the summed up vectors and the pair sums of pair_sums() on pair_R @ c2w_raw ("" if they were not computed).
+    """
+    with atomic_path(path) as tmp:
+        np.savez(
+            tmp,
+            params=json.dumps({"version": STATE_VERSION, **params}, sort_keys=True),
+            names=np.array(names, dtype=str),
+            c2w_raw=np.asarray(c2w_raw, dtype=np.float64),
+            sharpness=np.asarray(sharpness, dtype=np.float64),
+            up_sum=np.asarray(up_sum, dtype=np.float64),
+            pair_mode=pair_mode,
+            pair_p=np.asarray(pair_p, dtype=np.float64),
+            pair_w=float(pair_w),
+            pair_R=np.asarray(pair_R, dtype=np.float64),
+        )
 
+def load_state(path, params):
+    """State of the last run if it exists and was written with the same params, else None."""
+    try:
+        with np.load(path) as z:
+            if json.loads(str(z["params"])) != {"version": STATE_VERSION, **params}:
+                print(f"[incremental] {path} was written with other parameters")
+                return None
+            return {k: z[k] for k in z.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+# ---------- library API ----------
+def parse_cameras(model_cameras, verbose=True):
+    """{camera_id: (model_name, width, height, params)} from colmap_model -> {camera_id: camera dict}"""
+    cameras = {}
+    for camera_id, (model_name, width, height, params) in model_cameras.items():
+        camera = camera_from_params(model_name, width, height, params)
+        if verbose:
             print(f"camera {camera_id}:\n\tres={camera['w'],camera['h']}\n\tcenter={camera['cx'],camera['cy']}\n\tfocal={camera['fl_x'],camera['fl_y']}\n\tfov={camera['fovx'],camera['fovy']}\n\tk={camera['k1'],camera['k2']} p={camera['p1'],camera['p2']} ")
-            cameras[camera_id] = camera
+        cameras[camera_id] = camera
+    return cameras
 
-    if len(cameras) == 0:
-        print("No cameras found!")
-        sys.exit(1)
+def parse_images(model_images, skip_early=0):
+    """
+    Frames of the model after skipping the first skip_early images: names (spaces joined with "_",
+    like the text export), camera ids, qvecs and tvecs as arrays.
+    """
+    return {
+        # names keep the text-export convention of joining spaces with "_"
+        "names": [n.replace(" ", "_") for n in model_images["names"][skip_early:]],
+        "camera_ids": model_images["camera_ids"][skip_early:],
+        "qvecs": model_images["qvecs"][skip_early:],
+        "tvecs": model_images["tvecs"][skip_early:],
+    }
 
-    with open(os.path.join(TEXT_FOLDER,"images.txt"), "r") as f:
-        i = 0
-        bottom = np.array([0.0, 0.0, 0.0, 1.0]).reshape([1, 4])
-        if len(cameras) == 1:
-            camera = cameras[camera_id]
-            out = {
-                "camera_angle_x": camera["camera_angle_x"],
-                "camera_angle_y": camera["camera_angle_y"],
-                "fl_x": camera["fl_x"],
-                "fl_y": camera["fl_y"],
-                "k1": camera["k1"],
-                "k2": camera["k2"],
-                "k3": camera["k3"],
-                "k4": camera["k4"],
-                "p1": camera["p1"],
-                "p2": camera["p2"],
-                "is_fisheye": camera["is_fisheye"],
-                "cx": camera["cx"],
-                "cy": camera["cy"],
-                "w": camera["w"],
-                "h": camera["h"],
-                "aabb_scale": AABB_SCALE,
-                "frames": [],
-            }
-        else:
-            out = {
-                "frames": [],
-                "aabb_scale": AABB_SCALE
-            }
-
-        up = np.zeros(3)
-        for line in f:
-            line = line.strip()
-            if line[0] == "#":
-                continue
-            i = i + 1
-            if i < SKIP_EARLY*2:
-                continue
-            if  i % 2 == 1:
-                elems=line.split(" ") # 1-4 is quat, 5-7 is trans, 9ff is filename (9, if filename contains no spaces)
-                #name = str(PurePosixPath(Path(IMAGE_FOLDER, elems[9])))
-                # why is this requireing a relitive path while using ^
-                image_rel = os.path.relpath(IMAGE_FOLDER)
-                name = str(f"./{image_rel}/{'_'.join(elems[9:])}")
-                relname = str(f"./undistortion_images/{'_'.join(elems[9:])}")
-                b = sharpness(name)
-                print(name, "sharpness=",b)
-                image_id = int(elems[0])
-                qvec = np.array(tuple(map(float, elems[1:5])))
-                tvec = np.array(tuple(map(float, elems[5:8])))
-                R = qvec2rotmat(-qvec)
-                t = tvec.reshape([3,1])
-                m = np.concatenate([np.concatenate([R, t], 1), bottom], 0)
-                c2w = np.linalg.inv(m)
-                if not args.keep_colmap_coords:
-                    c2w[0:3,2] *= -1 # flip the y and z axis
-                    c2w[0:3,1] *= -1
-                    c2w = c2w[[1,0,2,3],:]
-                    c2w[2,:] *= -1 # flip whole world upside down
-
-                    up += c2w[0:3,1]
-
-                frame = {"file_path":relname,"sharpness":b,"transform_matrix": c2w}
-                if len(cameras) != 1:
-                    frame.update(cameras[int(elems[8])])
-                out["frames"].append(frame)
-    nframes = len(out["frames"])
-
-    if args.keep_colmap_coords:
+def transforms_header(cameras, aabb_scale):
+    """transforms.json without frames: the shared intrinsics when there is a single camera."""
+    if len(cameras) == 1:
+        camera = next(iter(cameras.values()))
+        return {
+            "camera_angle_x": camera["camera_angle_x"],
+            "camera_angle_y": camera["camera_angle_y"],
+            "fl_x": camera["fl_x"],
+            "fl_y": camera["fl_y"],
+            "k1": camera["k1"],
+            "k2": camera["k2"],
+            "k3": camera["k3"],
+            "k4": camera["k4"],
+            "p1": camera["p1"],
+            "p2": camera["p2"],
+            "is_fisheye": camera["is_fisheye"],
+            "cx": camera["cx"],
+            "cy": camera["cy"],
+            "w": camera["w"],
+            "h": camera["h"],
+            "aabb_scale": aabb_scale,
+            "frames": [],
+        }
+    return {
+        "frames": [],
+        "aabb_scale": aabb_scale
+    }
+
+def match_previous(prev, names, c2w_raw, verbose=True):
+    """
+    Index of every frame in the previous state (-1 for new frames), or None when the previous state
+    cannot be extended (frames disappeared or existing poses changed).
+    """
+    prev_pos = {n: i for i, n in enumerate(prev["names"].tolist())}
+    idx_prev = np.array([prev_pos.get(n, -1) for n in names], dtype=np.int64)
+    is_old = idx_prev >= 0
+    if int(is_old.sum()) != len(prev_pos):
+        if verbose:
+            print(f"[incremental] {len(prev_pos) - int(is_old.sum())} frames of the last run are gone, doing a full run")
+        return None
+    if not np.array_equal(c2w_raw[is_old], prev["c2w_raw"][idx_prev[is_old]]):
+        if verbose:
+            print("[incremental] poses of existing frames changed (model was re-adjusted), doing a full run")
+        return None
+    if verbose:
+        print(f"[incremental] {int(is_old.sum())} frames reused, {int((~is_old).sum())} new")
+    return idx_prev
+
+def normalize_scene(c2w_raw, keep_colmap_coords=False, center_mode="upper", center_mem_mb=256, center_samples=1000000,
+                    prev=None, is_new=None, verbose=True):
+    """
+    Poses from poses_from_colmap -> transforms.json frame: either COLMAP's frame with flipped cameras, or
+    rotated so the mean up vector is +z, centered on the center of attention and scaled to an average
+    camera distance of 4. With prev (a load_state dict) and the mask of new frames, the up vector and pair
+    sums only add the new frames. Returns (c2w, sums) where sums holds up_sum, pair_mode, pair_p, pair_w
+    and pair_R, the rotation the pair sums were taken after.
+    """
+    say = print if verbose else (lambda *a, **k: None)
+    c2w = np.array(c2w_raw, dtype=np.float64)
+    up_sum = c2w_raw[is_new,0:3,1].sum(0) + prev["up_sum"] if prev is not None else c2w_raw[:,0:3,1].sum(0)
+    sums = {"up_sum": up_sum, "pair_mode": "", "pair_p": np.zeros(3), "pair_w": 0.0, "pair_R": np.eye(3)}
+    if keep_colmap_coords:
         flip_mat = np.array([
             [1, 0, 0, 0],
             [0, -1, 0, 0],
@@ -370,70 +767,94 @@ if __name__ == "__main__":
             [0, 0, 0, 1]
         ])
 
-        for f in out["frames"]:
-            f["transform_matrix"] = np.matmul(f["transform_matrix"], flip_mat) # flip cameras (it just works)
+        return c2w @ flip_mat, sums # flip cameras (it just works)
+
+    # don't keep colmap coords - reorient the scene to be easier to work with
+    up = up_sum / np.linalg.norm(up_sum)
+    say("up vector was", up)
+    R = rotmat(up,[0,0,1]) # rotate up vector to [0,0,1]
+    R = np.pad(R,[0,1])
+    R[-1, -1] = 1
+
+    c2w = R @ c2w # rotate up to be the z axis
+
+    # find a central point they are all looking at, in the rotated frame like the full solve always did.
+    # The sums of the last --incremental run were taken after its own rotation pair_R; moving them to this
+    # frame is exact only if that change of frame is orthonormal (rotmat's 1e-10 guard bends R when up
+    # is close to +-z), otherwise every pair is recomputed
+    say(f"computing center of attention ({center_mode})...")
+    mem_mb = float(center_mem_mb)
+    reuse = prev is not None and str(prev["pair_mode"]) == center_mode and center_mode in ("full", "upper")
+    if reuse:
+        T = R[0:3,0:3] @ np.linalg.inv(prev["pair_R"])
+        reuse = np.abs(T @ T.T - np.eye(3)).max() < 1e-9
+        if not reuse:
+            say("[incremental] up vector too close to +-z to move the stored pair sums, recomputing all pairs")
+    if reuse:
+        new, old = c2w[is_new], c2w[~is_new]
+        cp, cw = cross_pair_sums(new, old, mem_mb)
+        new_p, new_w = pair_sums(new, center_mode, mem_mb)
+        k = 2 if center_mode == "full" else 1 # full visits both orders of a pair
+        pair_p, pair_w = T @ prev["pair_p"] + k * cp + new_p, float(prev["pair_w"]) + k * cw + new_w
     else:
-        # don't keep colmap coords - reorient the scene to be easier to work with
-
-        up = up / np.linalg.norm(up)
-        print("up vector was", up)
-        R = rotmat(up,[0,0,1]) # rotate up vector to [0,0,1]
-        R = np.pad(R,[0,1])
-        R[-1, -1] = 1
-
-        for f in out["frames"]:
-            f["transform_matrix"] = np.matmul(R, f["transform_matrix"]) # rotate up to be the z axis
-
-        # find a central point they are all looking at
-        print("computing center of attention...")
-        totw = 0.0
-        totp = np.array([0.0, 0.0, 0.0])
-        for f in out["frames"]:
-            mf = f["transform_matrix"][0:3,:]
-            for g in out["frames"]:
-                mg = g["transform_matrix"][0:3,:]
-                p, w = closest_point_2_lines(mf[:,3], mf[:,2], mg[:,3], mg[:,2])
-                if w > 0.00001:
-                    totp += p*w
-                    totw += w
-        if totw > 0.0:
-            totp /= totw
-        print(totp) # the cameras are looking at totp
-        for f in out["frames"]:
-            f["transform_matrix"][0:3,3] -= totp
-
-        avglen = 0.
-        for f in out["frames"]:
-            avglen += np.linalg.norm(f["transform_matrix"][0:3,3])
-        avglen /= nframes
-        print("avg camera distance from origin", avglen)
-        for f in out["frames"]:
-            f["transform_matrix"][0:3,3] *= 4.0 / avglen # scale to "nerf sized"
-
-    for f in out["frames"]:
-        f["transform_matrix"] = f["transform_matrix"].tolist()
-    print(nframes,"frames")
-    print(f"writing {OUT_PATH}")
-    with open(OUT_PATH, "w") as outfile:
-        json.dump(out, outfile, indent=2)
-
-    frames_clutter = [out["frames"][i] for i in range(len(out["frames"])) if "clutter_" in out["frames"][i]["file_path"]]
-    frames_extra = [out["frames"][i] for i in range(len(out["frames"])) if "extra_" in out["frames"][i]["file_path"]]
-
-    OUT_PATH_CLUTTER = OUT_PATH.replace("transforms.json", "transforms_clutter.json")
-    OUT_PATH_EXTRA = OUT_PATH.replace("transforms.json", "transforms_extra.json")
-    
-    out["frames"] = frames_clutter
-    print(f"writing {OUT_PATH_CLUTTER}")
-    with open(OUT_PATH_CLUTTER, "w") as outfile:
-        json.dump(out, outfile, indent=2)
-    out["frames"] = frames_extra
-    print(f"writing {OUT_PATH_EXTRA}")
-    with open(OUT_PATH_EXTRA, "w") as outfile:
-        json.dump(out, outfile, indent=2)
-
-
-    if len(args.mask_categories) > 0:
+        pair_p, pair_w = pair_sums(c2w, center_mode, mem_mb, int(center_samples))
+    sums.update(pair_mode=center_mode if center_mode in ("full", "upper") else "", pair_p=pair_p, pair_w=pair_w,
+                pair_R=R[0:3,0:3])
+    totp = pair_p / pair_w if pair_w > 0.0 else pair_p
+    say(totp) # the cameras are looking at totp
+    c2w[:,0:3,3] -= totp
+
+    avglen = np.linalg.norm(c2w[:,0:3,3], axis=1).mean()
+    say("avg camera distance from origin", avglen)
+    c2w[:,0:3,3] *= 4.0 / avglen # scale to "nerf sized"
+    return c2w, sums
+
+def serialize(out_path, header, file_paths, names, c2w, sharpness, cameras=None, camera_ids=None,
+              compact=False, precision=None, npz=False, verbose=True):
+    """
+    Write transforms.json, its clutter/extra subsets, transforms_summary.json, split.json/split_index.json
+    and optionally transforms.npz. cameras/camera_ids add per-frame intrinsics (multi-camera models).
+    Returns the frame indices per kind.
+    """
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+
+    def iter_frames():
+        for k in range(len(c2w)):
+            frame = {"file_path":file_paths[k],"sharpness":sharpness[k],"transform_matrix": c2w[k]}
+            if cameras is not None and len(cameras) != 1:
+                frame.update(cameras[int(camera_ids[k])])
+            yield frame
+
+    index = write_transforms(out_path, header, iter_frames(), compact=compact, precision=precision)
+    write_summary(out_dir, transforms_paths(out_path), {kind: len(v) for kind, v in index.items()})
+    split_path, index_path, split_counts = write_split(out_dir, names, index)
+    if verbose:
+        for kind, path in transforms_paths(out_path).items():
+            print(f"wrote {path} ({len(index[kind])} frames)")
+        print(f"wrote {split_path} and {index_path} (train={split_counts['train']} | test={split_counts['test']})")
+    if npz:
+        npz_path = write_pose_npz(out_path, c2w, file_paths, sharpness)
+        if verbose:
+            print(f"wrote {npz_path}")
+    return index
+
+MASK_PREFIX = "dynamic_mask_"
+# categories the masks of a folder were made with; a change invalidates them all
+MASK_INDEX_NAME = MASK_PREFIX + "categories.json"
+
+def mask_path(file_path):
+    p = Path(file_path)
+    return str(p.parent / (MASK_PREFIX + p.stem + ".png"))
+
+class MaskPredictor:
+    """
+    detectron2 Mask R-CNN (COCO) with batched inference. prepare() does the resize of
+    DefaultPredictor and runs in the decode threads; calling the predictor on a list of prepared
+    inputs returns (classes (N,), masks (N,H,W) bool) per image at the original resolution.
+    Any object with the same two methods can stand in for it (e.g. a stub in tests).
+    """
+
+    def __init__(self, device="auto", score_thresh=0.5):
         # Check if detectron2 is installed. If not, install it.
         try:
             import detectron2
@@ -451,32 +872,243 @@ if __name__ == "__main__":
             import detectron2
 
         import torch
-        from pathlib import Path
         from detectron2.config import get_cfg
         from detectron2 import model_zoo
-        from detectron2.engine import DefaultPredictor
-
-        category2id = json.load(open(os.path.join(SCRIPTS_FOLDER, "category2id.json"), "r"))
-        mask_ids = [category2id[c] for c in args.mask_categories]
+        from detectron2.modeling import build_model
+        from detectron2.checkpoint import DetectionCheckpointer
+        import detectron2.data.transforms as T
 
         cfg = get_cfg()
         # Add project-specific config (e.g., TensorMask) here if you're not running a model in detectron2's core library
         cfg.merge_from_file(model_zoo.get_config_file("COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml"))
-        cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = 0.5  # set threshold for this model
+        cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = score_thresh  # set threshold for this model
         # Find a model from detectron2's model zoo.
         cfg.MODEL.WEIGHTS = model_zoo.get_checkpoint_url("COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml")
-        predictor = DefaultPredictor(cfg)
+        cfg.MODEL.DEVICE = ("cuda" if torch.cuda.is_available() else "cpu") if device == "auto" else device
+        self.torch = torch
+        self.model = build_model(cfg)
+        self.model.eval()
+        DetectionCheckpointer(self.model).load(cfg.MODEL.WEIGHTS)
+        self.aug = T.ResizeShortestEdge([cfg.INPUT.MIN_SIZE_TEST] * 2, cfg.INPUT.MAX_SIZE_TEST)
+        self.rgb = cfg.INPUT.FORMAT == "RGB"
+
+    def prepare(self, img):
+        """BGR image as read by cv2 -> model input."""
+        h, w = img.shape[:2]
+        if self.rgb:
+            img = img[:, :, ::-1]
+        img = self.aug.get_transform(img).apply_image(img)
+        return {"image": self.torch.as_tensor(np.ascontiguousarray(img.transpose(2, 0, 1)).astype("float32")), "height": h, "width": w}
+
+    def __call__(self, inputs):
+        with self.torch.no_grad():
+            outputs = self.model(inputs)
+        # one device -> host transfer per image for the classes and the masks
+        return [(o["instances"].pred_classes.cpu().numpy(), o["instances"].pred_masks.cpu().numpy()) for o in outputs]
+
+def mask_frames(file_paths, mask_categories, batch_size=4, workers=4, predictor=None, overwrite=False, verbose=True):
+    """
+    Write dynamic_mask_<name>.png next to every image with the given detectron2 categories masked.
+    Pipelined: a thread pool decodes (and prepares) the next images while the current batch is in
+    the model, and another one encodes and writes the finished masks. Masks newer than their image,
+    made with the same categories, are kept. Returns the number of masks written.
+    """
+    import cv2
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    category2id = json.load(open(os.path.join(scripts_folder(), "category2id.json"), "r"))
+    mask_ids = np.array([category2id[c] for c in mask_categories])
+    categories = sorted(mask_categories)
+
+    # folders whose masks were made with other categories are redone entirely
+    stale_dirs = set()
+    for d in {os.path.dirname(p) for p in file_paths}:
+        try:
+            with open(os.path.join(d, MASK_INDEX_NAME)) as f:
+                if json.load(f).get("categories") != categories:
+                    stale_dirs.add(d)
+        except (OSError, ValueError):
+            stale_dirs.add(d)
+
+    def is_current(p):
+        if overwrite or os.path.dirname(p) in stale_dirs:
+            return False
+        try:
+            return os.stat(mask_path(p)).st_mtime_ns >= os.stat(p).st_mtime_ns
+        except FileNotFoundError:
+            return False
 
-        for frame in out["frames"]:
-            img = cv2.imread(frame["file_path"])
-            outputs = predictor(img)
+    todo = [p for p in file_paths if not is_current(p)]
+    if verbose:
+        print(f"masks: {len(file_paths) - len(todo)} up to date, {len(todo)} to compute (batch={batch_size}, workers={workers})")
+    if todo and predictor is None:
+        predictor = MaskPredictor()
 
-            output_mask = np.zeros((img.shape[0], img.shape[1]))
-            for i in range(len(outputs["instances"])):
-                if outputs["instances"][i].pred_classes.cpu().numpy()[0] in mask_ids:
-                    pred_mask = outputs["instances"][i].pred_masks.cpu().numpy()[0]
-                    output_mask = np.logical_or(output_mask, pred_mask)
+    def load(p):
+        img = cv2.imread(p)
+        if img is None:
+            raise ValueError(f"cannot decode {p}")
+        return img.shape[:2], predictor.prepare(img)
 
-            rgb_path = Path(frame["file_path"])
-            mask_name = str(rgb_path.parents[0] / Path("dynamic_mask_" + rgb_path.name.replace(".jpg", ".png")))
-            cv2.imwrite(mask_name, (output_mask*255).astype(np.uint8))
+    def save(p, mask):
+        with atomic_path(mask_path(p)) as tmp:
+            if not cv2.imwrite(tmp, mask.astype(np.uint8) * 255):
+                raise OSError(f"cannot write {mask_path(p)}")
+
+    batch_size = max(1, int(batch_size))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as decode, ThreadPoolExecutor(max_workers=max(1, workers)) as write:
+        # keep two batches of decodes in flight ahead of the model
+        pending = deque()
+        queue = iter(todo)
+        writes = []
+        for p in queue:
+            pending.append((p, decode.submit(load, p)))
+            if len(pending) >= 2 * batch_size:
+                break
+        while pending:
+            batch = [pending.popleft() for _ in range(min(batch_size, len(pending)))]
+            for p in queue:
+                pending.append((p, decode.submit(load, p)))
+                if len(pending) >= 2 * batch_size:
+                    break
+            loaded = [(p, *fut.result()) for p, fut in batch]
+            for (p, shape, _), (classes, masks) in zip(loaded, predictor([inp for _, _, inp in loaded])):
+                keep = np.isin(classes, mask_ids)
+                mask = masks[keep].any(axis=0) if keep.any() else np.zeros(shape, dtype=bool)
+                writes.append(write.submit(save, p, mask))
+        for fut in writes:
+            fut.result()
+
+    for d in {os.path.dirname(p) for p in file_paths}:
+        write_json_atomic(os.path.join(d, MASK_INDEX_NAME), {"categories": categories})
+    return len(todo)
+
+def convert(images, model_dir, out_path, aabb_scale=32, skip_early=0, keep_colmap_coords=False, model_format="auto",
+            center_mode="upper", center_mem_mb=256, center_samples=1000000, sharpness_workers=8, sharpness_reduce=1,
+            sharpness_cache=True, compact=False, float_precision=None, npz=False, incremental=False,
+            mask_categories=(), mask_batch=4, mask_workers=4, mask_predictor=None, verbose=True, telemetry=None):
+    """
+    COLMAP model folder (bin or txt) + image folder -> transforms.json and its sidecars, in-process.
+    Same options as the command line. Returns a dict with the frame names, file paths, normalized
+    c2w (N,4,4), sharpness and the frame indices per kind. With a telemetry.Telemetry, every phase
+    (cameras, images, sharpness, center, write, mask) is recorded. Pass a MaskPredictor as
+    mask_predictor to reuse one loaded model across scenes.
+    """
+    say = print if verbose else (lambda *a, **k: None)
+    phase = telemetry.phase if telemetry is not None else (lambda name, **extra: nullcontext({}))
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    say(f"outputting to {out_path}...")
+    if model_format == "auto":
+        model_format = detect_model_format(model_dir)
+    say(f"reading {model_format} model from {model_dir}")
+    with phase("cameras", format=model_format):
+        cameras = parse_cameras(read_model_cameras(model_dir, model_format), verbose)
+    if len(cameras) == 0:
+        raise ValueError(f"No cameras found in {model_dir}")
+    header = transforms_header(cameras, int(aabb_scale))
+
+    with phase("images", format=model_format) as rec:
+        frames = parse_images(read_model_images(model_dir, model_format), int(skip_early))
+        names = frames["names"]
+        image_rel = os.path.relpath(images)
+        #name = str(PurePosixPath(Path(IMAGE_FOLDER, image_name)))
+        # why is this requireing a relitive path while using ^
+        image_paths = [str(f"./{image_rel}/{n}") for n in names]
+        relnames = [str(f"./undistortion_images/{n}") for n in names]
+        c2w_raw = poses_from_colmap(frames["qvecs"], frames["tvecs"], keep_colmap_coords)
+        rec["files"] = len(names)
+
+    # incremental: reuse the last run's per-frame state when the frames it saw are unchanged
+    state_path = os.path.join(out_dir, STATE_NAME)
+    state_params = {"skip_early": str(skip_early), "keep_colmap_coords": str(keep_colmap_coords), "sharpness_reduce": str(sharpness_reduce),
+                    "center_mode": str(center_mode), "center_samples": str(center_samples)}
+    prev = load_state(state_path, state_params) if incremental else None
+    idx_prev = match_previous(prev, names, c2w_raw, verbose) if prev is not None else None
+    if idx_prev is None:
+        prev = None
+    is_new = idx_prev < 0 if prev is not None else np.ones(len(names), dtype=bool)
+
+    cache_path = os.path.join(out_dir, "sharpness_cache.json") if sharpness_cache else None
+    with phase("sharpness", files=int(is_new.sum()), reduce=int(sharpness_reduce)):
+        scores = np.empty(len(names))
+        if prev is not None:
+            scores[~is_new] = prev["sharpness"][idx_prev[~is_new]]
+        scores[is_new] = compute_sharpness([p for p, new in zip(image_paths, is_new) if new], workers=int(sharpness_workers),
+                                           reduce=int(sharpness_reduce), cache_path=cache_path, verbose=verbose)
+        scores = scores.tolist()
+    if verbose:
+        for name, b in zip(image_paths, scores):
+            print(name, "sharpness=",b)
+
+    with phase("center", mode=center_mode, frames=len(names), new=int(is_new.sum())):
+        c2w, sums = normalize_scene(c2w_raw, keep_colmap_coords, center_mode, center_mem_mb, center_samples,
+                                    prev=prev, is_new=is_new, verbose=verbose)
+
+    say(len(c2w),"frames")
+    with phase("write", frames=len(names)):
+        save_state(state_path, state_params, names, c2w_raw, scores, **sums)
+        index = serialize(out_path, header, relnames, names, c2w, scores, cameras, frames["camera_ids"],
+                          compact=compact, precision=float_precision, npz=npz, verbose=verbose)
+
+    if len(mask_categories) > 0:
+        # only the extra (Clean) frames are masked, as always; masks of unchanged frames are kept,
+        # so incremental and repeated runs only mask new images
+        mask_paths = [image_paths[i] for i in index["extra"]]
+        with phase("mask", files=len(mask_paths)) as rec:
+            rec["computed"] = mask_frames(mask_paths, mask_categories, batch_size=mask_batch, workers=mask_workers,
+                                          predictor=mask_predictor, verbose=verbose)
+
+    return {"names": names, "file_paths": relnames, "c2w": c2w, "sharpness": scores, "index": index}
+
+# ---------- main ----------
+def main():
+    args = parse_args()
+    if args.video_in != "":
+        run_ffmpeg(args)
+    if args.run_colmap:
+        run_colmap(args)
+    IMAGE_FOLDER = args.images
+    TEXT_FOLDER = args.text
+    OUT_PATH = args.out
+
+    OUT_DIR = os.path.dirname(os.path.abspath(OUT_PATH))
+    tel = Telemetry(os.path.join(OUT_DIR, LOG_NAME), scene_name(OUT_DIR), "colmap2nerf")
+    # one conversion per output folder at a time; a second run waits and then finds the cache up to date
+    with tel.phase() as rec, stage_lock(OUT_DIR, "colmap2nerf"):
+        cache_outputs = list(transforms_paths(OUT_PATH).values()) + [os.path.join(OUT_DIR, n) for n in (SPLIT_NAME, SPLIT_INDEX_NAME, SUMMARY_NAME)] + ([os.path.splitext(OUT_PATH)[0] + ".npz"] if args.npz else [])
+        cache_inputs = {
+            "model": fingerprint_files([os.path.join(TEXT_FOLDER, n) for n in ("cameras.bin", "images.bin", "cameras.txt", "images.txt")], content=False),
+            "images": fingerprint_tree(IMAGE_FOLDER, exclude_prefix=("dynamic_mask_",)),
+            "params": {k: getattr(args, k) for k in ("aabb_scale", "skip_early", "keep_colmap_coords", "model_format", "center_mode", "center_mem_mb", "center_samples",
+                                                       "sharpness_reduce", "compact", "float_precision", "npz", "mask_categories")},
+            "tools": tool_versions(__file__, *(os.path.join(os.path.dirname(os.path.abspath(__file__)), m) for m in ("colmap_model.py", "scene_split.py", "transforms_summary.py")), modules=("numpy", "cv2")),
+        }
+        cache = StageCache(OUT_DIR, "colmap2nerf")
+        if cache.check(cache_inputs, cache_outputs, force=args.force, explain=args.explain):
+            rec["cached"] = True
+            sys.exit(0)
+
+        # Check that we can save the output before we do a lot of work (without creating or touching it)
+        try:
+            check_writable(OUT_PATH)
+        except OSError as e:
+            print(f"Could not save transforms JSON to {OUT_PATH}: {e}")
+            sys.exit(1)
+
+        try:
+            convert(IMAGE_FOLDER, TEXT_FOLDER, OUT_PATH,
+                    aabb_scale=int(args.aabb_scale), skip_early=int(args.skip_early), keep_colmap_coords=args.keep_colmap_coords,
+                    model_format=args.model_format, center_mode=args.center_mode, center_mem_mb=float(args.center_mem_mb),
+                    center_samples=int(args.center_samples), sharpness_workers=int(args.sharpness_workers),
+                    sharpness_reduce=int(args.sharpness_reduce), sharpness_cache=not args.no_sharpness_cache,
+                    compact=args.compact, float_precision=None if args.float_precision == "" else int(args.float_precision),
+                    npz=args.npz, incremental=args.incremental, mask_categories=args.mask_categories,
+                    mask_batch=int(args.mask_batch), mask_workers=int(args.mask_workers), telemetry=tel)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        cache.record(cache_inputs, cache_outputs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import sqlite3
+from pathlib import Path
+from contextlib import closing
+
+# ---------- config ----------
+DB_NAME = "database.db"
+
+# ---------- helpers ----------
+def connect(db_path, readonly: bool = True):
+    """sqlite connection to a COLMAP database.db; read-only by default so a running COLMAP is not disturbed."""
+    db_path = Path(db_path).resolve()
+    return sqlite3.connect(f"file:{db_path}?mode={'ro' if readonly else 'rwc'}", uri=True, timeout=30)
+
+def has_table(conn, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone() is not None
+
+# ---------- queries ----------
+def image_names(db_path) -> list:
+    """Image names registered in the database (relative to the image_path of the extraction), by image_id."""
+    with closing(connect(db_path)) as conn:
+        if not has_table(conn, "images"):
+            return []
+        return [r[0] for r in conn.execute("SELECT name FROM images ORDER BY image_id")]
+
+def extracted_names(db_path) -> set:
+    """Names of the images that have both keypoints and descriptors, i.e. need no extraction."""
+    if not Path(db_path).is_file():
+        return set()
+    with closing(connect(db_path)) as conn:
+        if not all(has_table(conn, t) for t in ("images", "keypoints", "descriptors")):
+            return set()
+        return {r[0] for r in conn.execute(
+            "SELECT i.name FROM images i JOIN keypoints k ON k.image_id = i.image_id "
+            "JOIN descriptors d ON d.image_id = i.image_id")}
+
+def table_names(db_path) -> set:
+    with closing(connect(db_path)) as conn:
+        return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+# ---------- merge ----------
+# tables of the database layout merge_features understands (COLMAP <= 3.11); newer layouts add rigs/frames
+MERGEABLE_TABLES = {"cameras", "images", "keypoints", "descriptors", "matches", "two_view_geometries", "pose_priors", "sqlite_sequence"}
+
+def _columns(conn, table: str, schema: str = "main") -> list:
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+def merge_features(main_db, shard_db, single_camera: bool = True) -> int:
+    """
+    Copy the images of shard_db that have keypoints and descriptors into main_db, with their camera
+    (or onto main_db's camera when single_camera and it has one). Images already complete in main_db
+    are left alone; partial leftovers of an interrupted run are replaced. Returns the images copied.
+    """
+    with closing(connect(main_db, readonly=False)) as conn:
+        conn.execute("ATTACH DATABASE ? AS shard", (f"file:{Path(shard_db).resolve()}?mode=ro",))
+        cam_cols = [c for c in _columns(conn, "cameras") if c != "camera_id" and c in _columns(conn, "cameras", "shard")]
+        img_cols = [c for c in _columns(conn, "images") if c not in ("image_id", "camera_id") and c in _columns(conn, "images", "shard")]
+        done = {r[0] for r in conn.execute(
+            "SELECT i.name FROM images i JOIN keypoints k ON k.image_id = i.image_id JOIN descriptors d ON d.image_id = i.image_id")}
+        first_camera = conn.execute("SELECT MIN(camera_id) FROM cameras").fetchone()[0]
+
+        camera_map = {}
+        copied = 0
+        with conn:  # one transaction: a failed merge leaves main_db as it was
+            rows = conn.execute(
+                "SELECT i.image_id, i.camera_id, i.name FROM shard.images i JOIN shard.keypoints k ON k.image_id = i.image_id "
+                "JOIN shard.descriptors d ON d.image_id = i.image_id ORDER BY i.image_id").fetchall()
+            for shard_id, shard_cam, name in rows:
+                if name in done:
+                    continue
+                if shard_cam not in camera_map:
+                    if single_camera and first_camera is not None:
+                        camera_map[shard_cam] = first_camera
+                    else:
+                        cur = conn.execute(f"INSERT INTO cameras ({', '.join(cam_cols)}) SELECT {', '.join(cam_cols)} "
+                                           "FROM shard.cameras WHERE camera_id = ?", (shard_cam,))
+                        camera_map[shard_cam] = cur.lastrowid
+                        if first_camera is None:
+                            first_camera = cur.lastrowid
+                row = conn.execute("SELECT image_id FROM images WHERE name = ?", (name,)).fetchone()
+                if row is not None:
+                    image_id = row[0]
+                    conn.execute("UPDATE images SET camera_id = ? WHERE image_id = ?", (camera_map[shard_cam], image_id))
+                    conn.execute("DELETE FROM keypoints WHERE image_id = ?", (image_id,))
+                    conn.execute("DELETE FROM descriptors WHERE image_id = ?", (image_id,))
+                else:
+                    cur = conn.execute(f"INSERT INTO images ({', '.join(img_cols)}, camera_id) SELECT {', '.join(img_cols)}, ? "
+                                       "FROM shard.images WHERE image_id = ?", (camera_map[shard_cam], shard_id))
+                    image_id = cur.lastrowid
+                for table in ("keypoints", "descriptors"):
+                    cols = [c for c in _columns(conn, table) if c != "image_id"]
+                    conn.execute(f"INSERT INTO {table} (image_id, {', '.join(cols)}) SELECT ?, {', '.join(cols)} "
+                                 f"FROM shard.{table} WHERE image_id = ?", (image_id, shard_id))
+                copied += 1
+        conn.execute("DETACH DATABASE shard")
+    return copied
@@ -0,0 +1,257 @@
+import os
+import mmap
+import struct
+
+import numpy as np
+
+# ---------- config ----------
+# model_id -> (model_name, num_params), see colmap/src/colmap/sensor/models.h
+CAMERA_MODELS = {
+    0: ("SIMPLE_PINHOLE", 3),
+    1: ("PINHOLE", 4),
+    2: ("SIMPLE_RADIAL", 4),
+    3: ("RADIAL", 5),
+    4: ("OPENCV", 8),
+    5: ("OPENCV_FISHEYE", 8),
+    6: ("FULL_OPENCV", 12),
+    7: ("FOV", 5),
+    8: ("SIMPLE_RADIAL_FISHEYE", 4),
+    9: ("RADIAL_FISHEYE", 5),
+    10: ("THIN_PRISM_FISHEYE", 12),
+}
+
+# one (x, y, point3D_id) observation in images.bin
+POINT2D_BYTES = struct.calcsize("<ddq")
+IMAGE_HEADER = struct.Struct("<I4d3dI")
+
+# ---------- helpers ----------
+def _map(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _empty_images():
+    return {
+        "image_ids": np.zeros(0, dtype=np.int64),
+        "qvecs": np.zeros((0, 4)),
+        "tvecs": np.zeros((0, 3)),
+        "camera_ids": np.zeros(0, dtype=np.int64),
+        "names": [],
+    }
+
+# ---------- binary ----------
+def read_cameras_binary(path):
+    """cameras.bin -> {camera_id: (model_name, width, height, params)}"""
+    cameras = {}
+    buf = _map(path)
+    if not buf:
+        return cameras
+    try:
+        (num,) = struct.unpack_from("<Q", buf, 0)
+        off = 8
+        for _ in range(num):
+            camera_id, model_id, width, height = struct.unpack_from("<iiQQ", buf, off)
+            off += 24
+            model_name, n = CAMERA_MODELS[model_id]
+            params = struct.unpack_from(f"<{n}d", buf, off)
+            off += 8 * n
+            cameras[camera_id] = (model_name, width, height, params)
+    finally:
+        buf.close()
+    return cameras
+
+def read_images_binary(path):
+    """
+    images.bin -> dict of arrays (image_ids, qvecs, tvecs, camera_ids) plus names, in file order.
+    The 2D point observations of every image are skipped without being read.
+    """
+    buf = _map(path)
+    if not buf:
+        return _empty_images()
+    try:
+        (num,) = struct.unpack_from("<Q", buf, 0)
+        image_ids = np.empty(num, dtype=np.int64)
+        camera_ids = np.empty(num, dtype=np.int64)
+        poses = np.empty((num, 7))
+        names = []
+        off = 8
+        for k in range(num):
+            rec = IMAGE_HEADER.unpack_from(buf, off)
+            image_ids[k] = rec[0]
+            poses[k] = rec[1:8]
+            camera_ids[k] = rec[8]
+            off += IMAGE_HEADER.size
+            end = buf.find(b"\x00", off)
+            names.append(buf[off:end].decode("utf-8"))
+            off = end + 1
+            (num_points2d,) = struct.unpack_from("<Q", buf, off)
+            off += 8 + num_points2d * POINT2D_BYTES
+    finally:
+        buf.close()
+    return {
+        "image_ids": image_ids,
+        "qvecs": poses[:, 0:4],
+        "tvecs": poses[:, 4:7],
+        "camera_ids": camera_ids,
+        "names": names,
+    }
+
+def read_image_names_binary(path):
+    """images.bin -> image names in file order. Only the name records are decoded."""
+    buf = _map(path)
+    if not buf:
+        return []
+    names = []
+    try:
+        (num,) = struct.unpack_from("<Q", buf, 0)
+        off = 8
+        for _ in range(num):
+            off += IMAGE_HEADER.size
+            end = buf.find(b"\x00", off)
+            names.append(buf[off:end].decode("utf-8"))
+            (num_points2d,) = struct.unpack_from("<Q", buf, end + 1)
+            off = end + 9 + num_points2d * POINT2D_BYTES
+    finally:
+        buf.close()
+    return names
+
+# ---------- text ----------
+def read_cameras_text(path):
+    """cameras.txt -> {camera_id: (model_name, width, height, params)}"""
+    cameras = {}
+    with open(path, "r") as f:
+        for line in f:
+            # 1 OPENCV 3840 2160 3178.27 3182.09 1920 1080 0.159668 -0.231286 -0.00123982 0.00272224
+            if line[0] == "#" or not line.strip():
+                continue
+            els = line.split()
+            cameras[int(els[0])] = (els[1], int(els[2]), int(els[3]), tuple(map(float, els[4:])))
+    return cameras
+
+def read_images_text(path):
+    """images.txt -> same layout as read_images_binary; the POINTS2D lines are skipped."""
+    image_ids, camera_ids, poses, names = [], [], [], []
+    with open(path, "r") as f:
+        is_pose_line = True
+        for line in f:
+            if line[0] == "#":
+                continue
+            if is_pose_line:
+                # IMAGE_ID QW QX QY QZ TX TY TZ CAMERA_ID NAME
+                elems = line.strip().split(" ")
+                image_ids.append(int(elems[0]))
+                poses.append(tuple(map(float, elems[1:8])))
+                camera_ids.append(int(elems[8]))
+                names.append(" ".join(elems[9:]))
+            is_pose_line = not is_pose_line
+    if not names:
+        return _empty_images()
+    poses = np.array(poses)
+    return {
+        "image_ids": np.array(image_ids, dtype=np.int64),
+        "qvecs": poses[:, 0:4],
+        "tvecs": poses[:, 4:7],
+        "camera_ids": np.array(camera_ids, dtype=np.int64),
+        "names": names,
+    }
+
+def read_image_names_text(path):
+    """images.txt -> image names in file order."""
+    names = []
+    with open(path, "r") as f:
+        is_pose_line = True
+        for line in f:
+            if line[0] == "#":
+                continue
+            if is_pose_line:
+                names.append(" ".join(line.strip().split(" ")[9:]))
+            is_pose_line = not is_pose_line
+    return names
+
+# ---------- writers ----------
+# the inverse of the readers above, used to build synthetic models (bench_pipeline.py)
+MODEL_IDS = {name: model_id for model_id, (name, _) in CAMERA_MODELS.items()}
+
+def write_cameras_binary(path, cameras):
+    """{camera_id: (model_name, width, height, params)} -> cameras.bin"""
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(cameras)))
+        for camera_id, (model_name, width, height, params) in cameras.items():
+            f.write(struct.pack("<iiQQ", camera_id, MODEL_IDS[model_name], width, height))
+            f.write(struct.pack(f"<{len(params)}d", *params))
+
+def write_images_binary(path, images, points2d=None):
+    """
+    read_images_binary layout -> images.bin. points2d: optional list of (N, 3) arrays (x, y, point3D_id)
+    per image; without it every image is written with no observations.
+    """
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(images["names"])))
+        for k, name in enumerate(images["names"]):
+            f.write(IMAGE_HEADER.pack(int(images["image_ids"][k]), *images["qvecs"][k], *images["tvecs"][k],
+                                      int(images["camera_ids"][k])))
+            f.write(name.encode("utf-8") + b"\x00")
+            pts = np.zeros((0, 3)) if points2d is None else points2d[k]
+            rec = np.empty(len(pts), dtype=[("x", "<f8"), ("y", "<f8"), ("id", "<i8")])
+            rec["x"], rec["y"], rec["id"] = pts[:, 0], pts[:, 1], pts[:, 2]
+            f.write(struct.pack("<Q", len(pts)))
+            f.write(rec.tobytes())
+
+def write_cameras_text(path, cameras):
+    with open(path, "w") as f:
+        f.write("# Camera list with one line of data per camera:\n")
+        f.write("#   CAMERA_ID, MODEL, WIDTH, HEIGHT, PARAMS[]\n")
+        f.write(f"# Number of cameras: {len(cameras)}\n")
+        for camera_id, (model_name, width, height, params) in cameras.items():
+            f.write(" ".join([str(camera_id), model_name, str(width), str(height), *map(repr, params)]) + "\n")
+
+def write_images_text(path, images, points2d=None):
+    """read_images_text layout -> images.txt (one pose line and one POINTS2D line per image)."""
+    with open(path, "w") as f:
+        f.write("# Image list with two lines of data per image:\n")
+        f.write("#   IMAGE_ID, QW, QX, QY, QZ, TX, TY, TZ, CAMERA_ID, NAME\n")
+        f.write("#   POINTS2D[] as (X, Y, POINT3D_ID)\n")
+        f.write(f"# Number of images: {len(images['names'])}\n")
+        for k, name in enumerate(images["names"]):
+            pose = " ".join(map(repr, (*map(float, images["qvecs"][k]), *map(float, images["tvecs"][k]))))
+            f.write(f"{int(images['image_ids'][k])} {pose} {int(images['camera_ids'][k])} {name}\n")
+            pts = () if points2d is None else points2d[k]
+            f.write(" ".join(f"{x!r} {y!r} {int(i)}" for x, y, i in pts) + "\n")
+
+# ---------- model folder ----------
+def detect_model_format(model_dir):
+    """'bin' if the folder holds cameras.bin/images.bin, otherwise 'txt'."""
+    if all(os.path.isfile(os.path.join(model_dir, f)) for f in ("cameras.bin", "images.bin")):
+        return "bin"
+    return "txt"
+
+def read_model_cameras(model_dir, fmt="auto"):
+    """cameras of a COLMAP sparse model folder in either format."""
+    if fmt == "auto":
+        fmt = detect_model_format(model_dir)
+    if fmt == "bin":
+        return read_cameras_binary(os.path.join(model_dir, "cameras.bin"))
+    return read_cameras_text(os.path.join(model_dir, "cameras.txt"))
+
+def read_model_images(model_dir, fmt="auto"):
+    """images (poses, camera ids, names) of a COLMAP sparse model folder in either format."""
+    if fmt == "auto":
+        fmt = detect_model_format(model_dir)
+    if fmt == "bin":
+        return read_images_binary(os.path.join(model_dir, "images.bin"))
+    return read_images_text(os.path.join(model_dir, "images.txt"))
+
+def read_model(model_dir, fmt="auto"):
+    """Read (cameras, images) from a COLMAP sparse model folder in either format."""
+    if fmt == "auto":
+        fmt = detect_model_format(model_dir)
+    return read_model_cameras(model_dir, fmt), read_model_images(model_dir, fmt)
+
+def read_image_names(model_dir, fmt="auto"):
+    """Image names of a COLMAP sparse model in file order (same order as read_model)."""
+    if fmt == "auto":
+        fmt = detect_model_format(model_dir)
+    if fmt == "bin":
+        return read_image_names_binary(os.path.join(model_dir, "images.bin"))
+    return read_image_names_text(os.path.join(model_dir, "images.txt"))
@@ -1,13 +1,21 @@
 from pathlib import Path
 import json
 import os
+import argparse
 from datetime import datetime
-from PIL import Image  # pip install pillow
+
+from atomic_io import stage_lock, write_json_atomic
+from image_probe import display_size, probe_images
+from stage_cache import StageCache, tool_versions
+from telemetry import LOG_NAME, Telemetry, scene_name
 
 # ===== User config =====
 ROOT_DATASET_DIR = f"./310825-TownhallTree"   # Parent folder containing scene folders like "040625-LundoBin"
 OUTPUT_JSON_PATH = f"./{ROOT_DATASET_DIR}/meta.json"
 DEFAULT_ENVIRONMENT = "unknown"
+PROBE_WORKERS = 16                             # threads reading image headers
+DATASET_INDEX_NAME = "dataset_index.json"      # combined index written by --all
+CURATED_FIELDS = ("mode", "device", "region", "time_of_day")  # hand-edited in meta.json, kept on rebuild (plus environment*)
 # ========================
 
 IMG_EXTS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp"}
@@ -39,7 +47,7 @@ def build_scene(scene_dir: Path, root: Path):
     clean_data = None
     clutter_data = None
     total_images = 0
-    scene_wh = None  # (w, h) for the whole scene
+    scene_wh = scene_display_wh = None  # stored and displayed (w, h) for the whole scene
 
     for sf in sorted([p for p in scene_dir.iterdir() if p.is_dir()]):
         low = sf.name.lower()
@@ -55,18 +63,30 @@ def build_scene(scene_dir: Path, root: Path):
         imgs = [str(p.relative_to(root)) for p in abs_imgs]
         total_images += len(imgs)
 
-        # infer resolution from the first image in this subfolder (assume all are same size)
-        if abs_imgs:
-            with Image.open(abs_imgs[0]) as im:
-                w, h = im.size
+        # read every image header (no pixel decode) and check that they all share one resolution/orientation
+        infos = probe_images(abs_imgs, PROBE_WORKERS)
+        for p, info in zip(abs_imgs, infos):
+            if "error" in info:
+                raise ValueError(f"Cannot read image header of '{p}': {info['error']}")
+            wh = (info["w"], info["h"])  # stored pixel grid, as meta.json has always recorded it
             if scene_wh is None:
-                scene_wh = (w, h)
-            else:
-                if (w, h) != scene_wh:
-                    raise ValueError(
-                        f"Resolution mismatch in scene '{scene_dir.name}': "
-                        f"expected {scene_wh[0]}x{scene_wh[1]}, got {w}x{h} in '{sf.name}'."
-                    )
+                scene_wh, scene_display_wh = wh, display_size(info)
+            elif wh != scene_wh:
+                raise ValueError(
+                    f"Resolution mismatch in scene '{scene_dir.name}': "
+                    f"expected {scene_wh[0]}x{scene_wh[1]}, got {wh[0]}x{wh[1]} for '{p.relative_to(root)}'."
+                )
+            elif display_size(info) != scene_display_wh:
+                # same pixel grid, but the EXIF orientation turns it: the scene-level "orientation" would be wrong for part of it
+                dw, dh = display_size(info)
+                raise ValueError(
+                    f"Orientation mismatch in scene '{scene_dir.name}': "
+                    f"expected {scene_display_wh[0]}x{scene_display_wh[1]} as displayed, got {dw}x{dh} "
+                    f"(EXIF orientation {info['orientation']}) for '{p.relative_to(root)}'."
+                )
+        rotated = [p.name for p, info in zip(abs_imgs, infos) if info["orientation"] != 1]
+        if rotated:
+            print(f"[WARN] {len(rotated)} images in '{sf.relative_to(root)}' still carry an EXIF orientation != 1 (e.g. {rotated[0]})")
 
         # build entry with metadata first
         entry = {
@@ -81,6 +101,7 @@ def build_scene(scene_dir: Path, root: Path):
             # apple, bag, bike bell, beer, bench, bread, brush, bin, box, bike, bikes, building, bridge, cathedral, candle, can, car, cake, cutlery cup, clothes, coffee, cane, cone, comb, container, cylinder, cup, cross light, counter, daily objects, decoration, detergent, display, drawer, drink, drawing, dish, eardrop, entrance, fan, flower, fruit, gate, glass bottle, grass pot
             # grinder, hallway, heater, headphone, intersection, jar, juice, kettle, kitchen lamp, light pole, massage gun, mug, nouse, oil, orange, power transformer, pot, power bank, pack, package, plush toy, pillow, pole, plant, platform, plate, razor, rice pack, rice cooker, rock, sauce, snail, spice, stool, shop, sign, soy sauce, soup
             # sqare, safe, seat, scissor, scale, speaker, spray, table, tree, tea cup, toy, toaster, tube, umbrella, vitamin water, vegetables, wallet, watch, water bottle, water fountain, window
+            entry["image_meta"] = [{"w": i["w"], "h": i["h"], "orientation": i["orientation"]} for i in infos]
             entry["images"] = imgs    # put images at the end
             clean_data = entry
         elif low.endswith("-clutter"):
@@ -88,6 +109,7 @@ def build_scene(scene_dir: Path, root: Path):
             # arm, bag, bike, bird, bus, box, candy, can, cane, car, candle, cloth, chopsticks, cup, charger, comb, chair, dog, disk, eyedrop, fan, feet, hand, human, key, jar, knife, leaf, leg, lollipop, lighter, light rail,
             # mat, motorbike, mouse, necklace, orange, package, pencil, phone, plastic bag, plane, plate, pillow, razor, scissor, spoon, spice, scarf trimmer, soy sauce, tube, tissue, truck, umbrella
             # vegetable, rope, tape, tag, toy, watch, wet wipe
+            entry["image_meta"] = [{"w": i["w"], "h": i["h"], "orientation": i["orientation"]} for i in infos]
             entry["images"] = imgs
             clutter_data = entry        
 
@@ -95,6 +117,7 @@ def build_scene(scene_dir: Path, root: Path):
         raise ValueError(f"No images found under scene '{scene_dir.name}'.")
 
     res_str = f"{scene_wh[0]}x{scene_wh[1]}"
+    display_str = f"{scene_display_wh[0]}x{scene_display_wh[1]}"
 
     return {
         "scene_id": scene_dir.name,
@@ -102,9 +125,10 @@ def build_scene(scene_dir: Path, root: Path):
         "scene_date_raw": date_raw,
         "scene_date_iso": date_iso,
         "mode": "face_forward",       # face_forward, 360_degree, unknown
-        "orientation": "landscape",   # landscape, portrait
+        "orientation": "landscape" if scene_display_wh[0] >= scene_display_wh[1] else "portrait",   # landscape, portrait
         "device": "iPhone 15",        # iPhone 15, Galaxy A15, iPad Air (5th generation), OPPO A17
         "resolution": res_str,
+        "display_resolution": display_str,   # after the EXIF orientation; differs from resolution for rotated JPEGs
         "region": " Australia",          # Australia, Denmark, Japan, Taiwan
         "time_of_day": "nighttime",     # daytime, nighttime, unknown
         "environment": "outdoor",     # indoor, outdoor
@@ -115,32 +139,176 @@ def build_scene(scene_dir: Path, root: Path):
         "clutter": clutter_data,
     }
 
-def main():
-    root = Path(ROOT_DATASET_DIR)
-    if not root.exists():
-        print(f"[ERROR] ROOT_DATASET_DIR not found: {root}")
-        return
+def folder_state(scene_dir: Path):
+    """
+    Directory mtime and image count of every image folder build_scene reads. Adding, removing or
+    renaming images changes both, so this is enough to tell whether a manifest is stale.
+    """
+    state = {}
+    for sf in sorted([p for p in scene_dir.iterdir() if p.is_dir()]):
+        if "-All" in str(sf):
+            continue
+        img_dir = sf / "images"
+        if not img_dir.is_dir():
+            continue
+        with os.scandir(img_dir) as it:
+            count = sum(1 for e in it if e.is_file() and os.path.splitext(e.name)[1].lower() in IMG_EXTS)
+        state[sf.name] = {"mtime_ns": img_dir.stat().st_mtime_ns, "count": count}
+    return state
 
-    #scene_dirs = sorted([p for p in root.iterdir() if p.is_dir()])
+def scene_inputs(scene_dir: Path):
+    """Stage-cache inputs of one scene manifest."""
+    return {
+        "folders": folder_state(scene_dir),
+        "tools": tool_versions(__file__, Path(__file__).with_name("image_probe.py")),
+    }
+
+def write_scene_manifest(scene_dir: Path, out: Path, force: bool = False, explain: bool = False):
+    """Build and write meta.json of one scene unless its image folders are unchanged. Returns (manifest, rebuilt)."""
+    with stage_lock(scene_dir, "create_meta_data"):
+        return _write_scene_manifest(scene_dir, out, force, explain)
 
-    #scenes = [build_scene(sd, root) for sd in scene_dirs]
+def load_manifest(path: Path):
+    """An existing meta.json, or None if there is none (or it cannot be read)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    scenes = [build_scene(root, root)]
+def carry_curated(manifest: dict, old: dict):
+    """Copy the hand-curated fields of an older manifest (scene labels, clean theme, clutter distractors) into a rebuilt one."""
+    for key, value in old.items():
+        if key in CURATED_FIELDS or key.startswith("environment"):
+            manifest[key] = value
+    for part, key in (("clean", "theme"), ("clutter", "distractors")):
+        if manifest.get(part) and key in (old.get(part) or {}):
+            manifest[part][key] = old[part][key]
+    return manifest
+
+def _write_scene_manifest(scene_dir: Path, out: Path, force: bool, explain: bool):
+    cache = StageCache(scene_dir, "create_meta_data")
+    inputs = scene_inputs(scene_dir)
+    old = load_manifest(out)
+    if old is not None and cache.last_run() is None and not force and old.get("source_state") == inputs["folders"]:
+        # written before the stage cache existed: the counts and mtimes stored in the manifest still match
+        print(f"[cache] create_meta_data: {out} matches its source_state, skipping")
+        cache.record(inputs, [out])
+        return old, False
+    if old is not None and cache.check(inputs, [out], force=force, explain=explain):
+        return old, False
 
     manifest = {
         "version": "simple-1.0",
         "meta_generated_at": datetime.now().isoformat(timespec="seconds"),
-        **scenes[0],
+        **build_scene(scene_dir, scene_dir),
+        "source_state": inputs["folders"],
     }
+    if old is not None:
+        carry_curated(manifest, old)
 
-
-    out = Path(OUTPUT_JSON_PATH)
     out.parent.mkdir(parents=True, exist_ok=True)
-    with open(out, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    write_json_atomic(out, manifest, ensure_ascii=False)
+    cache.record(inputs, [out])
 
     print(f"[OK] Wrote manifest to {out.resolve()}")
+    return manifest, True
+
+def find_scene_dirs(root: Path):
+    """Sub-folders of root named like 'ddMMyy-SceneName'."""
+    scene_dirs = []
+    for p in sorted(root.iterdir()):
+        if not p.is_dir():
+            continue
+        try:
+            parse_scene_id(p.name)
+        except ValueError:
+            continue
+        scene_dirs.append(p)
+    return scene_dirs
+
+def index_entry(manifest: dict, meta_path: Path, root: Path):
+    clean = manifest.get("clean") or {}
+    clutter = manifest.get("clutter") or {}
+    return {
+        "scene_id": manifest["scene_id"],
+        "scene_name": manifest["scene_name"],
+        "scene_date_iso": manifest["scene_date_iso"],
+        "resolution": manifest["resolution"],
+        "orientation": manifest["orientation"],
+        "total_images": manifest["total_images"],
+        "clean_count": clean.get("count", 0),
+        "clutter_count": clutter.get("count", 0),
+        "meta": str(meta_path.relative_to(root)),
+    }
+
+def build_dataset(root: Path, workers: int, force: bool = False, explain: bool = False):
+    """meta.json for every scene under root (in parallel, skipping unchanged scenes) plus dataset_index.json."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    scene_dirs = find_scene_dirs(root)
+    if not scene_dirs:
+        print(f"[ERROR] no 'ddMMyy-SceneName' folders under {root}")
+        return
+
+    def one(sd):
+        # scenes share this process: cpu_s and the byte counters of a scene record are process-wide
+        tel = Telemetry(root / LOG_NAME, scene_name(sd), "create_meta_data")
+        try:
+            with tel.phase(shared_process=True) as rec:
+                manifest, rebuilt = write_scene_manifest(sd, sd / "meta.json", force, explain)
+                rec.update(rebuilt=rebuilt, files=manifest.get("total_images"))
+            return sd, manifest, rebuilt, None
+        except Exception as e:
+            return sd, None, False, e
+
+    entries, failed, rebuilt_count = [], [], 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        for sd, manifest, rebuilt, err in ex.map(one, scene_dirs):
+            if err is not None:
+                print(f"[ERROR] {sd.name}: {err}")
+                failed.append(sd.name)
+                continue
+            rebuilt_count += rebuilt
+            entries.append(index_entry(manifest, sd / "meta.json", root))
+
+    index = {
+        "version": "simple-1.0",
+        "index_generated_at": datetime.now().isoformat(timespec="seconds"),
+        "root_folder": str(root),
+        "num_scenes": len(entries),
+        "total_images": sum(e["total_images"] for e in entries),
+        "failed": failed,
+        "scenes": entries,
+    }
+    out = root / DATASET_INDEX_NAME
+    write_json_atomic(out, index, ensure_ascii=False)
+    print(f"[OK] {len(entries)} scenes ({rebuilt_count} rebuilt, {len(entries) - rebuilt_count} unchanged, {len(failed)} failed)")
+    print(f"[OK] Wrote dataset index to {out.resolve()}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Write meta.json for a scene folder, or for every scene under a dataset root")
+    ap.add_argument("root", nargs="?", default=ROOT_DATASET_DIR, help="Scene folder, or dataset root with --all")
+    ap.add_argument("--all", action="store_true", help="Treat root as a dataset root: one meta.json per 'ddMMyy-SceneName' folder plus a combined index")
+    ap.add_argument("--workers", type=int, default=8, help="Scenes processed in parallel with --all")
+    ap.add_argument("--force", action="store_true", help="Rebuild even if the image folders did not change")
+    ap.add_argument("--explain", action="store_true", help="Report why a manifest is rebuilt")
+    args = ap.parse_args()
+
+    root = Path(args.root)
+    if not root.exists():
+        print(f"[ERROR] ROOT_DATASET_DIR not found: {root}")
+        return
+
+    if args.all:
+        with Telemetry(root / LOG_NAME, None, "create_meta_data").phase("dataset", workers=args.workers):
+            build_dataset(root, args.workers, args.force, args.explain)
+        return
+
+    out = Path(OUTPUT_JSON_PATH) if args.root == ROOT_DATASET_DIR else root / "meta.json"
+    with Telemetry(root / LOG_NAME, scene_name(root), "create_meta_data").phase() as rec:
+        manifest, rec["rebuilt"] = write_scene_manifest(root, out, args.force, args.explain)
+        rec["files"] = manifest.get("total_images")
 
 if __name__ == "__main__":
     main()
-
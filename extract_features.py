@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+import os
+import sys
+import shutil
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from atomic_io import scratch_dir, write_text_atomic
+from colmap_db import DB_NAME, MERGEABLE_TABLES, extracted_names, merge_features, table_names
+from telemetry import LOG_NAME, Telemetry, scene_name
+
+# ---------- config ----------
+EXTS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp"}
+MISSING_NAME = "missing_features.txt"
+
+# ---------- helpers ----------
+def list_image_names(images_dir: Path) -> list:
+    """Names relative to images_dir, as COLMAP stores them (subfolders included)."""
+    names = []
+    for d, dirs, files in os.walk(images_dir):
+        dirs[:] = [x for x in dirs if not x.startswith(".")]
+        rel = os.path.relpath(d, images_dir)
+        names += [f if rel == "." else f"{rel}/{f}" for f in files if os.path.splitext(f)[1].lower() in EXTS]
+    return sorted(names)
+
+def missing_images(scene: Path, names: list) -> list:
+    done = extracted_names(scene / DB_NAME)
+    return [n for n in names if n not in done]
+
+def extractor_command(colmap, db, images_dir, list_path, args, use_gpu, threads=None) -> list:
+    cmd = [colmap, "feature_extractor",
+           "--database_path", str(db),
+           "--image_path", str(images_dir),
+           "--image_list_path", str(list_path),
+           "--ImageReader.single_camera", str(args.single_camera),
+           "--ImageReader.camera_model", args.camera_model,
+           "--SiftExtraction.max_num_features", str(args.max_features),
+           "--SiftExtraction.use_gpu", str(use_gpu)]
+    if threads:
+        cmd += ["--SiftExtraction.num_threads", str(threads)]
+    return cmd
+
+def shardable(db: Path) -> bool:
+    """A scene database that shard databases can be merged into: the classic layout (no rigs/frames tables)."""
+    return not db.is_file() or table_names(db) <= MERGEABLE_TABLES
+
+# ---------- passes ----------
+def run_single(tel, scene, todo, args, use_gpu, phase, threads=None) -> int:
+    """Extract `todo` into SCENE/database.db with one COLMAP process. Returns its exit code."""
+    with scratch_dir(scene, "extract") as tmp:
+        list_path = tmp / "images.txt"
+        write_text_atomic(list_path, "".join(n + "\n" for n in todo))
+        cmd = extractor_command(args.colmap, scene / DB_NAME, scene / "images", list_path, args, use_gpu, threads)
+        return tel.run(cmd, phase)
+
+def run_sharded(tel, scene, todo, args):
+    """
+    CPU extraction of `todo` split over --shards processes with --threads_per_shard threads each, every
+    shard in its own database. Completed shard images are merged into SCENE/database.db even if
+    another shard fails. Returns the number of failed shards, or None when the shards came out with
+    tables merge_features does not know (newer COLMAP): then only one shard is kept, as database.db
+    when there is none yet, and the caller extracts the rest in a single process.
+    """
+    n = min(args.shards, len(todo))
+    shards = [todo[k::n] for k in range(n)]
+    db = scene / DB_NAME
+    with scratch_dir(scene, "extract") as tmp:
+        def one(k):
+            list_path = tmp / f"shard_{k}.txt"
+            write_text_atomic(list_path, "".join(x + "\n" for x in shards[k]))
+            cmd = extractor_command(args.colmap, tmp / f"shard_{k}.db", scene / "images", list_path, args, 0, args.threads_per_shard)
+            return tel.run(cmd, "feature_extractor_cpu_shard")
+
+        with ThreadPoolExecutor(max_workers=n) as ex:
+            rets = list(ex.map(one, range(n)))
+        shard_dbs = [tmp / f"shard_{k}.db" for k in range(n) if (tmp / f"shard_{k}.db").is_file()]
+
+        extra = set().union(*(table_names(x) - MERGEABLE_TABLES for x in shard_dbs))
+        if extra:
+            print(f"[extract] shard databases have tables that cannot be merged ({', '.join(sorted(extra))})")
+            if not db.is_file():
+                shutil.copyfile(shard_dbs[0], db)
+            return None
+
+        with tel.phase("merge_shards", shards=n) as rec:
+            merged = 0
+            for shard_db in shard_dbs:
+                if not db.is_file():
+                    # first results of the scene: the shard database becomes the scene database
+                    shutil.copyfile(shard_db, db)
+                    merged += len(extracted_names(db))
+                else:
+                    merged += merge_features(db, shard_db, single_camera=bool(int(args.single_camera)))
+            rec["files"] = merged
+        print(f"[extract] merged {merged} images from {n} shards ({sum(1 for r in rets if r)} failed)")
+    return sum(1 for r in rets if r)
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Resumable COLMAP feature extraction: only images without keypoints in "
+                                             "database.db are extracted, GPU first, then sharded CPU processes")
+    ap.add_argument("scene", type=Path, help="Scene folder with images/ (database.db is created or completed)")
+    ap.add_argument("--colmap", default=os.environ.get("COLMAP", "colmap"))
+    ap.add_argument("--camera_model", default="OPENCV")
+    ap.add_argument("--single_camera", default="1")
+    ap.add_argument("--max_features", type=int, default=12000)
+    ap.add_argument("--use_gpu", default="1", help="Try GPU SIFT first (0: go straight to the CPU shards)")
+    ap.add_argument("--shards", type=int, default=max(1, min(4, (os.cpu_count() or 1) // 4)), help="CPU extraction processes")
+    ap.add_argument("--threads_per_shard", type=int, default=None, help="SIFT threads per CPU process (default: CPUs / shards)")
+    args = ap.parse_args()
+    if args.threads_per_shard is None:
+        args.threads_per_shard = max(1, (os.cpu_count() or 1) // max(1, args.shards))
+
+    scene = args.scene.resolve()
+    db = scene / DB_NAME
+    tel = Telemetry(scene / LOG_NAME, scene_name(scene), "colmap")
+    names = list_image_names(scene / "images")
+    if not names:
+        sys.exit(f"No images in {scene / 'images'}")
+
+    todo = missing_images(scene, names)
+    print(f"[extract] {len(names) - len(todo)} of {len(names)} images already have features in {db}")
+    if todo and args.use_gpu == "1":
+        print(f"[extract] GPU SIFT on {len(todo)} images...")
+        if run_single(tel, scene, todo, args, 1, "feature_extractor_gpu"):
+            print("[extract] GPU extraction failed, keeping the images it finished")
+        todo = missing_images(scene, names)
+
+    if todo:
+        print(f"[extract] CPU SIFT on {len(todo)} images: {args.shards} processes x {args.threads_per_shard} threads")
+        sharded = args.shards > 1 and len(todo) > 1 and shardable(db) and run_sharded(tel, scene, todo, args) is not None
+        if not sharded:
+            todo = missing_images(scene, names)
+            if todo:
+                run_single(tel, scene, todo, args, 0, "feature_extractor_cpu", args.shards * args.threads_per_shard)
+        todo = missing_images(scene, names)
+
+    missing_path = scene / MISSING_NAME
+    if todo:
+        write_text_atomic(missing_path, "".join(n + "\n" for n in todo))
+        print(f"[extract] {len(todo)} images still have no features (listed in {missing_path}); rerun to resume")
+        sys.exit(1)
+    missing_path.unlink(missing_ok=True)
+    print(f"[extract] all {len(names)} images have features")
+
+if __name__ == "__main__":
+    main()
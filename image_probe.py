@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+import os
+import sys
+import struct
+import argparse
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------- config ----------
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp"}
+READ_CHUNK = 64 * 1024
+
+# JPEG start-of-frame markers carrying the image size (not DHT/JPG/DAC: C4, C8, CC)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+EXIF_ORIENTATION_TAG = 0x0112
+
+# ---------- parsers ----------
+def _exif_orientation(tiff: bytes) -> int:
+    """Orientation tag of IFD0 in a TIFF/EXIF block, 1 if absent."""
+    if len(tiff) < 8 or tiff[:2] not in (b"II", b"MM"):
+        return 1
+    e = "<" if tiff[:2] == b"II" else ">"
+    (ifd,) = struct.unpack_from(e + "I", tiff, 4)
+    if ifd + 2 > len(tiff):
+        return 1
+    (n,) = struct.unpack_from(e + "H", tiff, ifd)
+    for i in range(n):
+        off = ifd + 2 + 12 * i
+        if off + 12 > len(tiff):
+            break
+        tag, typ, count = struct.unpack_from(e + "HHI", tiff, off)
+        if tag == EXIF_ORIENTATION_TAG:
+            return struct.unpack_from(e + "H", tiff, off + 8)[0]
+    return 1
+
+def probe_jpeg(f) -> dict:
+    """Walk the JPEG markers up to the first SOF; no entropy-coded data is read."""
+    if f.read(2) != b"\xff\xd8":
+        raise ValueError("not a JPEG")
+    orientation = 1
+    while True:
+        b = f.read(1)
+        if not b:
+            raise ValueError("no SOF marker")
+        if b != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = f.read(1)
+        m = marker[0] if marker else 0
+        if m in (0xD8, 0x01) or 0xD0 <= m <= 0xD7:
+            continue  # standalone markers
+        (length,) = struct.unpack(">H", f.read(2))
+        if m in SOF_MARKERS:
+            _, h, w = struct.unpack(">BHH", f.read(5))
+            return {"w": w, "h": h, "orientation": orientation, "format": "jpeg"}
+        if m == 0xE1:
+            seg = f.read(length - 2)
+            if seg[:6] == b"Exif\x00\x00":
+                orientation = _exif_orientation(seg[6:])
+            continue
+        if m == 0xDA:
+            raise ValueError("SOS before SOF")
+        f.seek(length - 2, os.SEEK_CUR)
+
+def probe_png(f) -> dict:
+    """IHDR holds width/height right after the signature."""
+    head = f.read(24)
+    if head[:8] != b"\x89PNG\r\n\x1a\n" or head[12:16] != b"IHDR":
+        raise ValueError("not a PNG")
+    w, h = struct.unpack(">II", head[16:24])
+    return {"w": w, "h": h, "orientation": 1, "format": "png"}
+
+def probe_image(path) -> dict:
+    """
+    Width, height and EXIF orientation of one image from its header only.
+    Returns {"w", "h", "orientation", "format"}; formats other than JPEG/PNG go through PIL,
+    which also stops after the header.
+    """
+    path = str(path)
+    with open(path, "rb", buffering=READ_CHUNK) as f:
+        sig = f.read(8)
+        f.seek(0)
+        if sig[:2] == b"\xff\xd8":
+            return probe_jpeg(f)
+        if sig == b"\x89PNG\r\n\x1a\n":
+            return probe_png(f)
+    from PIL import Image  # pip install pillow
+    with Image.open(path) as im:
+        w, h = im.size
+        orientation = im.getexif().get(EXIF_ORIENTATION_TAG, 1)
+        fmt = (im.format or "").lower()
+    return {"w": w, "h": h, "orientation": orientation, "format": fmt}
+
+def display_size(info: dict):
+    """(w, h) as the image is shown after applying its EXIF orientation."""
+    if info["orientation"] in (5, 6, 7, 8):
+        return info["h"], info["w"]
+    return info["w"], info["h"]
+
+def probe_images(paths, workers: int = 16) -> list:
+    """probe_image over a thread pool, results in input order; failures come back as {"error": ...}."""
+    def one(p):
+        try:
+            return probe_image(p)
+        except (OSError, ValueError, struct.error) as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        return list(ex.map(one, paths))
+
+def list_images(folder: Path) -> list:
+    with os.scandir(folder) as it:
+        return sorted(Path(e.path) for e in it if e.is_file() and os.path.splitext(e.name)[1].lower() in IMG_EXTS)
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Check image sizes and EXIF orientation of every folder under PARENT_DIR (header only)")
+    ap.add_argument("parent", type=Path, nargs="?", default=Path("."))
+    ap.add_argument("--workers", type=int, default=16)
+    args = ap.parse_args()
+
+    bad = 0
+    for top in sorted(p for p in args.parent.iterdir() if p.is_dir()):
+        print(f"== Checking folder: {top} ==")
+        paths = [p for d, _, _ in os.walk(top) for p in list_images(Path(d))]
+        if not paths:
+            print("  ⚠️  No images found")
+            continue
+        infos = probe_images(paths, args.workers)
+        sizes = Counter(f"{i['w']}x{i['h']}" for i in infos if "error" not in i)
+        rotated = sum(1 for i in infos if i.get("orientation", 1) != 1)
+        errors = [(p, i["error"]) for p, i in zip(paths, infos) if "error" in i]
+        if len(sizes) == 1:
+            print(f"  ✅ Uniform size: {next(iter(sizes))}  (files: {len(paths) - len(errors)})")
+        else:
+            bad += 1
+            print("  ❌ Mismatched sizes (count : WxH):")
+            for s, n in sizes.most_common():
+                print(f"    {n:6d} : {s}")
+        if rotated:
+            print(f"  ⚠️  {rotated} images with EXIF orientation != 1")
+        for p, e in errors:
+            bad += 1
+            print(f"  ❌ {p}: {e}")
+    sys.exit(1 if bad else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import shutil
+import importlib.util
+import argparse
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from atomic_io import atomic_path, write_json_atomic
+from image_probe import probe_image
+
+# ---------- config ----------
+HEIC_EXTS = {".heic", ".heif"}
+JPG_EXTS = {".jpg", ".jpeg", ".png"}   # renamed to .JPG, as process_raw_data.sh does
+TARGET_EXT = ".JPG"
+LOG_NAME = "ingest_log.json"
+JPEG_QUALITY = 95                      # only used when a lossless tool is not available
+
+# ---------- helpers ----------
+def have(tool: str) -> bool:
+    return shutil.which(tool) is not None
+
+def rename_ext(path: Path) -> Path:
+    """
+    path -> same stem with TARGET_EXT, never overwriting: a link to the new name followed by an unlink
+    of the old one, so a concurrent rename of another file with the same stem (a.png / a.jpg) fails with
+    FileExistsError instead of replacing it. Only a case-only rename on a case-insensitive filesystem
+    goes through a dot-prefixed, per-process temp name (skipped by scan_raw).
+    """
+    dst = path.with_suffix(TARGET_EXT)
+    if dst == path:
+        return path
+    try:
+        os.link(path, dst)
+    except FileExistsError:
+        if not os.path.samefile(dst, path):
+            raise FileExistsError(f"{dst} already exists") from None
+        if path.name.lower() != dst.name.lower():  # link of an interrupted earlier run
+            path.unlink()
+            return dst
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        os.rename(path, tmp)
+        os.rename(tmp, dst)
+        return dst
+    path.unlink()
+    return dst
+
+def heic_to_jpg(path: Path, tools: dict) -> Path:
+    """
+    HEIC -> JPG next to it, then drop the HEIC. The JPG gets the HEIC's mtime, which is how a rerun
+    recognises the output of a conversion interrupted before the HEIC was deleted.
+    """
+    dst = path.with_suffix(TARGET_EXT)
+    st = path.stat()
+    if dst.exists():
+        if dst.stat().st_mtime_ns != st.st_mtime_ns:
+            raise FileExistsError(f"{dst} already exists")
+        probe_image(dst)  # our own earlier conversion: keep it if it is complete
+        path.unlink()
+        return dst
+    with atomic_path(dst) as tmp:  # dot-prefixed temp: never picked up by scan_raw
+        if tools["pillow_heif"]:
+            import pillow_heif
+            from PIL import Image
+            pillow_heif.register_heif_opener()
+            with Image.open(path) as im:
+                exif = im.info.get("exif")
+                im.convert("RGB").save(tmp, "JPEG", quality=JPEG_QUALITY, **({"exif": exif} if exif else {}))
+        elif tools["heif-convert"]:
+            subprocess.run(["heif-convert", "-q", str(JPEG_QUALITY), str(path), tmp], check=True, capture_output=True)
+        elif tools["magick"] or tools["convert"]:
+            subprocess.run(["magick" if tools["magick"] else "convert", str(path), tmp], check=True, capture_output=True)
+        else:
+            raise RuntimeError("no HEIC decoder (install pillow-heif, libheif's heif-convert or ImageMagick)")
+        probe_image(tmp)  # make sure the conversion produced a readable JPEG before dropping the HEIC
+        os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+    path.unlink()
+    return dst
+
+def autorotate(path: Path, tools: dict) -> str:
+    """Apply the EXIF orientation to the pixels and reset the tag. Returns how it was done."""
+    if tools["jhead"]:
+        subprocess.run(["jhead", "-q", "-autorot", str(path)], check=True, capture_output=True)
+        return "lossless(jhead)"
+    from PIL import Image, ImageOps
+    with Image.open(path) as im, atomic_path(path) as tmp:
+        exif = im.getexif()
+        out = ImageOps.exif_transpose(im)
+        exif[0x0112] = 1
+        out.save(tmp, "JPEG", quality=JPEG_QUALITY, exif=exif.tobytes())
+    return f"reencoded(q={JPEG_QUALITY})"
+
+def ingest_file(path: str, tools: dict) -> dict:
+    """Convert/rename/autorotate one raw file and verify the result. Runs in a worker process."""
+    p = Path(path)
+    actions = []
+    try:
+        ext = p.suffix.lower()
+        if ext in HEIC_EXTS:
+            p = heic_to_jpg(p, tools)
+            actions.append("heic->jpg")
+        elif ext in JPG_EXTS and p.suffix != TARGET_EXT:
+            p = rename_ext(p)
+            actions.append(f"rename {ext}->{TARGET_EXT}")
+
+        info = probe_image(p)
+        if info["orientation"] != 1:
+            actions.append(f"autorot {info['orientation']} " + autorotate(p, tools))
+            info = probe_image(p)
+        if info["orientation"] != 1:
+            raise ValueError(f"orientation is still {info['orientation']}")
+
+        st = p.stat()
+        return {"src": path, "path": str(p), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "w": info["w"], "h": info["h"], "format": info["format"], "actions": actions}
+    except Exception as e:
+        return {"src": path, "path": str(p), "actions": actions, "error": f"{type(e).__name__}: {e}"}
+
+def scan_raw(root: Path) -> list:
+    """One walk over the raw tree: every HEIC/JPG/JPEG/PNG file (any case), skipping dotfiles (temps)."""
+    found = []
+    for d, dirs, files in os.walk(root):
+        dirs[:] = [x for x in dirs if not x.startswith(".")]
+        for f in files:
+            if not f.startswith(".") and os.path.splitext(f)[1].lower() in HEIC_EXTS | JPG_EXTS:
+                found.append(os.path.join(d, f))
+    found.sort()
+    return found
+
+def load_log(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+def save_log(path: Path, files: dict):
+    write_json_atomic(path, {"updated_at": datetime.now().isoformat(timespec="seconds"), "files": files}, indent=1)
+
+def is_logged(path: str, root: Path, log: dict) -> bool:
+    rec = log.get(os.path.relpath(path, root))
+    if rec is None or "error" in rec:
+        return False
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return rec["size"] == st.st_size and rec["mtime_ns"] == st.st_mtime_ns
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Ingest raw captures: HEIC->JPG, .JPG extensions, EXIF auto-rotation, verification. "
+                                             "Python replacement for process_raw_data.sh.")
+    ap.add_argument("root", type=Path, nargs="?", default=Path("."))
+    ap.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    ap.add_argument("--log", type=Path, default=None, help=f"Ingest log (default: ROOT/{LOG_NAME})")
+    ap.add_argument("--dry-run", action="store_true", help="Only list the files that would be processed")
+    args = ap.parse_args()
+
+    root = args.root
+    log_path = args.log or root / LOG_NAME
+    log = load_log(log_path)
+    tools = {t: have(t) for t in ("jhead", "heif-convert", "magick", "convert")}
+    tools["pillow_heif"] = importlib.util.find_spec("pillow_heif") is not None
+
+    files = scan_raw(root)
+    todo = [f for f in files if not is_logged(f, root, log)]
+    print(f"[ingest] {len(files)} files under {root}, {len(files) - len(todo)} already ingested, {len(todo)} to process")
+    print("[ingest] tools: " + ", ".join(f"{k}={'yes' if v else 'no'}" for k, v in tools.items()))
+    if args.dry_run:
+        for f in todo:
+            print(f"  {f}")
+        return
+
+    counts = {"converted": 0, "renamed": 0, "rotated": 0, "verified": 0, "failed": 0}
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        for i, rec in enumerate(ex.map(ingest_file, todo, [tools] * len(todo), chunksize=16), 1):
+            acts = " ".join(rec["actions"])
+            counts["converted"] += "heic->jpg" in acts
+            counts["renamed"] += "rename" in acts
+            counts["rotated"] += "autorot" in acts
+            if "error" in rec:
+                counts["failed"] += 1
+                print(f"[FAIL] {rec['src']}: {rec['error']}")
+            else:
+                counts["verified"] += 1
+            src, dst = os.path.relpath(rec.pop("src"), root), os.path.relpath(rec.pop("path"), root)
+            if src != dst:
+                log.pop(src, None)
+                rec["from"] = src
+            log[dst] = rec
+            if i % 500 == 0:
+                save_log(log_path, log)
+    save_log(log_path, log)
+
+    print("[ingest] " + ", ".join(f"{k}: {v}" for k, v in counts.items()))
+    print(f"[ingest] log: {log_path}")
+    if counts["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,21 @@ USE_GPU=1
 DATASET_PATH=$1
 # Recommended CAMERA values: OPENCV for perspective, OPENCV_FISHEYE for fisheye.
 CAMERA=${2:-OPENCV}
+# COLMAP binary, can be overridden (e.g. by run_pipeline.py --colmap).
+COLMAP=${COLMAP:-colmap}
+# Every COLMAP call is timed into $DATASET_PATH/telemetry.jsonl (or $TELEMETRY_LOG), see telemetry.py.
+TELEMETRY_PY="$(dirname "$0")"/telemetry.py
+colmap_timed() {
+    python3 "$TELEMETRY_PY" exec --scene "$DATASET_PATH" --stage colmap --phase "$1" -- "$COLMAP" "$@"
+}
+
+# One COLMAP run per scene at a time (same lock file as atomic_io.stage_lock(scene, "colmap")).
+mkdir -p "$DATASET_PATH"/.locks
+exec 9>"$DATASET_PATH"/.locks/colmap.lock
+if command -v flock >/dev/null 2>&1 && ! flock -n 9; then
+    echo "Another COLMAP run holds $DATASET_PATH/.locks/colmap.lock, waiting..."
+    flock 9
+fi
 
 
 # Run COLMAP.
@@ -35,48 +50,39 @@ CAMERA=${2:-OPENCV}
 
 
 
-# GPU SIFT with 12000
-echo "🔹 Trying GPU SIFT with 12000 features..."
-if ! colmap feature_extractor \
-    --database_path "$DATASET_PATH"/database.db \
-    --image_path "$DATASET_PATH"/images \
-    --ImageReader.single_camera 1 \
-    --ImageReader.camera_model "$CAMERA" \
-    --SiftExtraction.max_num_features 12000 \
-    --SiftExtraction.use_gpu 1; then
-
-    echo "SIFT 12000 failed, retrying with 8000..."
-
-    rm -rf "$DATASET_PATH"/sparse
-    rm -rf "$DATASET_PATH"/database.db
-
-    # CPU SIFT with 12000
-    colmap feature_extractor \
-        --database_path "$DATASET_PATH"/database.db \
-        --image_path "$DATASET_PATH"/images \
-        --ImageReader.single_camera 1 \
-        --ImageReader.camera_model "$CAMERA" \
-        --SiftExtraction.max_num_features 12000 \
-        --SiftExtraction.use_gpu 0
+# GPU SIFT with 12000 features, then CPU SIFT split over several processes for whatever the GPU did not
+# finish. Only images without keypoints in database.db are extracted, so a rerun resumes instead of
+# starting over. SHARDS / THREADS_PER_SHARD override the CPU split. If some images end up without
+# features the script stops here; ALLOW_PARTIAL_FEATURES=1 continues with the extracted images instead.
+if python3 "$(dirname "$0")"/extract_features.py "$DATASET_PATH" \
+    --colmap "$COLMAP" \
+    --camera_model "$CAMERA" \
+    --max_features 12000 \
+    --use_gpu "$USE_GPU" \
+    ${SHARDS:+--shards "$SHARDS"} \
+    ${THREADS_PER_SHARD:+--threads_per_shard "$THREADS_PER_SHARD"}; then
+    echo "Feature extraction completed successfully."
+    FEATURES_OK=1
+else
+    rc=$?
+    if [[ "${ALLOW_PARTIAL_FEATURES:-0}" != "1" ]]; then
+        echo "Feature extraction failed (exit $rc, see $DATASET_PATH/missing_features.txt). Rerun to resume, or set ALLOW_PARTIAL_FEATURES=1 to continue without those images." >&2
+        exit "$rc"
+    fi
+    echo "Feature extraction incomplete (see $DATASET_PATH/missing_features.txt), continuing with the extracted images (ALLOW_PARTIAL_FEATURES=1)."
 fi
 
-echo "Feature extraction completed successfully."
-
 
 ### Feature matching
 
-colmap exhaustive_matcher \
-    --database_path "$DATASET_PATH"/database.db \
-    --SiftMatching.use_gpu "$USE_GPU"
-
-## Use if your scene has > 500 images
-## Replace this path with your own local copy of the file.
-## Download from: https://demuc.de/colmap/#download
-# VOCABTREE_PATH=/usr/local/google/home/bmild/vocab_tree_flickr100K_words32K.bin
-# colmap vocab_tree_matcher \
-#     --database_path "$DATASET_PATH"/database.db \
-#     --VocabTreeMatching.vocab_tree_path $VOCABTREE_PATH \
-#     --SiftMatching.use_gpu "$USE_GPU"
+## plan_matching.py picks the matcher by image count: exhaustive for small scenes, then the vocabulary
+## tree if $VOCABTREE_PATH points to one (download from https://demuc.de/colmap/#download), else
+## sequential for a single capture or a pruned pair list (capture order + thumbnail similarity) run
+## through matches_importer. MATCHER=exhaustive|sequential|vocab_tree|pairs forces one.
+python3 "$(dirname "$0")"/plan_matching.py "$DATASET_PATH" \
+    --matcher "${MATCHER:-auto}" \
+    --colmap "$COLMAP" \
+    --use_gpu "$USE_GPU"
 
 
 ### Bundle adjustment
@@ -85,7 +91,7 @@ colmap exhaustive_matcher \
 # decreasing it speeds up bundle adjustment steps.
 # 35, 4, 20
 mkdir -p "$DATASET_PATH"/sparse
-colmap mapper \
+colmap_timed mapper \
     --database_path "$DATASET_PATH"/database.db \
     --image_path "$DATASET_PATH"/images \
     --output_path "$DATASET_PATH"/sparse \
@@ -98,40 +104,35 @@ colmap mapper \
 ### Image undistortion
 
 ## Use this if you want to undistort your images into ideal pinhole intrinsics.
-mkdir -p "$DATASET_PATH"/tmp
-rm -rf "$DATASET_PATH"/undistortion_images
-rm -rf "$DATASET_PATH"/undistortion_sparse/0/
-colmap image_undistorter \
+## Output goes to a private scratch folder in the scene and replaces the previous result only once complete.
+SCRATCH=$(mktemp -d "$DATASET_PATH"/.scratch-undistort-XXXXXX)
+trap 'rm -rf "$SCRATCH"' EXIT
+if colmap_timed image_undistorter \
      --image_path "$DATASET_PATH"/images \
      --input_path "$DATASET_PATH"/sparse/0 \
-     --output_path "$DATASET_PATH"/tmp \
-     --output_type COLMAP
-
-## reorganize
-mkdir -p "$DATASET_PATH"/undistortion_sparse/0/
-mv "$DATASET_PATH"/tmp/sparse/* "$DATASET_PATH"/undistortion_sparse/0/
-mv "$DATASET_PATH"/tmp/images "$DATASET_PATH"/undistortion_images
+     --output_path "$SCRATCH" \
+     --output_type COLMAP; then
+
+    ## reorganize
+    rm -rf "$DATASET_PATH"/undistortion_images
+    rm -rf "$DATASET_PATH"/undistortion_sparse/0/
+    mkdir -p "$DATASET_PATH"/undistortion_sparse
+    mv "$SCRATCH"/sparse "$DATASET_PATH"/undistortion_sparse/0
+    mv "$SCRATCH"/images "$DATASET_PATH"/undistortion_images
+    UNDISTORT_OK=1
+else
+    echo "image_undistorter failed, keeping the previous undistortion_* folders."
+fi
 
-## save space
-rm -rf "$DATASET_PATH"/database.db
-rm -rf "$DATASET_PATH"/tmp
+## save space, but only after a complete run: an interrupted one resumes from the extracted features
+if [ -n "$FEATURES_OK" ] && [ -n "$UNDISTORT_OK" ] && [ "${KEEP_DATABASE:-0}" != 1 ]; then
+    rm -rf "$DATASET_PATH"/database.db
+fi
+rm -rf "$SCRATCH"
 
 # Resize images.
 
-#cp -r "$DATASET_PATH"/images "$DATASET_PATH"/images_2
-
-#pushd "$DATASET_PATH"/images_2
-#ls | xargs -P 8 -I {} mogrify -resize 50% {}
-#popd
-
-#cp -r "$DATASET_PATH"/images "$DATASET_PATH"/images_4
-
-#pushd "$DATASET_PATH"/images_4
-#ls | xargs -P 8 -I {} mogrify -resize 25% {}
-#popd
-
-#cp -r "$DATASET_PATH"/images "$DATASET_PATH"/images_8
-
-#pushd "$DATASET_PATH"/images_8
-#ls | xargs -P 8 -I {} mogrify -resize 12.5% {}
-#popd
+## images_2/4/8 from the undistorted images, one decode per image (set MAKE_PYRAMID=1).
+if [[ "${MAKE_PYRAMID:-0}" == "1" ]]; then
+    python3 "$(dirname "$0")"/make_pyramid.py "$DATASET_PATH" --src undistortion_images --prefix images
+fi
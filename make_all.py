@@ -2,63 +2,117 @@ import os
 import sys
 import argparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from atomic_io import stage_lock
+from stage_cache import StageCache, fingerprint_tree, tool_versions
+from telemetry import LOG_NAME, Telemetry, scene_name
 
 # ---------- config ----------
 EXTS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp"}
 RECURSIVE = True  # scan subfolders
 
 # ---------- helpers ----------
-def is_image(p: Path) -> bool:
-    return p.is_file() and p.suffix.lower() in EXTS
-
-def iter_images(root: Path):
-    if RECURSIVE:
-        yield from (p for p in root.rglob("*") if is_image(p))
-    else:
-        yield from (p for p in root.iterdir() if is_image(p))
+def is_image_name(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in EXTS
 
-def ensure_unique(dst: Path) -> Path:
-    """If dst exists, append _dupN before extension to avoid overwrite."""
-    if not dst.exists():
-        return dst
-    stem, suf = dst.stem, dst.suffix
+def scan_images(root: Path) -> list:
+    """
+    One os.scandir pass over root (and its subfolders if RECURSIVE).
+    Returns sorted (path, name, inode) for every image file; DirEntry avoids a stat per file.
+    """
+    found = []
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for e in it:
+                if e.is_dir():
+                    if RECURSIVE:
+                        stack.append(e.path)
+                elif e.is_file() and is_image_name(e.name):
+                    found.append((e.path, e.name, e.inode()))
+    found.sort()
+    return found
+
+def scan_names(root: Path) -> dict:
+    """name -> inode of every entry already in the destination folder."""
+    with os.scandir(root) as it:
+        return {e.name: e.inode() for e in it}
+
+def unique_name(name: str, taken) -> str:
+    """If name is taken, append _dupN before extension to avoid overwrite."""
+    if name not in taken:
+        return name
+    stem, suf = os.path.splitext(name)
     i = 1
-    while True:
-        cand = dst.with_name(f"{stem}_dup{i}{suf}")
-        if not cand.exists():
-            return cand
+    while f"{stem}_dup{i}{suf}" in taken:
         i += 1
+    return f"{stem}_dup{i}{suf}"
 
-def make_hardlink(src: Path, dst: Path):
-    dst.parent.mkdir(parents=True, exist_ok=True)
+def make_hardlink(src: str, dst: str):
     try:
         os.link(src, dst)
         return True, None
     except OSError as e:
         return False, e
 
-def link_folder(src_root: Path, human_label: str, prefix: str, c_root: Path):
+def plan_links(images: list, prefix: str, existing: dict, sync: bool):
     """
-    Create hard links in C for all images under src_root,
-    naming them with the given prefix + original basename.
+    Decide the destination name of every source image, updating `existing` in memory.
+    A name already planned in this run gets a _dupN suffix in both modes. For a name that was
+    there before the run, default mode also adds _dupN; sync keeps it if it is a link to the same
+    file and reports it as stale (left alone) if it points to another file.
+    Returns (todo, stale, renamed, uptodate, planned) with planned the set of destination names.
     """
-    created = skipped = renamed = 0
-    for src in iter_images(src_root):
-        dst_name = prefix + src.name  # only basename, prefixed
-        dst = c_root / dst_name
-
-        if dst.exists():
-            dst = ensure_unique(dst)
+    todo, stale = [], []
+    renamed = uptodate = 0
+    planned = set()
+    for src, name, ino in images:
+        dst_name = prefix + name  # only basename, prefixed
+        if dst_name in planned:
+            dst_name = unique_name(dst_name, planned if sync else existing)
             renamed += 1
+        if dst_name in existing and dst_name not in planned:
+            if sync:
+                planned.add(dst_name)
+                if existing[dst_name] == ino:
+                    uptodate += 1
+                else:
+                    stale.append(dst_name)
+                continue
+            dst_name = unique_name(dst_name, existing)
+            renamed += 1
+        planned.add(dst_name)
+        existing[dst_name] = ino
+        todo.append((src, dst_name))
+    return todo, stale, renamed, uptodate, planned
 
-        ok, err = make_hardlink(src, dst)
-        if ok:
-            created += 1
-        else:
-            skipped += 1
-            print(f"[SKIP {human_label}] {src} -> {dst}  ({err})")
-
-    print(f"[{human_label}] created: {created}, renamed(_dupN): {renamed}, skipped: {skipped}")
+def link_folder(src_root: Path, human_label: str, prefix: str, c_root: Path, existing: dict, sync: bool = False, workers: int = 16):
+    """
+    Create hard links in C for all images under src_root,
+    naming them with the given prefix + original basename.
+    """
+    images = scan_images(src_root)
+    todo, stale, renamed, uptodate, planned = plan_links(images, prefix, existing, sync)
+
+    created = skipped = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        results = ex.map(lambda job: make_hardlink(job[0], str(c_root / job[1])), todo)
+        for (src, dst_name), (ok, err) in zip(todo, results):
+            if ok:
+                created += 1
+            else:
+                skipped += 1
+                existing.pop(dst_name, None)
+                print(f"[SKIP {human_label}] {src} -> {c_root / dst_name}  ({err})")
+
+    for name in stale:
+        print(f"[STALE {human_label}] {c_root / name} is not a link to its source")
+    if sync:
+        print(f"[{human_label}] created: {created}, up to date: {uptodate}, renamed(_dupN): {renamed}, stale: {len(stale)}, skipped: {skipped}")
+    else:
+        print(f"[{human_label}] created: {created}, renamed(_dupN): {renamed}, skipped: {skipped}")
+    return planned
 
 # ---------- main ----------
 def main():
@@ -70,6 +124,10 @@ def main():
         type=Path,
         help="Base directory (e.g. /home/.../230825-MascotDrawing)"
     )
+    parser.add_argument("--sync", action="store_true", help="Only create missing links and report stale ones instead of adding _dupN copies")
+    parser.add_argument("--workers", type=int, default=16, help="Threads issuing os.link")
+    parser.add_argument("--force", action="store_true", help="Relink even if the inputs did not change")
+    parser.add_argument("--explain", action="store_true", help="Report why the stage is rerun")
     args = parser.parse_args()
 
     base = args.base_dir.resolve()
@@ -83,12 +141,39 @@ def main():
             print(f"[Error] Path not found: {m}", file=sys.stderr)
         sys.exit(1)
 
-    dir_c.mkdir(parents=True, exist_ok=True)
-
-    print(f"Linking from:\n  Clean(A)={dir_a}\n  Clutter(B)={dir_b}\ninto C={dir_c}\n")
-    link_folder(dir_a, human_label="Clean",   prefix="extra_",   c_root=dir_c)
-    link_folder(dir_b, human_label="Clutter", prefix="clutter_", c_root=dir_c)
-    print(f"\n[Done] Output folder: {dir_c}")
+    tel = Telemetry(dir_c.parent / LOG_NAME, scene_name(base), "make_all")
+    with tel.phase() as rec, stage_lock(dir_c.parent, "make_all"):
+        cache = StageCache(dir_c.parent, "make_all")
+        with tel.phase("fingerprint"):
+            inputs = {
+                "clean": fingerprint_tree(dir_a, exts=EXTS),
+                "clutter": fingerprint_tree(dir_b, exts=EXTS),
+                "params": {"recursive": RECURSIVE},
+                "tools": tool_versions(__file__),
+                "links": fingerprint_tree(dir_c, exts=EXTS),  # deleted or added links force a rerun
+            }
+        # --sync exists to report and repair the links, so it never trusts the cache
+        if not args.sync and cache.check(inputs, [dir_c], force=args.force, explain=args.explain):
+            rec["cached"] = True
+            return
+
+        dir_c.mkdir(parents=True, exist_ok=True)
+        # after a recorded run the folder holds our own links: reconcile them instead of adding _dupN copies
+        sync = args.sync or cache.last_run() is not None
+
+        print(f"Linking from:\n  Clean(A)={dir_a}\n  Clutter(B)={dir_b}\ninto C={dir_c}\n")
+        with tel.phase("link") as link_rec:
+            existing = scan_names(dir_c)
+            expected = link_folder(dir_a, human_label="Clean",   prefix="extra_",   c_root=dir_c, existing=existing, sync=sync, workers=args.workers)
+            expected |= link_folder(dir_b, human_label="Clutter", prefix="clutter_", c_root=dir_c, existing=existing, sync=sync, workers=args.workers)
+            link_rec["files"] = len(expected)
+        rec["files"] = len(expected)
+        if sync:
+            for name in sorted(set(existing) - expected):
+                print(f"[STALE] {dir_c / name} has no source image")
+        inputs["links"] = fingerprint_tree(dir_c, exts=EXTS)
+        cache.record(inputs, [dir_c])
+        print(f"\n[Done] Output folder: {dir_c}")
 
 if __name__ == "__main__":
     main()
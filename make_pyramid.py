@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from atomic_io import atomic_path, write_json_atomic
+from image_probe import probe_image
+
+# ---------- config ----------
+EXTS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp"}
+JPEG_EXTS = {".jpg", ".jpeg"}
+INDEX_NAME = "pyramid.json"
+MASK_PREFIX = "dynamic_mask_"   # colmap2nerf.py --mask_categories writes these next to the images
+
+# ---------- helpers ----------
+def _init_worker():
+    import cv2
+    cv2.setNumThreads(1)  # one image per process, don't oversubscribe
+
+def is_source_name(name: str) -> bool:
+    """Images only: no dotfiles (in-flight atomic_io temporaries) and no generated masks."""
+    return not name.startswith((".", MASK_PREFIX)) and os.path.splitext(name)[1].lower() in EXTS
+
+def scan_mtimes(folder: Path) -> dict:
+    """name -> mtime_ns of the images in folder (empty if it does not exist)."""
+    try:
+        with os.scandir(folder) as it:
+            return {e.name: e.stat().st_mtime_ns for e in it if e.is_file() and is_source_name(e.name)}
+    except FileNotFoundError:
+        return {}
+
+def target_size(w: int, h: int, factor: int):
+    # same rounding as `mogrify -resize 50%`
+    return max(1, int(round(w / factor))), max(1, int(round(h / factor)))
+
+def build_levels(src: str, dsts: list, factors: list, jpeg_quality: int = 95):
+    """
+    Decode src once and write one downscaled copy per factor (ascending), each level resized
+    from the previous one. A JPEG is decoded directly at the first factor when it is 2, 4 or 8
+    (libjpeg DCT scaling), so the full-resolution image is never materialized.
+    EXIF orientation is ignored, the levels keep the stored pixel grid like COLMAP does.
+    Returns the (w, h) of every level.
+    """
+    import cv2
+
+    ext = os.path.splitext(src)[1].lower()
+    reduced = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+    levels = []
+    if ext in JPEG_EXTS and factors[0] in reduced:
+        info = probe_image(src)
+        w0, h0 = info["w"], info["h"]
+        img = cv2.imread(src, reduced[factors[0]] | cv2.IMREAD_IGNORE_ORIENTATION)
+        if img is None:
+            raise ValueError(f"cannot decode {src}")
+        w, h = target_size(w0, h0, factors[0])
+        if (img.shape[1], img.shape[0]) != (w, h):
+            img = cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+        levels.append(img)
+        rest = factors[1:]
+    else:
+        img = cv2.imread(src, cv2.IMREAD_UNCHANGED)
+        if img is None:
+            raise ValueError(f"cannot decode {src}")
+        h0, w0 = img.shape[:2]
+        rest = factors
+
+    for f in rest:
+        img = cv2.resize(img, target_size(w0, h0, f), interpolation=cv2.INTER_AREA)
+        levels.append(img)
+
+    params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality] if ext in JPEG_EXTS else []
+    for dst, im in zip(dsts, levels):
+        with atomic_path(dst) as tmp:  # keeps the extension so imwrite picks the encoder
+            if not cv2.imwrite(tmp, im, params):
+                raise OSError(f"cannot write {dst}")
+    return [(im.shape[1], im.shape[0]) for im in levels]
+
+def _build_one(job):
+    src, dsts, factors, quality = job
+    try:
+        return src, build_levels(src, dsts, factors, quality), None
+    except Exception as e:
+        return src, None, f"{type(e).__name__}: {e}"
+
+def make_pyramid(scene: Path, src_name: str = "undistortion_images", prefix: str = "images",
+                 factors=(2, 4, 8), workers: int = None, quality: int = 95, force: bool = False) -> dict:
+    """
+    Write scene/<prefix>_<f> for every factor from scene/<src_name>, skipping images whose
+    outputs are all newer than the source. Returns the index written to scene/pyramid.json.
+    """
+    factors = sorted(int(f) for f in factors)
+    src_dir = scene / src_name
+    level_dirs = [scene / f"{prefix}_{f}" for f in factors]
+    for d in level_dirs:
+        d.mkdir(parents=True, exist_ok=True)
+
+    sources = scan_mtimes(src_dir)
+    if not sources:
+        raise FileNotFoundError(f"no images in {src_dir}")
+    outputs = [scan_mtimes(d) for d in level_dirs]
+
+    jobs = []
+    for name, mtime in sorted(sources.items()):
+        if not force and all(out.get(name, -1) >= mtime for out in outputs):
+            continue
+        jobs.append((str(src_dir / name), [str(d / name) for d in level_dirs], factors, quality))
+    print(f"[pyramid] {src_dir}: {len(sources)} images, {len(sources) - len(jobs)} up to date, {len(jobs)} to build")
+
+    failed = []
+    sizes = None
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as ex:
+            for src, s, err in ex.map(_build_one, jobs, chunksize=8):
+                if err is not None:
+                    failed.append(src)
+                    print(f"[SKIP] {src} ({err})")
+                elif sizes is None:
+                    sizes = s
+
+    index_path = scene / INDEX_NAME
+    try:
+        previous = json.loads(index_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        previous = {}
+    prev_levels = previous.get("levels", {})
+    levels = {}
+    for i, (f, d) in enumerate(zip(factors, level_dirs)):
+        res = f"{sizes[i][0]}x{sizes[i][1]}" if sizes else prev_levels.get(d.name, {}).get("resolution")
+        levels[d.name] = {"factor": f, "count": len(scan_mtimes(d)), "resolution": res}
+    index = {
+        "source": src_name,
+        "source_count": len(sources),
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "levels": levels,
+        "failed": failed,
+    }
+    write_json_atomic(index_path, index)
+    print(f"[pyramid] wrote {index_path}")
+    return index
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Build images_2/4/8 from a scene's undistorted images (one decode per image)")
+    ap.add_argument("scene_dir", type=Path, help="Scene folder (e.g. .../040625-LundoBin-All)")
+    ap.add_argument("--src", default="undistortion_images", help="Source image folder inside the scene")
+    ap.add_argument("--prefix", default="images", help="Output folders are <prefix>_<factor>")
+    ap.add_argument("--factors", type=int, nargs="+", default=[2, 4, 8])
+    ap.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    ap.add_argument("--quality", type=int, default=95, help="JPEG quality of the outputs")
+    ap.add_argument("--force", action="store_true", help="Rebuild every image")
+    args = ap.parse_args()
+
+    index = make_pyramid(args.scene_dir, args.src, args.prefix, args.factors, args.workers, args.quality, args.force)
+    if index["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,54 @@
-import sys, json
+import argparse
 from pathlib import Path
-from pycolmap import SceneManager
 
-def build_split_from_colmap(scene_dir: Path) -> None:
-    """Create $SCENE/split.json using pycolmap on $SCENE/undistortion_sparse/0."""
+from atomic_io import stage_lock
+from colmap_model import read_image_names
+from scene_split import SPLIT_NAME, SPLIT_INDEX_NAME, write_split
+from stage_cache import StageCache, fingerprint_files, tool_versions
+from telemetry import LOG_NAME, Telemetry, scene_name
+
+HERE = Path(__file__).resolve().parent
+
+def build_split_from_colmap(scene_dir: Path, skip_early: int = 0) -> None:
+    """
+    Create $SCENE/split.json and $SCENE/split_index.json from the image names of
+    $SCENE/undistortion_sparse/0 (bin or txt). Only the name records are read; the frame order
+    is the one colmap2nerf.py writes to transforms.json with the same --skip_early.
+    """
     model_dir = scene_dir / "undistortion_sparse" / "0"
     if not model_dir.is_dir():
         raise FileNotFoundError(f"model dir not found: {model_dir}")
 
-    sm = SceneManager(str(model_dir))
-    sm.load_cameras()
-    sm.load_images()  # points3D not needed
-
-    image_names = [img.name for img in sm.images.values()]
-    train = sorted([n for n in image_names if "clutter" in n.lower()])
-    test  = sorted([n for n in image_names if "extra"   in n.lower()])
-
-    out_fp = scene_dir / "split.json"
-    out_fp.write_text(json.dumps({"train": train, "test": test}, indent=2) + "\n", encoding="utf-8")
+    # same naming as the frames of transforms.json
+    names = [n.replace(" ", "_") for n in read_image_names(str(model_dir))[skip_early:]]
+    split_fp, index_fp, counts = write_split(scene_dir, names)
     print(f"[split] source={model_dir}")
-    print(f"[split] wrote {out_fp}  (train={len(train)} | test={len(test)})")
+    print(f"[split] wrote {split_fp} + {index_fp.name}  (train={counts['train']} | test={counts['test']})")
 
 def main():
-    if len(sys.argv) < 2:
-        print("usage: make_split_from_colmap_bin.py /path/to/SCENE", file=sys.stderr)
-        sys.exit(1)
-    build_split_from_colmap(Path(sys.argv[1]))
+    ap = argparse.ArgumentParser(description="Write $SCENE/split.json from the COLMAP model in $SCENE/undistortion_sparse/0")
+    ap.add_argument("scene_dir", type=Path, help="Path to the scene folder (e.g. .../040625-LundoBin-All)")
+    ap.add_argument("--skip_early", type=int, default=0, help="Same as colmap2nerf.py --skip_early, keeps split_index.json aligned")
+    ap.add_argument("--force", action="store_true", help="Rebuild even if the model did not change")
+    ap.add_argument("--explain", action="store_true", help="Report why the split is rebuilt")
+    args = ap.parse_args()
+
+    scene_dir = args.scene_dir
+    model_dir = scene_dir / "undistortion_sparse" / "0"
+    tel = Telemetry(scene_dir / LOG_NAME, scene_name(scene_dir), "make_split")
+    with tel.phase() as rec, stage_lock(scene_dir, "make_split"):
+        cache = StageCache(scene_dir, "make_split")
+        inputs = {
+            "model": fingerprint_files([model_dir / n for n in ("images.bin", "images.txt")], content=False),
+            "params": {"skip_early": args.skip_early},
+            "tools": tool_versions(__file__, HERE / "colmap_model.py", HERE / "scene_split.py"),
+        }
+        outputs = [scene_dir / SPLIT_NAME, scene_dir / SPLIT_INDEX_NAME]
+        if cache.check(inputs, outputs, force=args.force, explain=args.explain):
+            rec["cached"] = True
+            return
+        build_split_from_colmap(scene_dir, args.skip_early)
+        cache.record(inputs, outputs)
 
 if __name__ == "__main__":
     main()
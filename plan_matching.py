@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from atomic_io import write_json_atomic, write_text_atomic
+from colmap_db import DB_NAME, image_names
+from scene_split import SPLIT_KEYWORDS
+from telemetry import LOG_NAME, Telemetry, scene_name
+
+# ---------- config ----------
+EXTS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp"}
+EXHAUSTIVE_MAX = 300      # up to this many images every pair is matched
+SEQ_WINDOW = 10           # neighbours in capture order (within one prefix) matched by sequential/pairs
+RETRIEVAL_K = 5           # most similar thumbnails matched per image, over the whole scene
+CROSS_K = 3               # most similar thumbnails from the other prefixes (ties Clean and Clutter together)
+THUMB = 32                # thumbnail side of the global descriptor
+PAIRS_NAME = "match_pairs.txt"
+PLAN_NAME = "match_plan.json"
+
+# ---------- images ----------
+def scene_image_names(scene: Path) -> list:
+    """Names as COLMAP stores them: from database.db when features exist, else the flat images folder."""
+    db = scene / DB_NAME
+    names = image_names(db) if db.is_file() else []
+    if not names:
+        with os.scandir(scene / "images") as it:
+            names = [e.name for e in it if e.is_file() and os.path.splitext(e.name)[1].lower() in EXTS]
+    return sorted(names)
+
+def prefix_of(name: str) -> str:
+    base = os.path.basename(name)
+    return next((key for key in SPLIT_KEYWORDS.values() if base.startswith(key)), "")
+
+def thumbnails(paths, workers: int = 16, size: int = THUMB) -> np.ndarray:
+    """(N, size*size) zero-mean, unit-norm grayscale thumbnails; libjpeg decodes at 1/8 scale directly."""
+    import cv2
+
+    def one(p):
+        img = cv2.imread(str(p), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if img is None:
+            return np.zeros(size * size, dtype=np.float32)
+        v = cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+        v -= v.mean()
+        n = np.linalg.norm(v)
+        return v / n if n > 0 else v
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        return np.stack(list(ex.map(one, paths))) if len(paths) else np.zeros((0, size * size), dtype=np.float32)
+
+# ---------- plan ----------
+def choose_matcher(names: list, exhaustive_max: int = EXHAUSTIVE_MAX, vocab_tree=None) -> tuple:
+    """(matcher, reason) for a scene of these images."""
+    n = len(names)
+    if n <= exhaustive_max:
+        return "exhaustive", f"{n} images <= {exhaustive_max}"
+    if vocab_tree:
+        return "vocab_tree", f"{n} images > {exhaustive_max} and a vocabulary tree is available"
+    groups = {prefix_of(x) for x in names}
+    if len(groups) <= 1:
+        return "sequential", f"{n} images > {exhaustive_max} from a single capture"
+    return "pairs", f"{n} images > {exhaustive_max} from {len(groups)} captures ({', '.join(sorted(g or 'other' for g in groups))}), no vocabulary tree"
+
+def sequential_pairs(names: list, window: int = SEQ_WINDOW) -> set:
+    """Each image with its next `window` images in capture (name) order, within its prefix."""
+    groups = {}
+    for i, name in enumerate(names):
+        groups.setdefault(prefix_of(name), []).append(i)
+    pairs = set()
+    for idx in groups.values():
+        idx = sorted(idx, key=lambda i: names[i])
+        for a in range(len(idx)):
+            for b in range(a + 1, min(a + 1 + window, len(idx))):
+                pairs.add((min(idx[a], idx[b]), max(idx[a], idx[b])))
+    return pairs
+
+def retrieval_pairs(desc: np.ndarray, groups: np.ndarray, k: int = RETRIEVAL_K, cross_k: int = CROSS_K, block: int = 1024) -> set:
+    """
+    Each image with its k most similar images overall and its cross_k most similar images of another
+    group. Similarities are computed block by block, so memory stays at block x N.
+    """
+    n = len(desc)
+    pairs = set()
+    for s in range(0, n, block):
+        sims = desc[s:s + block] @ desc.T
+        rows = np.arange(sims.shape[0])
+        sims[rows, s + rows] = -np.inf
+        picks = []
+        if k > 0 and n > 1:
+            picks.append(np.argpartition(-sims, min(k, n - 1) - 1, axis=1)[:, :min(k, n - 1)])
+        if cross_k > 0:
+            cross = np.where(groups[None, :] != groups[s:s + block, None], sims, -np.inf)
+            m = min(cross_k, n - 1)
+            if m > 0:
+                top = np.argpartition(-cross, m - 1, axis=1)[:, :m]
+                # rows without images of another group picked -inf entries
+                picks.append(np.where(np.take_along_axis(cross, top, 1) > -np.inf, top, -1))
+        for top in picks:
+            for r, cols in enumerate(top):
+                i = s + r
+                for j in cols:
+                    if j >= 0 and j != i:
+                        pairs.add((min(i, int(j)), max(i, int(j))))
+    return pairs
+
+def plan_pairs(scene: Path, names: list, window: int, k: int, cross_k: int, workers: int) -> set:
+    groups = np.array([list(SPLIT_KEYWORDS.values()).index(p) if p else -1 for p in map(prefix_of, names)])
+    desc = thumbnails([scene / "images" / x for x in names], workers)
+    return sequential_pairs(names, window) | retrieval_pairs(desc, groups, k, cross_k)
+
+# ---------- colmap ----------
+def matcher_command(colmap: str, matcher: str, scene: Path, use_gpu: str, window: int, vocab_tree=None, pairs_path=None) -> list:
+    db = str(scene / DB_NAME)
+    cmd = [colmap]
+    if matcher == "exhaustive":
+        cmd += ["exhaustive_matcher", "--database_path", db]
+    elif matcher == "sequential":
+        cmd += ["sequential_matcher", "--database_path", db, "--SequentialMatching.overlap", str(window)]
+    elif matcher == "vocab_tree":
+        cmd += ["vocab_tree_matcher", "--database_path", db, "--VocabTreeMatching.vocab_tree_path", str(vocab_tree)]
+    elif matcher == "pairs":
+        cmd += ["matches_importer", "--database_path", db, "--match_list_path", str(pairs_path), "--match_type", "pairs"]
+    else:
+        raise ValueError(f"unknown matcher: {matcher}")
+    return cmd + ["--SiftMatching.use_gpu", str(use_gpu)]
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Pick the COLMAP matcher for a scene by image count (exhaustive, sequential, "
+                                             "vocab tree, or a pruned pair list for matches_importer) and run it")
+    ap.add_argument("scene", type=Path, help="Scene folder with images/ and database.db (e.g. .../040625-LundoBin-All)")
+    ap.add_argument("--matcher", default="auto", choices=["auto", "exhaustive", "sequential", "vocab_tree", "pairs"])
+    ap.add_argument("--colmap", default=os.environ.get("COLMAP", "colmap"))
+    ap.add_argument("--use_gpu", default="1", help="--SiftMatching.use_gpu")
+    ap.add_argument("--vocab_tree", default=os.environ.get("VOCABTREE_PATH") or None, help="Vocabulary tree file (default: $VOCABTREE_PATH)")
+    ap.add_argument("--exhaustive_max", type=int, default=EXHAUSTIVE_MAX, help="Largest scene matched exhaustively")
+    ap.add_argument("--window", type=int, default=SEQ_WINDOW, help="Neighbours in capture order matched per image")
+    ap.add_argument("--retrieval_k", type=int, default=RETRIEVAL_K, help="Most similar thumbnails matched per image (pairs)")
+    ap.add_argument("--cross_k", type=int, default=CROSS_K, help="Most similar thumbnails of the other captures matched per image (pairs)")
+    ap.add_argument("--workers", type=int, default=16, help="Threads decoding thumbnails")
+    ap.add_argument("--dry_run", action="store_true", help="Write the plan (and pair list) without running COLMAP")
+    args = ap.parse_args()
+
+    scene = args.scene.resolve()
+    vocab_tree = args.vocab_tree if args.vocab_tree and os.path.isfile(args.vocab_tree) else None
+    if args.vocab_tree and not vocab_tree:
+        print(f"[match] vocabulary tree {args.vocab_tree} not found, ignoring it")
+    tel = Telemetry(scene / LOG_NAME, scene_name(scene), "colmap")
+
+    with tel.phase("match_plan") as rec:
+        names = scene_image_names(scene)
+        if not names:
+            sys.exit(f"No images found for {scene}")
+        if args.matcher == "auto":
+            matcher, reason = choose_matcher(names, args.exhaustive_max, vocab_tree)
+        else:
+            matcher, reason = args.matcher, "requested"
+        if matcher == "vocab_tree" and not vocab_tree:
+            sys.exit("--matcher vocab_tree needs --vocab_tree (or $VOCABTREE_PATH)")
+        n = len(names)
+        plan = {"generated_at": datetime.now().isoformat(timespec="seconds"), "images": n, "matcher": matcher,
+                "reason": reason, "exhaustive_pairs": n * (n - 1) // 2}
+        pairs_path = scene / PAIRS_NAME
+        if matcher == "pairs":
+            pairs = plan_pairs(scene, names, args.window, args.retrieval_k, args.cross_k, args.workers)
+            write_text_atomic(pairs_path, "".join(f"{names[i]} {names[j]}\n" for i, j in sorted(pairs)))
+            plan.update(pairs=len(pairs), pairs_file=str(pairs_path),
+                        params={"window": args.window, "retrieval_k": args.retrieval_k, "cross_k": args.cross_k})
+        write_json_atomic(scene / PLAN_NAME, plan)
+        rec.update(images=n, matcher=matcher, pairs=plan.get("pairs"))
+
+    print(f"[match] {matcher}: {reason}" + (f" -> {plan['pairs']} pairs instead of {plan['exhaustive_pairs']}" if "pairs" in plan else ""))
+    cmd = matcher_command(args.colmap, matcher, scene, args.use_gpu, args.window, vocab_tree, pairs_path)
+    if args.dry_run:
+        print("[match] dry run: " + " ".join(cmd))
+        return
+    sys.exit(tel.run(cmd, cmd[1]))
+
+if __name__ == "__main__":
+    main()
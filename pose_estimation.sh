@@ -22,13 +22,16 @@ echo "==> $(date -Is) Start | BASE=$BASE | SCENE=$SCENE"
 # 1) Optional pre-processing
 bash local_colmap_and_resize.sh "$SCENE"
 
-# 2) .bin -> .txt
-colmap model_converter \
-  --input_path "$SCENE/undistortion_sparse/0" \
-  --output_path "$SCENE/undistortion_sparse/0" \
-  --output_type TXT
-
-# 3) .txt -> .json
+# 2) Optional .bin -> .txt (colmap2nerf.py reads the .bin model directly)
+if [[ "${EXPORT_TXT:-0}" == "1" ]]; then
+  python3 telemetry.py exec --scene "$SCENE" --stage convert -- \
+  "${COLMAP:-colmap}" model_converter \
+    --input_path "$SCENE/undistortion_sparse/0" \
+    --output_path "$SCENE/undistortion_sparse/0" \
+    --output_type TXT
+fi
+
+# 3) model -> .json
 python3 colmap2nerf.py \
   --aabb_scale 128 \
   --images "$SCENE/undistortion_images" \
@@ -1,5 +1,7 @@
 #!/usr/bin/env bash
 
+# Single-pass, parallel and resumable Python version of this script: python3 ingest_raw.py [RAW_DIR]
+
 # heic to jpg
 find ./  -type f -iname '*.HEIC' -exec mogrify -format jpg {} \; -exec rm {} \;
 # to JPG
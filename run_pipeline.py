@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+from contextlib import ExitStack
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from atomic_io import LOCK_DIR, file_lock, write_json_atomic
+from telemetry import ENV_LOG, LOG_NAME, Telemetry
+
+# ---------- config ----------
+HERE = Path(__file__).resolve().parent
+STATE_NAME = "pipeline_state.json"
+
+# stage name -> worker pool it runs in; stages of one scene run in this order
+STAGES = [
+    ("make_all", "io"),
+    ("colmap", "colmap"),
+    ("convert", "io"),
+    ("colmap2nerf", "cpu"),
+    ("make_split", "io"),
+]
+# stages that append their own "total" record; the runner logs these as "process" so totals are not counted twice
+SELF_TIMED = {"make_all", "colmap2nerf", "make_split"}
+
+# ---------- stages ----------
+def stage_command(stage: str, base: Path, scene: Path, args) -> list:
+    """Command line of one stage, mirroring pose_estimation.sh."""
+    py = sys.executable
+    if stage == "make_all":
+        return [py, str(HERE / "make_all.py"), str(base), "--sync"]
+    if stage == "colmap":
+        return ["bash", str(HERE / "local_colmap_and_resize.sh"), str(scene)]
+    if stage == "convert":
+        model = str(scene / "undistortion_sparse" / "0")
+        return [args.colmap, "model_converter", "--input_path", model, "--output_path", model, "--output_type", "TXT"]
+    if stage == "colmap2nerf":
+        return [py, str(HERE / "colmap2nerf.py"),
+                "--aabb_scale", str(args.aabb_scale),
+                "--images", str(scene / "undistortion_images"),
+                "--out", str(scene / "transforms.json"),
+                "--text", str(scene / "undistortion_sparse" / "0")]
+    if stage == "make_split":
+        return [py, str(HERE / "make_split.py"), str(scene)]
+    raise ValueError(f"unknown stage: {stage}")
+
+# ---------- state ----------
+class PipelineState:
+    """Per-scene stage status persisted to a JSON file so a restart skips finished stages."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {}
+        if path.is_file():
+            try:
+                self.data = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                print(f"[WARN] ignoring unreadable state file {path}")
+
+    def is_done(self, scene: str, stage: str) -> bool:
+        with self.lock:
+            return self.data.get(scene, {}).get(stage, {}).get("status") == "done"
+
+    def record(self, scene: str, stage: str, status: str, **extra):
+        with self.lock:
+            self.data.setdefault(scene, {})[stage] = {
+                "status": status,
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                **extra,
+            }
+            write_json_atomic(self.path, self.data)
+
+    def reset(self, scene: str):
+        with self.lock:
+            self.data.pop(scene, None)
+
+# ---------- runner ----------
+def run_scene(base: Path, stages: list, pools: dict, state: PipelineState, args) -> bool:
+    name = base.name
+    scene = base / f"{name}-All"
+    scene.mkdir(parents=True, exist_ok=True)
+    log_path = scene / "pose_log.txt"
+    # every stage of the scene (and the COLMAP calls of the shell scripts) appends to one file
+    env = dict(os.environ, COLMAP=args.colmap, **{ENV_LOG: str(scene / LOG_NAME)})
+    tel = Telemetry(scene / LOG_NAME, name)
+
+    for stage, pool in stages:
+        if state.is_done(name, stage):
+            print(f"[{name}] {stage}: already done, skipping")
+            continue
+        cmd = stage_command(stage, base, scene, args)
+        with pools[pool]:
+            print(f"[{name}] {stage}: start ({pool})")
+            with open(log_path, "a") as log:
+                log.write(f"==> {datetime.now().isoformat(timespec='seconds')} {stage} | {' '.join(cmd)}\n")
+                log.flush()
+                tel.stage = stage
+                ret = tel.run(cmd, "process" if stage in SELF_TIMED else "total",
+                              cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if ret != 0:
+            print(f"[{name}] {stage}: failed (exit {ret}), see {log_path}")
+            state.record(name, stage, "failed", returncode=ret)
+            return False
+        state.record(name, stage, "done")
+        print(f"[{name}] {stage}: done")
+    return True
+
+def find_scenes(root: Path) -> list:
+    return sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+
+# ---------- main ----------
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run make_all -> COLMAP -> convert -> colmap2nerf -> make_split for every scene under a dataset root, "
+                    "in parallel and resumable."
+    )
+    parser.add_argument("root", type=Path, nargs="?", default=Path("."), help="Dataset root holding one folder per scene")
+    parser.add_argument("--scenes", nargs="*", default=None, help="Only these scene folder names")
+    parser.add_argument("--stages", nargs="*", default=None, choices=[s for s, _ in STAGES],
+                        help="Only these stages (default: all but convert unless --export_txt)")
+    parser.add_argument("--export_txt", action="store_true", help="Also run the .bin -> .txt model_converter stage")
+    parser.add_argument("--colmap_workers", type=int, default=1, help="Concurrent COLMAP runs (GPU/CPU heavy)")
+    parser.add_argument("--cpu_workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Concurrent CPU-heavy python stages")
+    parser.add_argument("--io_workers", type=int, default=8, help="Concurrent I/O-heavy stages")
+    parser.add_argument("--aabb_scale", default="128", help="Passed to colmap2nerf.py")
+    parser.add_argument("--colmap", default=os.environ.get("COLMAP", "colmap"), help="COLMAP binary (e.g. a local fake for testing)")
+    parser.add_argument("--state", type=Path, default=None, help=f"State file (default: ROOT/{STATE_NAME})")
+    parser.add_argument("--restart", action="store_true", help="Ignore the state file and rerun every stage")
+    args = parser.parse_args()
+
+    root = args.root.resolve()
+    if args.stages is not None:
+        stages = [(s, p) for s, p in STAGES if s in args.stages]
+    else:
+        stages = [(s, p) for s, p in STAGES if s != "convert" or args.export_txt]
+
+    bases = find_scenes(root)
+    if args.scenes is not None:
+        bases = [b for b in bases if b.name in set(args.scenes)]
+    if not bases:
+        sys.exit(f"No scenes found under {root}")
+
+    # the state file has a single writer: a second runner on the same root stops here
+    runner = ExitStack()
+    try:
+        runner.enter_context(file_lock(root / LOCK_DIR / "run_pipeline.lock", timeout=0))
+    except TimeoutError as e:
+        sys.exit(f"Another run_pipeline.py is running on {root} ({e})")
+    with runner:
+        state = PipelineState(args.state or root / STATE_NAME)
+        if args.restart:
+            for b in bases:
+                state.reset(b.name)
+
+        pools = {
+            "colmap": threading.BoundedSemaphore(max(1, args.colmap_workers)),
+            "cpu": threading.BoundedSemaphore(max(1, args.cpu_workers)),
+            "io": threading.BoundedSemaphore(max(1, args.io_workers)),
+        }
+        max_workers = args.colmap_workers + args.cpu_workers + args.io_workers
+        print(f"Running {len(bases)} scenes, stages: {' -> '.join(s for s, _ in stages)}")
+
+        ok_scenes, bad_scenes = [], []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as ex:
+            futures = {b.name: ex.submit(run_scene, b, stages, pools, state, args) for b in bases}
+            for name, fut in futures.items():
+                try:
+                    ok = fut.result()
+                except Exception as e:
+                    print(f"[WARN] {name} failed ({e}) — continuing...")
+                    ok = False
+                (ok_scenes if ok else bad_scenes).append(name)
+
+    print()
+    print("================ SUMMARY ================")
+    print(f"Succeeded: {len(ok_scenes)}")
+    for s in ok_scenes:
+        print(f"  ✔ {s}")
+    print(f"Failed:    {len(bad_scenes)}")
+    for s in bad_scenes:
+        print(f"  ✖ {s}")
+
+    # Return non-zero if any failed
+    if bad_scenes:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
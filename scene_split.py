@@ -0,0 +1,41 @@
+import os
+from pathlib import Path
+
+from atomic_io import write_json_atomic
+
+# ---------- config ----------
+# frames whose file name contains the keyword also go to transforms_<kind>.json
+SPLIT_KEYWORDS = {"clutter": "clutter_", "extra": "extra_"}
+# split.json role -> frame kind (make_all.py prefixes Clutter images with clutter_, Clean ones with extra_)
+SPLIT_ROLES = {"train": "clutter", "test": "extra"}
+SPLIT_NAME = "split.json"
+SPLIT_INDEX_NAME = "split_index.json"
+
+# ---------- helpers ----------
+def frame_kinds(file_path):
+    return ["all"] + [kind for kind, key in SPLIT_KEYWORDS.items() if key in file_path]
+
+def split_indices(names) -> dict:
+    """One pass over the frame names: kind -> indices of the frames of that kind, in frame order."""
+    index = {kind: [] for kind in ["all", *SPLIT_KEYWORDS]}
+    for i, name in enumerate(names):
+        for kind in frame_kinds(name):
+            index[kind].append(i)
+    return index
+
+def write_split(out_dir, names, index=None):
+    """
+    Write out_dir/split.json (train/test image names, sorted) and out_dir/split_index.json
+    (train/test as indices into the frame order of `names`, i.e. of transforms.json).
+    `index` is the output of split_indices(names) when the caller already has it.
+    Returns (split_path, index_path, {role: count}).
+    """
+    out_dir = Path(out_dir)
+    if index is None:
+        index = split_indices(names)
+    split = {role: sorted(os.path.basename(names[i]) for i in index[kind]) for role, kind in SPLIT_ROLES.items()}
+    split_path = out_dir / SPLIT_NAME
+    index_path = out_dir / SPLIT_INDEX_NAME
+    write_json_atomic(split_path, split)
+    write_json_atomic(index_path, {"num_frames": len(names), **{role: index[kind] for role, kind in SPLIT_ROLES.items()}}, indent=None)
+    return split_path, index_path, {role: len(v) for role, v in split.items()}
@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import hashlib
+import platform
+import importlib.metadata
+from datetime import datetime
+from pathlib import Path
+
+from atomic_io import LOCK_DIR, file_lock, write_json_atomic
+
+# ---------- config ----------
+MANIFEST_NAME = ".stage_cache.json"
+# import name -> distributions that may provide it, for modules whose distribution is named differently
+DISTRIBUTIONS = {"cv2": ("opencv-python", "opencv-python-headless", "opencv-contrib-python", "opencv-contrib-python-headless")}
+
+# ---------- fingerprints ----------
+def _digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def file_sha256(path: Path, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def fingerprint_tree(root: Path, content: bool = False, exts=None, exclude_prefix=()) -> dict:
+    """
+    Fingerprint of every file under root: relative name + size + mtime, or the file hash when
+    content=True. exts limits it to files with these (lower-case) suffixes; files whose name starts
+    with one of exclude_prefix are ignored.
+    """
+    root = Path(root)
+    entries = []
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except FileNotFoundError:
+            continue
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(Path(e.path))
+                elif e.is_file():
+                    if e.name.startswith("."):  # hidden files, e.g. in-flight atomic_io temporaries
+                        continue
+                    if exts is not None and os.path.splitext(e.name)[1].lower() not in exts:
+                        continue
+                    if exclude_prefix and e.name.startswith(tuple(exclude_prefix)):
+                        continue
+                    rel = os.path.relpath(e.path, root)
+                    if content:
+                        entries.append((rel, file_sha256(Path(e.path))))
+                    else:
+                        st = e.stat()
+                        entries.append((rel, st.st_size, st.st_mtime_ns))
+    entries.sort()
+    return {"files": len(entries), "digest": _digest(entries)}
+
+def fingerprint_files(paths, content: bool = True) -> dict:
+    """Fingerprint of a fixed list of (small) files; missing files are recorded as such."""
+    out = {}
+    for p in paths:
+        p = Path(p)
+        if not p.is_file():
+            out[p.name] = None
+        elif content:
+            out[p.name] = file_sha256(p)
+        else:
+            st = p.stat()
+            out[p.name] = [st.st_size, st.st_mtime_ns]
+    return out
+
+def module_version(name: str):
+    """Installed version of a module from the package metadata, so the module itself is not imported."""
+    for dist in DISTRIBUTIONS.get(name, (name,)):
+        try:
+            return importlib.metadata.version(dist)
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    mod = sys.modules.get(name)
+    return getattr(mod, "__version__", None) if mod is not None else None
+
+def tool_versions(*scripts, modules=()) -> dict:
+    """Hashes of the given script files plus python and library versions."""
+    tools = {"python": platform.python_version()}
+    for s in scripts:
+        s = Path(s)
+        tools[s.name] = file_sha256(s) if s.is_file() else None
+    for m in modules:
+        tools[m] = module_version(m)
+    return tools
+
+# ---------- cache ----------
+class StageCache:
+    """
+    Per-scene manifest (MANIFEST_NAME in out_dir) of the input fingerprint each stage was last run with.
+    A stage is up to date when its recorded inputs equal the current ones and its outputs still exist.
+    """
+
+    def __init__(self, out_dir: Path, stage: str):
+        self.out_dir = Path(out_dir)
+        self.stage = stage
+        self.path = self.out_dir / MANIFEST_NAME
+
+    def _load(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def last_run(self):
+        """The manifest entry of the stage's last recorded run, or None."""
+        return self._load().get(self.stage)
+
+    def reasons(self, inputs: dict, outputs) -> list:
+        """Why the stage has to run; an empty list means it is up to date."""
+        prev = self.last_run()
+        if prev is None:
+            return ["no previous run recorded"]
+        why = []
+        old = prev.get("inputs", {})
+        for key in sorted(set(old) | set(inputs)):
+            if key not in old:
+                why.append(f"new input '{key}'")
+            elif key not in inputs:
+                why.append(f"input '{key}' dropped")
+            elif old[key] != inputs[key]:
+                if isinstance(old[key], dict) and isinstance(inputs[key], dict):
+                    changed = sorted(k for k in set(old[key]) | set(inputs[key]) if old[key].get(k) != inputs[key].get(k))
+                    why.append(f"{key} changed: {', '.join(changed)}")
+                else:
+                    why.append(f"{key} changed")
+        for o in outputs:
+            if not Path(o).exists():
+                why.append(f"output missing: {o}")
+        return why
+
+    def check(self, inputs: dict, outputs, force: bool = False, explain: bool = False) -> bool:
+        """True if the stage can be skipped. Prints the reasons for a rerun when explain is set."""
+        why = self.reasons(inputs, outputs)
+        if force:
+            why = ["--force"] + why
+        if not why:
+            print(f"[cache] {self.stage}: up to date (key {_digest(inputs)[:12]}), skipping")
+            return True
+        if explain:
+            print(f"[cache] {self.stage}: rerun because " + "; ".join(why))
+        return False
+
+    def record(self, inputs: dict, outputs):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        # stages of one folder share the manifest: read-modify-write under a lock so no entry is lost
+        with file_lock(self.out_dir / LOCK_DIR / "stage_cache.lock"):
+            data = self._load()
+            data[self.stage] = {
+                "key": _digest(inputs),
+                "inputs": inputs,
+                "outputs": [str(o) for o in outputs],
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            write_json_atomic(self.path, data)
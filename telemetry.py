@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from contextlib import contextmanager
+from collections import defaultdict
+
+try:
+    import resource
+except ImportError:  # not POSIX: no rusage, wall times only
+    resource = None
+
+# ---------- config ----------
+LOG_NAME = "telemetry.jsonl"
+# when set, every stage appends here instead of its default file (run_pipeline.py sets it per scene)
+ENV_LOG = "TELEMETRY_LOG"
+IO_KEYS = ("rchar", "wchar", "read_bytes", "write_bytes")
+
+# ---------- probes ----------
+def read_proc_io(pid="self") -> dict:
+    """Byte counters of /proc/<pid>/io (zeros where unavailable, e.g. not Linux)."""
+    out = dict.fromkeys(IO_KEYS, 0)
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                k, v = line.split(":")
+                if k in out:
+                    out[k] = int(v)
+    except OSError:
+        pass
+    return out
+
+def _maxrss_mb(ru):
+    if ru is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(ru.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def scene_name(path) -> str:
+    """Scene label for a BASE or BASE/BASE-All folder: the BASE name."""
+    name = Path(path).resolve().name
+    return name[:-len("-All")] if name.endswith("-All") else name
+
+# ---------- recorder ----------
+class Telemetry:
+    """
+    Appends one JSON line per measured phase/command to a log file shared by every process of a scene.
+    Each line: ts, host, pid, scene, stage, phase, status, wall_s, cpu_s, peak_rss_mb, byte counters and
+    any extra fields (e.g. files=N). phase "total" is the whole stage; the summarizer ranks those, summing the
+    phases of a stage that has none.
+    """
+
+    def __init__(self, path=None, scene=None, stage=None):
+        path = os.environ.get(ENV_LOG) or path
+        self.path = Path(path) if path else None
+        self.scene = scene
+        self.stage = stage
+
+    def write(self, rec: dict):
+        if self.path is None:
+            return
+        rec = {"ts": datetime.now().isoformat(timespec="seconds"), "host": socket.gethostname(), "pid": os.getpid(),
+               "scene": self.scene, "stage": self.stage, **rec}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # one write() of one line on an O_APPEND file, so concurrent stages do not interleave
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec) + "\n")
+
+    @contextmanager
+    def phase(self, name: str = "total", **extra):
+        """Measure the enclosed block of this process. Extra fields can be added to the yielded dict."""
+        io0 = read_proc_io()
+        t0, c0 = time.perf_counter(), time.process_time()
+        rec = dict(extra)
+        status = "ok"
+        try:
+            yield rec
+        except BaseException as e:
+            status = "error" if not isinstance(e, SystemExit) or e.code not in (0, None) else "ok"
+            raise
+        finally:
+            io1 = read_proc_io()
+            self.write({
+                "phase": name,
+                "status": status,
+                "wall_s": round(time.perf_counter() - t0, 4),
+                "cpu_s": round(time.process_time() - c0, 4),
+                "peak_rss_mb": _maxrss_mb(resource.getrusage(resource.RUSAGE_SELF) if resource else None),
+                **{k: io1[k] - io0[k] for k in IO_KEYS},
+                **rec,
+            })
+
+    def run(self, cmd, name: str = None, **popen_kwargs) -> int:
+        """
+        Run a command and record its wall time, CPU time (user+sys of it and the children it waited
+        for), peak RSS and block I/O from wait4(). Returns the exit code, 127 if the command cannot
+        be started. Without wait4 (not POSIX) only the wall time is recorded and the other fields are null.
+        """
+        t0 = time.perf_counter()
+        ru, error = None, None
+        try:
+            if hasattr(os, "wait4"):
+                p = subprocess.Popen(cmd, **popen_kwargs)
+            else:
+                returncode = subprocess.run(cmd, **popen_kwargs).returncode
+        except OSError as e:  # not found / not executable: record it like the shell's 127
+            returncode, error = 127, f"{type(e).__name__}: {e}"
+        else:
+            if hasattr(os, "wait4"):
+                _, status, ru = os.wait4(p.pid, 0)
+                returncode = p.returncode = os.waitstatus_to_exitcode(status)  # reaped: Popen must not wait again
+        self.write({
+            "phase": name or os.path.basename(str(cmd[0])),
+            "status": "ok" if returncode == 0 else f"exit {returncode}",
+            "wall_s": round(time.perf_counter() - t0, 4),
+            "cpu_s": round(ru.ru_utime + ru.ru_stime, 4) if ru else None,
+            "peak_rss_mb": _maxrss_mb(ru),
+            "read_bytes": ru.ru_inblock * 512 if ru else None,
+            "write_bytes": ru.ru_oublock * 512 if ru else None,
+            "cmd": " ".join(map(str, cmd)),
+            **({"error": error} if error else {}),
+        })
+        return returncode
+
+# ---------- summary ----------
+def load_records(paths) -> list:
+    recs = []
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        recs.append(json.loads(line))
+                    except ValueError:
+                        pass
+    return recs
+
+def find_logs(targets) -> list:
+    found = []
+    for t in map(Path, targets):
+        if t.is_file():
+            found.append(t)
+        elif t.is_dir():
+            # dataset root, BASE and BASE/BASE-All, without walking the image folders
+            for pattern in (LOG_NAME, f"*/{LOG_NAME}", f"*/*/{LOG_NAME}"):
+                found.extend(sorted(t.glob(pattern)))
+    return found
+
+def phase_totals(recs: list) -> list:
+    """
+    A synthetic "total" for every (scene, stage) that only logged phases, e.g. the COLMAP calls of
+    pose_estimation.sh: wall/CPU summed, peak RSS maxed. Scene-less records (dataset-wide wrappers) are left out.
+    """
+    have = {(r.get("scene"), r.get("stage")) for r in recs if r.get("phase") == "total"}
+    out = {}
+    for r in recs:
+        key = (r.get("scene"), r.get("stage"))
+        if r.get("phase") == "total" or key in have or key[0] is None:
+            continue
+        t = out.setdefault(key, {"scene": key[0], "stage": key[1], "phase": "total", "status": "ok",
+                                 "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": 0.0})
+        t["wall_s"] += r.get("wall_s") or 0.0
+        t["cpu_s"] += r.get("cpu_s") or 0.0
+        t["peak_rss_mb"] = max(t["peak_rss_mb"], r.get("peak_rss_mb") or 0.0)
+        if r.get("status") != "ok":
+            t["status"] = r.get("status")
+    return list(out.values())
+
+def summarize(recs: list, top: int = 10) -> dict:
+    """Rank scenes (sum of their stage totals) and stages (across scenes) by wall time."""
+    totals = [r for r in recs if r.get("phase") == "total"] + phase_totals(recs)
+    scenes = defaultdict(lambda: {"wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": 0.0, "stages": 0, "errors": 0})
+    stages = defaultdict(lambda: {"wall_s": 0.0, "cpu_s": 0.0, "runs": 0, "max_wall_s": 0.0, "peak_rss_mb": 0.0})
+    for r in totals:
+        s = scenes[r.get("scene") or "?"]
+        s["wall_s"] += r.get("wall_s") or 0.0
+        s["cpu_s"] += r.get("cpu_s") or 0.0
+        s["peak_rss_mb"] = max(s["peak_rss_mb"], r.get("peak_rss_mb") or 0.0)
+        s["stages"] += 1
+        s["errors"] += r.get("status") != "ok"
+        g = stages[r.get("stage") or "?"]
+        g["wall_s"] += r.get("wall_s") or 0.0
+        g["cpu_s"] += r.get("cpu_s") or 0.0
+        g["runs"] += 1
+        g["max_wall_s"] = max(g["max_wall_s"], r.get("wall_s") or 0.0)
+        g["peak_rss_mb"] = max(g["peak_rss_mb"], r.get("peak_rss_mb") or 0.0)
+    phases = defaultdict(lambda: {"wall_s": 0.0, "runs": 0})
+    for r in recs:
+        if r.get("phase") != "total":
+            ph = phases[f"{r.get('stage')}:{r.get('phase')}"]
+            ph["wall_s"] += r.get("wall_s") or 0.0
+            ph["runs"] += 1
+    rank = lambda d: [{"name": k, **{kk: round(vv, 3) if isinstance(vv, float) else vv for kk, vv in v.items()}}
+                      for k, v in sorted(d.items(), key=lambda kv: -kv[1]["wall_s"])[:top]]
+    return {"records": len(recs), "scenes": rank(scenes), "stages": rank(stages), "phases": rank(phases)}
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Stage telemetry: run a timed command, or summarize telemetry.jsonl files")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("exec", help="Run a command and append its metrics (used for the COLMAP calls in the shell scripts)")
+    ex.add_argument("--log", default=None, help=f"JSONL file (default: ${ENV_LOG}, else SCENE/{LOG_NAME})")
+    ex.add_argument("--scene", default=None, help="Scene folder the command works on")
+    ex.add_argument("--stage", required=True)
+    ex.add_argument("--phase", default="total")
+    ex.add_argument("command", nargs=argparse.REMAINDER)
+    sm = sub.add_parser("summarize", help="Rank the slowest scenes, stages and phases")
+    sm.add_argument("targets", nargs="+", help=f"{LOG_NAME} files or folders searched for them")
+    sm.add_argument("--top", type=int, default=10)
+    sm.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = ap.parse_args()
+
+    if args.cmd == "exec":
+        cmd = args.command[1:] if args.command[:1] == ["--"] else args.command
+        if not cmd:
+            ap.error("exec needs a command after --")
+        log = args.log or (Path(args.scene) / LOG_NAME if args.scene else None)
+        scene = scene_name(args.scene) if args.scene else None
+        sys.exit(Telemetry(log, scene, args.stage).run(cmd, args.phase))
+
+    logs = find_logs(args.targets)
+    if not logs:
+        sys.exit(f"No {LOG_NAME} found in {' '.join(args.targets)}")
+    summary = summarize(load_records(logs), args.top)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{summary['records']} records from {len(logs)} files")
+    for title, key, cols in (("Slowest scenes", "scenes", ("wall_s", "cpu_s", "peak_rss_mb", "stages", "errors")),
+                             ("Slowest stages", "stages", ("wall_s", "cpu_s", "runs", "max_wall_s", "peak_rss_mb")),
+                             ("Slowest phases", "phases", ("wall_s", "runs"))):
+        print()
+        print(f"================ {title} ================")
+        print(f"{'name':40s} " + " ".join(f"{c:>12s}" for c in cols))
+        for row in summary[key]:
+            print(f"{row['name'][:40]:40s} " + " ".join(f"{row[c]:>12}" for c in cols))
+
+if __name__ == "__main__":
+    main()
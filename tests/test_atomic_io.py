@@ -0,0 +1,105 @@
+import os
+import stat
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from atomic_io import (LOCK_DIR, SCRATCH_PREFIX, UMASK, atomic_path, atomic_write, file_lock, scratch_dir, stage_lock,
+                       write_json_atomic)
+
+REPO = Path(__file__).resolve().parents[1]
+
+def test_atomic_write_replaces_on_success(tmp_path):
+    out = tmp_path / "meta.json"
+    write_json_atomic(out, {"a": 1})
+    assert out.read_text() == '{\n  "a": 1\n}\n'
+    with atomic_write(out, "wb") as f:
+        f.write(b"bytes")
+    assert out.read_bytes() == b"bytes"
+    assert os.listdir(tmp_path) == ["meta.json"]
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    out = tmp_path / "meta.json"
+    out.write_text("old")
+    with pytest.raises(RuntimeError):
+        with atomic_write(out) as f:
+            f.write("partial")
+            raise RuntimeError("crash")
+    assert out.read_text() == "old"
+    assert os.listdir(tmp_path) == ["meta.json"]
+
+def test_atomic_path_keeps_the_extension(tmp_path):
+    out = tmp_path / "poses.npz"
+    with atomic_path(out) as tmp:
+        assert tmp.endswith(".npz") and os.path.basename(tmp).startswith(".poses.npz.")
+        np.savez(tmp, a=np.arange(3))
+    with np.load(out) as z:
+        assert z["a"].tolist() == [0, 1, 2]
+    assert os.listdir(tmp_path) == ["poses.npz"]
+
+def test_outputs_get_the_umask_default_or_the_old_mode(tmp_path):
+    new = tmp_path / "new.json"
+    write_json_atomic(new, {})
+    assert stat.S_IMODE(os.stat(new).st_mode) == 0o666 & ~UMASK
+    old = tmp_path / "old.npz"
+    old.write_bytes(b"")
+    old.chmod(0o444)
+    with atomic_path(old) as tmp:
+        np.savez(tmp, a=np.arange(3))
+    assert stat.S_IMODE(os.stat(old).st_mode) == 0o444
+    with atomic_write(tmp_path / "old.npz", "wb") as f:
+        f.write(b"again")
+    assert stat.S_IMODE(os.stat(old).st_mode) == 0o444 and old.read_bytes() == b"again"
+
+def hold_lock(path, seconds):
+    """A child process holding file_lock(path) for `seconds`; returns once it has the lock."""
+    code = ("import sys, time; from atomic_io import file_lock\n"
+            f"with file_lock({str(path)!r}):\n    print('locked', flush=True); time.sleep({seconds})")
+    p = subprocess.Popen([sys.executable, "-c", code], cwd=REPO, stdout=subprocess.PIPE, text=True)
+    assert p.stdout.readline().strip() == "locked"
+    return p
+
+def test_file_lock_excludes_other_processes(tmp_path):
+    path = tmp_path / LOCK_DIR / "colmap.lock"
+    child = hold_lock(path, 1.0)
+    try:
+        with pytest.raises(TimeoutError, match=f"pid {child.pid}"):
+            with file_lock(path, timeout=0):
+                pass
+        t0 = time.monotonic()
+        with file_lock(path, timeout=10):
+            assert time.monotonic() - t0 > 0.2  # waited for the child to let go
+    finally:
+        child.wait()
+
+def test_lock_is_released_when_the_holder_dies(tmp_path):
+    path = tmp_path / "x.lock"
+    child = hold_lock(path, 30)
+    child.kill()
+    child.wait()
+    with file_lock(path, timeout=2):
+        pass
+
+def test_stage_lock_path(tmp_path):
+    with stage_lock(tmp_path, "colmap2nerf", timeout=0) as path:
+        assert path == tmp_path / LOCK_DIR / "colmap2nerf.lock"
+        assert path.read_text().startswith(f"pid {os.getpid()} ")
+    with stage_lock(tmp_path, "colmap2nerf", timeout=0):
+        pass  # reentrant after release
+
+def test_scratch_dir(tmp_path):
+    with scratch_dir(tmp_path, "colmap") as d:
+        assert d.parent == tmp_path and d.name.startswith(f"{SCRATCH_PREFIX}colmap-")
+        (d / "db").write_text("x")
+    assert not d.exists()
+    with pytest.raises(RuntimeError):
+        with scratch_dir(tmp_path) as d:
+            raise RuntimeError
+    assert not d.exists()
+    with scratch_dir(tmp_path, keep=True) as d:
+        pass
+    assert d.is_dir()
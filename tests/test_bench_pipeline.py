@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from bench_pipeline import compare, look_at_w2c, rotmat2qvec, scaling_exponents, synth_scene
+from colmap2nerf import qvec2rotmat
+from colmap_model import read_model
+from image_probe import probe_image
+
+def test_rotmat2qvec_inverts_qvec2rotmat():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        q = rng.normal(size=4)
+        q /= np.linalg.norm(q)
+        q *= np.sign(q[0])
+        assert np.allclose(rotmat2qvec(qvec2rotmat(q)), q, atol=1e-12)
+
+def test_look_at_points_the_camera_at_the_target():
+    center, target = np.array([4.0, 1.0, 2.0]), np.array([0.1, -0.2, 0.3])
+    q, t = look_at_w2c(center, target)
+    R = qvec2rotmat(q)
+    assert np.allclose(R @ center + t, 0, atol=1e-12)  # camera center maps to the origin
+    cam = R @ target + t
+    assert np.allclose(cam[:2], 0, atol=1e-12) and cam[2] > 0  # target straight ahead on +z
+
+def test_synth_scene_layout(tmp_path):
+    base = synth_scene(tmp_path, 6, width=64, height=48, points=5, variants=2)
+    scene = base / f"{base.name}-All"
+    assert base.name == "010125-Synth6"
+    assert len(list((base / f"{base.name}-Clean" / "images").iterdir())) == 3
+    cam_bin, img_bin = read_model(scene / "undistortion_sparse" / "0", "bin")
+    cam_txt, img_txt = read_model(scene / "undistortion_sparse" / "0", "txt")
+    assert cam_bin == cam_txt
+    names = [f"{'clutter_' if k % 2 else 'extra_'}IMG_{k:05d}.jpg" for k in range(6)]
+    assert img_bin["names"] == img_txt["names"] == names
+    assert sorted(p.name for p in (scene / "undistortion_images").iterdir()) == sorted(names)
+    assert np.allclose(img_bin["qvecs"], img_txt["qvecs"], rtol=0, atol=0)
+    info = probe_image(scene / "undistortion_images" / img_bin["names"][1])
+    assert (info["w"], info["h"]) == (64, 48)
+
+def test_scaling_exponents_and_compare():
+    results = {"100": {"a": 1.0, "b": 0.2}, "1000": {"a": 10.0, "b": 2.0}, "5000": {"a": 250.0}}
+    exps = scaling_exponents(results)
+    assert exps["a"]["sizes"] == [1000, 5000] and exps["a"]["b"] == pytest.approx(2.0, abs=1e-3)
+    assert exps["b"] == {"sizes": [100, 1000], "b": 1.0}
+
+    baseline = {"results": {"1000": {"a": 10.0, "b": 2.0}, "5000": {"a": 100.0}},
+                "exponents": {"a": {"sizes": [1000, 5000], "b": 1.431}, "b": {"sizes": [10, 1000], "b": 0.1}}}
+    current = {"results": {"1000": {"a": 12.0, "b": 3.5, "tiny": 0.01}, "5000": {"a": 250.0}}, "exponents": exps}
+    found = compare(current, baseline, tolerance=0.5)
+    assert any(f.strip().startswith("1000 frames  b:") for f in found)
+    assert any("5000 frames  a:" in f for f in found)
+    assert any(f.startswith("scaling  a:") for f in found)
+    assert not any(" a: 12.000s" in f or "tiny" in f or f.startswith("scaling  b") for f in found)
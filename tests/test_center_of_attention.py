@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from colmap2nerf import center_of_attention, closest_point_2_lines
+
+def rig(n, seed=0, target=(0.3, -0.2, 0.5)):
+    """c2w matrices of n cameras on a noisy ring, each looking roughly at target along +z."""
+    rng = np.random.default_rng(seed)
+    mats = np.tile(np.eye(4), (n, 1, 1))
+    for k in range(n):
+        a = 2 * np.pi * k / n
+        o = np.array([3 * np.cos(a), 3 * np.sin(a), rng.normal(0, 0.3)])
+        z = np.asarray(target) + rng.normal(0, 0.1, 3) - o
+        z /= np.linalg.norm(z)
+        x = np.cross([0, 0, 1], z)
+        x /= np.linalg.norm(x)
+        mats[k, 0:3, 0:3] = np.stack([x, np.cross(z, x), z], axis=1)
+        mats[k, 0:3, 3] = o
+    return mats
+
+def reference(mats):
+    # the double loop colmap2nerf.py used before the batched solver
+    totw, totp = 0.0, np.zeros(3)
+    for f in mats:
+        for g in mats:
+            p, w = closest_point_2_lines(f[0:3, 3], f[0:3, 2], g[0:3, 3], g[0:3, 2])
+            if w > 0.00001:
+                totp += p * w
+                totw += w
+    return totp / totw if totw > 0.0 else totp
+
+@pytest.mark.parametrize("mode", ["full", "upper"])
+@pytest.mark.parametrize("mem_mb", [256, 0.001])  # 0.001 MB: many small blocks
+def test_matches_the_double_loop(mode, mem_mb):
+    mats = rig(37)
+    assert np.allclose(center_of_attention(mats, mode, mem_mb), reference(mats), rtol=0, atol=1e-12)
+
+def test_sample_mode():
+    mats = rig(60, seed=1)
+    exact = reference(mats)
+    # enough samples for every pair: the exact solve
+    assert np.allclose(center_of_attention(mats, "sample", samples=60 * 59), exact, atol=1e-12)
+    a = center_of_attention(mats, "sample", samples=1500, seed=3)
+    assert np.array_equal(a, center_of_attention(mats, "sample", samples=1500, seed=3))  # seeded
+    assert np.linalg.norm(a - exact) < 0.15  # 5% of the rig radius
+
+def test_parallel_rays_have_no_weight():
+    mats = np.tile(np.eye(4), (3, 1, 1))
+    mats[:, 0, 3] = [0, 1, 2]
+    assert np.array_equal(center_of_attention(mats), np.zeros(3))
@@ -0,0 +1,83 @@
+import json
+import os
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pytest
+
+import check_num_poses
+from check_num_poses import CSV_NAME, annotate_bars, collect_counts, find_scene_alls, load_cached_counts, plot_counts, save_csv
+
+def make_dataset(root):
+    for scene, n in (("040625-Bin", 3), ("050625-Tree", 5)):
+        d = root / "group" / scene / f"{scene}-All"
+        (d / "images" / "nested-All").mkdir(parents=True)
+        for kind, k in (("transforms.json", n), ("transforms_clutter.json", n - 1)):
+            (d / kind).write_text(json.dumps({"frames": [{}] * k}))
+    (root / ".hidden" / "x-All").mkdir(parents=True)
+
+def test_find_scene_alls_prunes(tmp_path):
+    make_dataset(tmp_path)
+    assert [p.relative_to(tmp_path).as_posix() for p in find_scene_alls(tmp_path)] == [
+        "group/040625-Bin/040625-Bin-All", "group/050625-Tree/050625-Tree-All"]
+
+def test_csv_cache_reuses_unchanged_files(tmp_path, monkeypatch):
+    make_dataset(tmp_path)
+    records, reused = collect_counts(tmp_path, {})
+    assert reused == 0
+    assert [(r["scene"], r["kind"], r["frames"]) for r in records] == [
+        ("040625-Bin", "transforms", 3), ("040625-Bin", "transforms_clutter", 2),
+        ("050625-Tree", "transforms", 5), ("050625-Tree", "transforms_clutter", 4)]
+    save_csv(records, tmp_path / CSV_NAME)
+    cached = load_cached_counts(tmp_path / CSV_NAME)
+    assert len(cached) == 4
+
+    reads = []
+    monkeypatch.setattr(check_num_poses, "load_frames_count", lambda p: reads.append(p) or 0)
+    tree = tmp_path / "group" / "050625-Tree" / "050625-Tree-All" / "transforms.json"
+    st = os.stat(tree)
+    os.utime(tree, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    again, reused = collect_counts(tmp_path, cached)
+    assert reused == 3 and reads == [tree]
+    assert [r["frames"] for r in again if r["path"] != str(tree)] == [3, 2, 4]
+
+@pytest.mark.parametrize("dpi", [72, 100, 200])
+def test_annotate_bars_matches_text_placement(dpi):
+    fig, ax = plt.subplots(figsize=(6, 3), dpi=dpi)
+    bars = ax.bar(["a", "b", "c"], [10, 250, 1234])
+    xs = [b.get_x() + b.get_width() / 2 for b in bars]
+    hs = [b.get_height() for b in bars]
+    labels = ["10", "250", "1234"]
+    coll = annotate_bars(ax, xs, hs, labels)
+    # what the per-bar plt.text calls drew
+    texts = [ax.text(x, h + 2, s, ha="center", va="bottom", fontsize=6, rotation=90) for x, h, s in zip(xs, hs, labels)]
+    fig.canvas.draw()
+    renderer = fig.canvas.get_renderer()
+    tol = 1.5 * dpi / 72.0  # glyph outlines are a little tighter than the text box
+    for path, offset, text in zip(coll.get_paths(), ax.transData.transform(coll.get_offsets()), texts):
+        v = coll.get_transform().transform(path.vertices) + offset
+        box = text.get_window_extent(renderer)
+        assert abs((v[:, 0].min() + v[:, 0].max()) / 2 - (box.x0 + box.x1) / 2) < tol
+        assert abs(v[:, 1].min() - box.y0) < tol
+        assert box.y1 - 2 * tol < v[:, 1].max() <= box.y1
+    plt.close(fig)
+
+def test_annotate_bars_follow_the_render_dpi():
+    fig, ax = plt.subplots(figsize=(6, 3), dpi=100)
+    coll = annotate_bars(ax, [0], [10], ["1234"])
+    def label_height():
+        v = coll.get_transform().transform(coll.get_paths()[0].vertices)
+        return v[:, 1].max() - v[:, 1].min()
+    at_100 = label_height()
+    fig.set_dpi(300)  # what savefig(dpi=300) does while it renders
+    assert label_height() == pytest.approx(3 * at_100)
+    plt.close(fig)
+
+def test_plot_counts_saves_every_kind(tmp_path):
+    make_dataset(tmp_path)
+    records, _ = collect_counts(tmp_path, {})
+    plot_counts(records, "save", tmp_path, ["png", "svg"])
+    assert sorted(p.name for p in tmp_path.glob("frames_per_scene_*")) == [
+        "frames_per_scene_transforms.png", "frames_per_scene_transforms.svg",
+        "frames_per_scene_transforms_clutter.png", "frames_per_scene_transforms_clutter.svg"]
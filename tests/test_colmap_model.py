@@ -0,0 +1,101 @@
+import struct
+
+import numpy as np
+
+from colmap_model import (detect_model_format, read_image_names, read_model, write_cameras_binary, write_cameras_text,
+                          write_images_binary, write_images_text)
+
+CAMERAS = {1: ("OPENCV", 640, 480, (500.0, 510.0, 320.0, 240.0, 0.1, -0.2, 0.001, 0.002)),
+           2: ("SIMPLE_RADIAL", 320, 240, (250.0, 160.0, 120.0, 0.05))}
+MODEL_IDS = {"SIMPLE_RADIAL": 2, "OPENCV": 4}
+IMAGES = [  # image_id, qvec, tvec, camera_id, name, points2D
+    (3, (0.9, 0.1, 0.2, 0.3), (1.0, -2.0, 3.0), 1, "clutter_0001.jpg", [(1.5, 2.5, 7), (3.0, 4.0, -1)]),
+    (1, (1.0, 0.0, 0.0, 0.0), (0.0, 0.5, -1.0), 2, "extra_0002.jpg", []),
+    (2, (0.5, 0.5, 0.5, 0.5), (4.0, 5.0, 6.0), 1, "sub/extra_0003.jpg", [(9.0, 9.0, 3)] * 5),
+]
+
+def write_binary(folder):
+    with open(folder / "cameras.bin", "wb") as f:
+        f.write(struct.pack("<Q", len(CAMERAS)))
+        for cid, (model, w, h, params) in CAMERAS.items():
+            f.write(struct.pack("<iiQQ", cid, MODEL_IDS[model], w, h) + struct.pack(f"<{len(params)}d", *params))
+    with open(folder / "images.bin", "wb") as f:
+        f.write(struct.pack("<Q", len(IMAGES)))
+        for iid, q, t, cid, name, pts in IMAGES:
+            f.write(struct.pack("<I4d3dI", iid, *q, *t, cid) + name.encode() + b"\x00")
+            f.write(struct.pack("<Q", len(pts)) + b"".join(struct.pack("<ddq", *p) for p in pts))
+
+def write_text(folder):
+    with open(folder / "cameras.txt", "w") as f:
+        f.write("# Camera list with one line of data per camera:\n")
+        for cid, (model, w, h, params) in CAMERAS.items():
+            f.write(f"{cid} {model} {w} {h} " + " ".join(repr(p) for p in params) + "\n")
+    with open(folder / "images.txt", "w") as f:
+        f.write("# Image list with two lines of data per image:\n")
+        for iid, q, t, cid, name, pts in IMAGES:
+            f.write(f"{iid} " + " ".join(map(repr, q + t)) + f" {cid} {name}\n")
+            f.write(" ".join(f"{x} {y} {p}" for x, y, p in pts) + "\n")
+
+def check(cameras, images):
+    assert cameras == CAMERAS
+    assert images["names"] == [im[4] for im in IMAGES]  # file order, not id order
+    assert images["image_ids"].tolist() == [3, 1, 2]
+    assert images["camera_ids"].tolist() == [1, 2, 1]
+    assert np.array_equal(images["qvecs"], [im[1] for im in IMAGES])
+    assert np.array_equal(images["tvecs"], [im[2] for im in IMAGES])
+
+def test_binary_and_text_agree(tmp_path):
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "txt").mkdir()
+    write_binary(tmp_path / "bin")
+    write_text(tmp_path / "txt")
+    assert detect_model_format(tmp_path / "bin") == "bin" and detect_model_format(tmp_path / "txt") == "txt"
+    check(*read_model(tmp_path / "bin"))
+    check(*read_model(tmp_path / "txt"))
+    check(*read_model(tmp_path / "txt", "txt"))
+
+def test_read_image_names(tmp_path):
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "txt").mkdir()
+    write_binary(tmp_path / "bin")
+    write_text(tmp_path / "txt")
+    names = [im[4] for im in IMAGES]
+    assert read_image_names(str(tmp_path / "bin")) == names
+    assert read_image_names(str(tmp_path / "txt")) == names
+
+def test_empty_model(tmp_path):
+    (tmp_path / "cameras.bin").write_bytes(b"")
+    (tmp_path / "images.bin").write_bytes(struct.pack("<Q", 0))
+    cameras, images = read_model(tmp_path)
+    assert cameras == {} and images["names"] == [] and images["qvecs"].shape == (0, 4)
+
+def test_camera_from_params():
+    from colmap2nerf import camera_from_params
+    cam = camera_from_params(*CAMERAS[1])
+    assert (cam["fl_x"], cam["fl_y"], cam["cx"], cam["cy"]) == (500.0, 510.0, 320.0, 240.0)
+    assert (cam["k1"], cam["k2"], cam["p1"], cam["p2"], cam["is_fisheye"]) == (0.1, -0.2, 0.001, 0.002, False)
+    cam = camera_from_params(*CAMERAS[2])
+    assert (cam["fl_x"], cam["fl_y"], cam["cx"], cam["k1"], cam["k2"]) == (250.0, 250.0, 160.0, 0.05, 0)
+
+def test_writers_round_trip(tmp_path):
+    images = {
+        "image_ids": np.array([im[0] for im in IMAGES]),
+        "qvecs": np.array([im[1] for im in IMAGES]),
+        "tvecs": np.array([im[2] for im in IMAGES]),
+        "camera_ids": np.array([im[3] for im in IMAGES]),
+        "names": [im[4] for im in IMAGES],
+    }
+    points2d = [np.array(im[5], dtype=np.float64).reshape(-1, 3) for im in IMAGES]
+    writers = {"bin": (write_cameras_binary, write_images_binary), "txt": (write_cameras_text, write_images_text)}
+    for fmt, (write_cameras, write_images) in writers.items():
+        folder = tmp_path / fmt
+        folder.mkdir()
+        write_cameras(folder / f"cameras.{fmt}", CAMERAS)
+        write_images(folder / f"images.{fmt}", images, points2d)
+        check(*read_model(folder))
+        assert read_image_names(str(folder)) == images["names"]
+    # byte-identical to the hand-written binary model
+    (tmp_path / "ref").mkdir()
+    write_binary(tmp_path / "ref")
+    for fn in ("cameras.bin", "images.bin"):
+        assert (tmp_path / "bin" / fn).read_bytes() == (tmp_path / "ref" / fn).read_bytes()
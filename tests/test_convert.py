@@ -0,0 +1,38 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from colmap2nerf import convert
+from test_incremental_state import run, write_scene
+
+def test_convert_matches_the_command_line(tmp_path, capsys):
+    write_scene(tmp_path, 8)
+    (tmp_path / "cli").mkdir()
+    (tmp_path / "api").mkdir()
+    cli, _ = run(tmp_path, tmp_path / "cli" / "transforms.json")
+    result = convert(str(tmp_path / "images"), str(tmp_path / "model"), str(tmp_path / "api" / "transforms.json"),
+                     sharpness_workers=2, verbose=False)
+    assert capsys.readouterr().out == ""  # quiet, including the sharpness cache summary
+    for name in ("transforms.json", "transforms_clutter.json", "transforms_extra.json", "split.json", "split_index.json"):
+        assert (tmp_path / "api" / name).read_text() == (tmp_path / "cli" / name).read_text(), name
+
+    assert result["names"] == [f"{'clutter' if i % 2 else 'extra'}_{i:03d}.jpg" for i in range(8)]
+    assert result["file_paths"] == [f["file_path"] for f in cli["frames"]]
+    assert np.allclose(result["c2w"], [f["transform_matrix"] for f in cli["frames"]], rtol=0, atol=1e-15)
+    assert result["sharpness"] == [f["sharpness"] for f in cli["frames"]]
+    assert result["index"]["clutter"] == [1, 3, 5, 7]
+
+def test_missing_camera_raises(tmp_path):
+    write_scene(tmp_path, 3)
+    (tmp_path / "model" / "cameras.txt").write_text("# no cameras\n")
+    with pytest.raises(ValueError, match="No cameras"):
+        convert(str(tmp_path / "images"), str(tmp_path / "model"), str(tmp_path / "transforms.json"), verbose=False)
+
+def test_import_does_not_load_opencv():
+    code = "import sys, colmap2nerf; print('cv2' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=Path(__file__).resolve().parents[1])
+    assert out.stdout.strip() == "False"
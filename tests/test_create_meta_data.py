@@ -0,0 +1,99 @@
+import json
+import os
+
+from PIL import Image
+
+import create_meta_data
+from create_meta_data import DATASET_INDEX_NAME, build_dataset, find_scene_dirs, folder_state, write_scene_manifest
+
+def make_scene(root, name, count=2, size=(32, 24)):
+    scene = root / name
+    for kind in ("Clean", "Clutter"):
+        d = scene / f"{name}-{kind}" / "images"
+        d.mkdir(parents=True)
+        for i in range(count):
+            Image.new("RGB", size).save(d / f"{i}.jpg")
+    return scene
+
+def count_builds(monkeypatch):
+    built = []
+    real = create_meta_data.build_scene
+    def build_scene(scene_dir, root):
+        built.append(scene_dir.name)
+        return real(scene_dir, root)
+    monkeypatch.setattr(create_meta_data, "build_scene", build_scene)
+    return built
+
+def test_folder_state_tracks_image_folders(tmp_path):
+    scene = make_scene(tmp_path, "040625-Bin")
+    (scene / "040625-Bin-All" / "images").mkdir(parents=True)
+    state = folder_state(scene)
+    assert sorted(state) == ["040625-Bin-Clean", "040625-Bin-Clutter"]
+    assert state["040625-Bin-Clean"]["count"] == 2
+    (scene / "040625-Bin-Clean" / "images" / "notes.txt").write_text("x")
+    assert folder_state(scene)["040625-Bin-Clean"]["count"] == 2
+
+def test_scene_manifest_is_incremental(tmp_path, monkeypatch):
+    built = count_builds(monkeypatch)
+    scene = make_scene(tmp_path, "040625-Bin")
+    out = scene / "meta.json"
+    manifest, rebuilt = write_scene_manifest(scene, out)
+    assert rebuilt and manifest["source_state"] == folder_state(scene)
+    assert json.loads(out.read_text()) == manifest
+
+    assert write_scene_manifest(scene, out) == (manifest, False)
+    Image.new("RGB", (32, 24)).save(scene / "040625-Bin-Clutter" / "images" / "9.jpg")
+    manifest, rebuilt = write_scene_manifest(scene, out)
+    assert rebuilt and manifest["clutter"]["count"] == 3
+    assert built == ["040625-Bin"] * 2
+
+def test_build_dataset(tmp_path, monkeypatch):
+    built = count_builds(monkeypatch)
+    make_scene(tmp_path, "040625-Bin", count=2)
+    make_scene(tmp_path, "050625-Tree", count=3, size=(24, 32))
+    make_scene(tmp_path, "060625-Broken", count=1)
+    Image.new("RGB", (8, 8)).save(tmp_path / "060625-Broken" / "060625-Broken-Clean" / "images" / "odd.jpg")
+    (tmp_path / "not-a-scene").mkdir()
+    assert [p.name for p in find_scene_dirs(tmp_path)] == ["040625-Bin", "050625-Tree", "060625-Broken"]
+
+    build_dataset(tmp_path, workers=3)
+    index = json.loads((tmp_path / DATASET_INDEX_NAME).read_text())
+    assert index["num_scenes"] == 2 and index["total_images"] == 10
+    assert index["failed"] == ["060625-Broken"]
+    tree = index["scenes"][1]
+    assert tree["scene_id"] == "050625-Tree" and tree["orientation"] == "portrait"
+    assert (tree["clean_count"], tree["clutter_count"]) == (3, 3)
+    assert tree["meta"] == os.path.join("050625-Tree", "meta.json")
+
+    built.clear()
+    os.remove(tmp_path / "060625-Broken" / "060625-Broken-Clean" / "images" / "odd.jpg")
+    build_dataset(tmp_path, workers=3)
+    assert built == ["060625-Broken"]
+    assert json.loads((tmp_path / DATASET_INDEX_NAME).read_text())["num_scenes"] == 3
+
+def test_existing_manifests_keep_curated_fields(tmp_path, monkeypatch):
+    built = count_builds(monkeypatch)
+    scene = make_scene(tmp_path, "040625-Bin")
+    out = scene / "meta.json"
+    manifest, _ = write_scene_manifest(scene, out)
+    (scene / ".stage_cache.json").unlink()  # a meta.json from before the stage cache
+    manifest.update(device="Galaxy A15", region="Denmark", environment="indoor", environment_fine="kitchen")
+    manifest["clean"]["theme"] = ["bin"]
+    manifest["clutter"]["distractors"] = ["dog"]
+    out.write_text(json.dumps(manifest))
+
+    build_dataset(tmp_path, workers=1)
+    assert built == ["040625-Bin"]
+    assert json.loads(out.read_text()) == manifest  # source_state matches: not rebuilt
+
+    legacy = dict(manifest)
+    del legacy["source_state"]
+    out.write_text(json.dumps(legacy))
+    (scene / ".stage_cache.json").unlink()
+    build_dataset(tmp_path, workers=1)
+    assert built == ["040625-Bin"] * 2
+    rebuilt = json.loads(out.read_text())
+    assert (rebuilt["device"], rebuilt["region"]) == ("Galaxy A15", "Denmark")
+    assert (rebuilt["environment"], rebuilt["environment_fine"]) == ("indoor", "kitchen")
+    assert rebuilt["clean"]["theme"] == ["bin"] and rebuilt["clutter"]["distractors"] == ["dog"]
+    assert rebuilt["source_state"] == folder_state(scene)
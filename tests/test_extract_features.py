@@ -0,0 +1,151 @@
+import os
+import sys
+import sqlite3
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from colmap_db import extracted_names, merge_features, table_names
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cameras (camera_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, model INTEGER NOT NULL,
+    width INTEGER NOT NULL, height INTEGER NOT NULL, params BLOB, prior_focal_length INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS images (image_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, name TEXT NOT NULL UNIQUE,
+    camera_id INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS keypoints (image_id INTEGER PRIMARY KEY NOT NULL, rows INTEGER NOT NULL, cols INTEGER NOT NULL, data BLOB);
+CREATE TABLE IF NOT EXISTS descriptors (image_id INTEGER PRIMARY KEY NOT NULL, rows INTEGER NOT NULL, cols INTEGER NOT NULL, data BLOB);
+CREATE TABLE IF NOT EXISTS matches (pair_id INTEGER PRIMARY KEY NOT NULL, rows INTEGER NOT NULL, cols INTEGER NOT NULL, data BLOB);
+"""
+NEW_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rigs (rig_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL);
+CREATE TABLE IF NOT EXISTS frames (frame_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, rig_id INTEGER NOT NULL);
+"""
+
+# feature_extractor stand-in: registers the listed images in the classic schema (plus rigs/frames with
+# NEW_SCHEMA=1), stores the image name as its descriptor and exits 1 after GPU_K / CPU_K images
+STUB = f'''#!{sys.executable}
+import os, sys, sqlite3
+a = sys.argv[2:]
+opt = dict(zip(a[0::2], a[1::2]))
+with open(os.environ["CALLS"], "a") as f:
+    f.write(" ".join(sys.argv[1:]) + "\\n")
+db = sqlite3.connect(opt["--database_path"])
+db.executescript({SCHEMA!r} + ({NEW_SCHEMA!r} if os.environ.get("NEW_SCHEMA") == "1" else ""))
+gpu = opt["--SiftExtraction.use_gpu"] == "1"
+limit = int(os.environ.get("GPU_K" if gpu else "CPU_K", "1000000"))
+cam = db.execute("SELECT MIN(camera_id) FROM cameras").fetchone()[0]
+if cam is None:
+    cam = db.execute("INSERT INTO cameras (model, width, height, params, prior_focal_length) VALUES (4, 64, 48, ?, 0)", (b"p",)).lastrowid
+for k, name in enumerate(open(opt["--image_list_path"]).read().split()):
+    row = db.execute("SELECT image_id FROM images WHERE name = ?", (name,)).fetchone()
+    image_id = row[0] if row else db.execute("INSERT INTO images (name, camera_id) VALUES (?, ?)", (name, cam)).lastrowid
+    if k >= limit:  # crash after registering the image, before its features
+        db.commit()
+        sys.exit(1)
+    db.execute("INSERT OR REPLACE INTO keypoints VALUES (?, 1, 6, ?)", (image_id, b"k"))
+    db.execute("INSERT OR REPLACE INTO descriptors VALUES (?, 1, 128, ?)", (image_id, name.encode()))
+    db.commit()
+'''
+
+def make_db(path, images, cameras=1, extracted=None):
+    """Fixture database: `cameras` cameras, `images` registered on the first, features for `extracted` (default all)."""
+    with sqlite3.connect(path) as db:
+        db.executescript(SCHEMA)
+        for c in range(cameras):
+            db.execute("INSERT INTO cameras (model, width, height, params, prior_focal_length) VALUES (4, ?, 48, ?, 0)", (64 + c, b"p"))
+        for name in images:
+            image_id = db.execute("INSERT INTO images (name, camera_id) VALUES (?, 1)", (name,)).lastrowid
+            if extracted is None or name in extracted:
+                db.execute("INSERT INTO keypoints VALUES (?, 1, 6, ?)", (image_id, b"k"))
+                db.execute("INSERT INTO descriptors VALUES (?, 1, 128, ?)", (image_id, name.encode()))
+    return path
+
+def descriptors(path):
+    with sqlite3.connect(path) as db:
+        return dict(db.execute("SELECT i.name, d.data FROM images i JOIN descriptors d ON d.image_id = i.image_id"))
+
+def test_merge_features(tmp_path):
+    main = make_db(tmp_path / "main.db", ["a.jpg", "b.jpg", "c.jpg"], extracted={"a.jpg", "b.jpg"})
+    shard = make_db(tmp_path / "shard.db", ["z.jpg", "c.jpg", "d.jpg", "a.jpg"], cameras=2, extracted={"c.jpg", "d.jpg", "a.jpg"})
+    with sqlite3.connect(shard) as db:
+        db.execute("UPDATE descriptors SET data = ? WHERE image_id = 4", (b"shard copy",))
+
+    assert merge_features(main, shard) == 2  # c (partial in main) and d; a is complete already, z has no features
+    assert extracted_names(main) == {"a.jpg", "b.jpg", "c.jpg", "d.jpg"}
+    assert descriptors(main) == {n: n.encode() for n in ("a.jpg", "b.jpg", "c.jpg", "d.jpg")}
+    with sqlite3.connect(main) as db:
+        assert db.execute("SELECT COUNT(*) FROM cameras").fetchone()[0] == 1
+        assert db.execute("SELECT COUNT(*) FROM images WHERE name = 'c.jpg'").fetchone()[0] == 1
+        assert {r[0] for r in db.execute("SELECT camera_id FROM images")} == {1}
+
+def test_merge_features_keeps_cameras(tmp_path):
+    main = make_db(tmp_path / "main.db", ["a.jpg"])
+    shard = make_db(tmp_path / "shard.db", ["d.jpg"])
+    assert merge_features(main, shard, single_camera=False) == 1
+    with sqlite3.connect(main) as db:
+        assert db.execute("SELECT COUNT(*) FROM cameras").fetchone()[0] == 2
+        assert db.execute("SELECT camera_id FROM images WHERE name = 'd.jpg'").fetchone()[0] == 2
+
+@pytest.fixture
+def scene(tmp_path):
+    (tmp_path / "scene" / "images").mkdir(parents=True)
+    for i in range(23):
+        (tmp_path / "scene" / "images" / f"Clean_{i:02d}.jpg").touch()
+    stub = tmp_path / "colmap"
+    stub.write_text(STUB)
+    stub.chmod(0o755)
+    return tmp_path / "scene"
+
+def extract(scene, *args, **env):
+    env = {**os.environ, "CALLS": str(scene.parent / "calls.log"), "TELEMETRY_LOG": str(scene.parent / "telemetry.jsonl"), **env}
+    (scene.parent / "calls.log").unlink(missing_ok=True)
+    proc = subprocess.run([sys.executable, str(ROOT / "extract_features.py"), str(scene), "--colmap", str(scene.parent / "colmap"),
+                           "--shards", "3", "--threads_per_shard", "2", *args], env=env, capture_output=True, text=True)
+    calls = scene.parent / "calls.log"
+    return proc.returncode, calls.read_text().splitlines() if calls.exists() else []
+
+def test_resume_after_failures(scene):
+    rc, calls = extract(scene, GPU_K="5", CPU_K="3")
+    assert rc == 1
+    assert len(calls) == 4 and "--SiftExtraction.num_threads 2" in calls[1]
+    assert len(extracted_names(scene / "database.db")) == 14  # 5 on the GPU, 3 from each shard
+    assert len((scene / "missing_features.txt").read_text().split()) == 9
+
+    rc, calls = extract(scene, "--use_gpu", "0")
+    assert rc == 0
+    assert len(calls) == 3  # CPU shards only
+    assert descriptors(scene / "database.db") == {f"Clean_{i:02d}.jpg": f"Clean_{i:02d}.jpg".encode() for i in range(23)}
+    assert not (scene / "missing_features.txt").exists()
+
+    rc, calls = extract(scene)
+    assert rc == 0 and calls == []  # nothing left to extract
+
+def test_unmergeable_shards_fall_back_to_one_process(scene):
+    rc, calls = extract(scene, "--use_gpu", "0", NEW_SCHEMA="1")
+    assert rc == 0
+    assert "rigs" in table_names(scene / "database.db")
+    assert len(calls) == 4 and "--SiftExtraction.num_threads 6" in calls[-1]  # 3 shards, then one process for all but shard 0
+    assert len(extracted_names(scene / "database.db")) == 23
+
+@pytest.mark.parametrize("allow", ["0", "1"])
+def test_colmap_script_stops_when_features_are_missing(tmp_path, allow):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "local_colmap_and_resize.sh").write_text((ROOT / "local_colmap_and_resize.sh").read_text())
+    (bin_dir / "extract_features.py").write_text("raise SystemExit(3)\n")
+    for name in ("plan_matching.py", "telemetry.py"):  # the later steps just record that they ran
+        (bin_dir / name).write_text(f"open({str(tmp_path / 'ran')!r}, 'a').write({name!r} + '\\n')\n")
+    (tmp_path / "scene" / "images").mkdir(parents=True)
+    env = dict(os.environ, ALLOW_PARTIAL_FEATURES=allow)
+    proc = subprocess.run(["bash", str(bin_dir / "local_colmap_and_resize.sh"), str(tmp_path / "scene")],
+                          env=env, capture_output=True, text=True)
+    if allow == "1":
+        assert "continuing with the extracted images" in proc.stdout
+        assert (tmp_path / "ran").read_text().startswith("plan_matching.py\ntelemetry.py\n")
+    else:
+        assert proc.returncode == 3
+        assert "ALLOW_PARTIAL_FEATURES=1" in proc.stderr
+        assert not (tmp_path / "ran").exists()
@@ -0,0 +1,79 @@
+import pytest
+from PIL import Image
+
+from create_meta_data import build_scene
+from image_probe import display_size, probe_image, probe_images
+
+def save(path, size, orientation=None, **kw):
+    im = Image.new("RGB", size, (120, 30, 200))
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        kw["exif"] = exif
+    im.save(path, **kw)
+    return path
+
+@pytest.mark.parametrize("byte_order", ["little", "big"])
+def test_jpeg_size_and_orientation(tmp_path, byte_order):
+    p = save(tmp_path / "a.jpg", (40, 24), orientation=6)
+    if byte_order == "big":
+        # rewrite the EXIF block Motorola-ordered
+        with Image.open(p) as im:
+            exif = im.getexif()
+        exif.endian = ">"
+        p = save(tmp_path / "b.jpg", (40, 24), exif=exif)
+    info = probe_image(p)
+    assert info == {"w": 40, "h": 24, "orientation": 6, "format": "jpeg"}
+    assert display_size(info) == (24, 40)
+
+def test_progressive_jpeg_and_no_exif(tmp_path):
+    info = probe_image(save(tmp_path / "p.jpg", (33, 17), progressive=True))
+    assert (info["w"], info["h"], info["orientation"]) == (33, 17, 1)
+
+def test_png_and_pil_fallback(tmp_path):
+    assert probe_image(save(tmp_path / "a.png", (7, 5))) == {"w": 7, "h": 5, "orientation": 1, "format": "png"}
+    assert probe_image(save(tmp_path / "a.bmp", (9, 3)))["format"] == "bmp"
+
+def test_probe_images_keeps_order_and_reports_errors(tmp_path):
+    good = save(tmp_path / "a.jpg", (10, 20))
+    bad = tmp_path / "b.jpg"
+    bad.write_bytes(b"\xff\xd8\xff\xda\x00\x02")
+    infos = probe_images([good, bad, good], workers=2)
+    assert infos[0] == infos[2] and infos[0]["w"] == 10
+    assert "error" in infos[1]
+
+def make_scene(root, sizes, orientation=None):
+    for folder, size in sizes.items():
+        d = root / folder / "images"
+        d.mkdir(parents=True)
+        for i in range(3):
+            save(d / f"{i}.jpg", size, orientation=orientation)
+
+def test_build_scene_records_image_meta(tmp_path):
+    root = tmp_path / "040625-Bin"
+    make_scene(root, {"040625-Bin-Clean": (64, 48), "040625-Bin-Clutter": (64, 48)})
+    scene = build_scene(root, root)
+    assert scene["resolution"] == scene["display_resolution"] == "64x48" and scene["orientation"] == "landscape"
+    assert scene["total_images"] == 6
+    assert scene["clean"]["image_meta"] == [{"w": 64, "h": 48, "orientation": 1}] * 3
+    assert list(scene["clean"])[-2:] == ["image_meta", "images"]  # images stay the last key
+
+def test_rotated_jpegs_keep_the_stored_resolution(tmp_path):
+    root = tmp_path / "040625-Bin"
+    make_scene(root, {"040625-Bin-Clean": (64, 48)}, orientation=6)
+    scene = build_scene(root, root)
+    assert (scene["resolution"], scene["display_resolution"], scene["orientation"]) == ("64x48", "48x64", "portrait")
+    assert scene["clean"]["image_meta"][0] == {"w": 64, "h": 48, "orientation": 6}
+
+def test_build_scene_rejects_mixed_resolutions(tmp_path):
+    root = tmp_path / "040625-Bin"
+    make_scene(root, {"040625-Bin-Clean": (64, 48), "040625-Bin-Clutter": (32, 48)})
+    with pytest.raises(ValueError, match="Resolution mismatch"):
+        build_scene(root, root)
+
+def test_build_scene_rejects_mixed_orientations(tmp_path):
+    root = tmp_path / "040625-Bin"
+    make_scene(root, {"040625-Bin-Clean": (64, 48)})
+    save(root / "040625-Bin-Clean" / "images" / "3.jpg", (64, 48), orientation=6)
+    with pytest.raises(ValueError, match=r"Orientation mismatch.*48x64 \(EXIF orientation 6\)"):
+        build_scene(root, root)
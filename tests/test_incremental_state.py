@@ -0,0 +1,112 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+import colmap2nerf
+from colmap2nerf import STATE_VERSION, cross_pair_sums, load_state, normalize_scene, pair_sums, save_state
+
+def cameras(n, seed):
+    rng = np.random.default_rng(seed)
+    mats = np.tile(np.eye(4), (n, 1, 1))
+    for k in range(n):
+        q, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+        mats[k, 0:3, 0:3] = q
+        mats[k, 0:3, 3] = rng.normal(0, 2, 3)
+    return mats
+
+@pytest.mark.parametrize("mode,k", [("upper", 1), ("full", 2)])
+def test_pair_sums_extend(mode, k):
+    old, new = cameras(9, 0), cameras(5, 1)
+    p_all, w_all = pair_sums(np.concatenate([old, new]), mode)
+    p_old, w_old = pair_sums(old, mode)
+    p_new, w_new = pair_sums(new, mode)
+    p_x, w_x = cross_pair_sums(new, old, mem_mb=0.001)
+    assert np.allclose(p_old + k * p_x + p_new, p_all, rtol=1e-12, atol=1e-12)
+    assert w_old + k * w_x + w_new == pytest.approx(w_all, rel=1e-12)
+
+PARAMS = {"skip_early": "0", "center_mode": "upper"}
+
+def write(path):
+    save_state(str(path), PARAMS, ["a.jpg", "b.jpg"], cameras(2, 3), [1.0, 2.0], np.ones(3), "upper", np.arange(3.0), 4.0,
+               cameras(1, 4)[0, 0:3, 0:3])
+
+def test_state_round_trip(tmp_path):
+    path = tmp_path / "state.npz"
+    write(path)
+    state = load_state(str(path), PARAMS)
+    assert state["names"].tolist() == ["a.jpg", "b.jpg"]
+    assert np.array_equal(state["c2w_raw"], cameras(2, 3))
+    assert state["sharpness"].tolist() == [1.0, 2.0]
+    assert str(state["pair_mode"]) == "upper" and float(state["pair_w"]) == 4.0
+    assert np.array_equal(state["pair_R"], cameras(1, 4)[0, 0:3, 0:3])
+    assert not (tmp_path / "state.npz.tmp.npz").exists()
+
+def test_state_is_rejected_on_other_params_or_version(tmp_path, monkeypatch):
+    path = tmp_path / "state.npz"
+    write(path)
+    assert load_state(str(path), dict(PARAMS, skip_early="2")) is None
+    monkeypatch.setattr(colmap2nerf, "STATE_VERSION", STATE_VERSION + 1)
+    assert load_state(str(path), PARAMS) is None
+
+def test_missing_or_broken_state(tmp_path):
+    assert load_state(str(tmp_path / "none.npz"), PARAMS) is None
+    (tmp_path / "bad.npz").write_bytes(b"not an npz")
+    assert load_state(str(tmp_path / "bad.npz"), PARAMS) is None
+    np.savez(tmp_path / "old.npz", params=json.dumps(PARAMS))  # written before the version key
+    assert load_state(str(tmp_path / "old.npz"), PARAMS) is None
+
+# ---------- end to end ----------
+def write_scene(root, n, seed=0):
+    """n random JPEGs plus a text COLMAP model registering all of them."""
+    rng = np.random.default_rng(seed)
+    images, model = root / "images", root / "model"
+    images.mkdir(exist_ok=True)
+    model.mkdir(exist_ok=True)
+    (model / "cameras.txt").write_text("1 OPENCV 64 48 50.0 50.0 32.0 24.0 0.01 0.0 0.0 0.0\n")
+    lines = []
+    for i in range(n):
+        name = f"{'clutter' if i % 2 else 'extra'}_{i:03d}.jpg"
+        if not (images / name).exists():
+            cv2.imwrite(str(images / name), rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+        q = np.random.default_rng(100 + i).normal(size=4)
+        q /= np.linalg.norm(q)
+        t = np.random.default_rng(200 + i).normal(0, 2, 3)
+        lines.append(f"{i + 1} " + " ".join(repr(float(x)) for x in [*q, *t]) + f" 1 {name}\n\n")
+    (model / "images.txt").write_text("".join(lines))
+
+def run(root, out, *extra):
+    proc = subprocess.run([sys.executable, str(Path(colmap2nerf.__file__)), "--images", str(root / "images"), "--text", str(root / "model"),
+                           "--out", str(out), "--sharpness_workers", "2", *extra],
+                          check=True, capture_output=True, text=True, cwd=root)
+    return json.loads(out.read_text()), proc.stdout
+
+@pytest.mark.parametrize("mode", ["upper", "full"])
+def test_incremental_run_matches_full_run(tmp_path, mode):
+    (tmp_path / "inc").mkdir()
+    (tmp_path / "full").mkdir()
+    write_scene(tmp_path, 9)
+    run(tmp_path, tmp_path / "inc" / "transforms.json", "--center_mode", mode, "--incremental")
+    write_scene(tmp_path, 14)
+    inc, log = run(tmp_path, tmp_path / "inc" / "transforms.json", "--center_mode", mode, "--incremental")
+    assert "[incremental] 9 frames reused, 5 new" in log
+    full, _ = run(tmp_path, tmp_path / "full" / "transforms.json", "--center_mode", mode)
+    assert [f["file_path"] for f in inc["frames"]] == [f["file_path"] for f in full["frames"]]
+    assert [f["sharpness"] for f in inc["frames"]] == [f["sharpness"] for f in full["frames"]]
+    # the stored sums are moved into the new rotated frame, which costs a few ulps of the pair sums
+    assert np.allclose([f["transform_matrix"] for f in inc["frames"]], [f["transform_matrix"] for f in full["frames"]], rtol=0, atol=1e-10)
+
+def test_bent_rotation_recomputes_every_pair(capsys):
+    mats = cameras(12, 5)
+    is_new = np.arange(12) >= 8
+    _, sums = normalize_scene(mats[~is_new], verbose=False)
+    prev = {k: np.asarray(v) for k, v in sums.items()}
+    prev["pair_R"] = prev["pair_R"] * (1 + 1e-6)  # what rotmat's 1e-10 guard does near +-z
+    inc, _ = normalize_scene(mats, prev=prev, is_new=is_new)
+    assert "recomputing all pairs" in capsys.readouterr().out
+    full, _ = normalize_scene(mats, verbose=False)
+    assert np.allclose(inc, full, rtol=0, atol=1e-12)
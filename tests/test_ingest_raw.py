@@ -0,0 +1,128 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from PIL import Image
+
+from image_probe import probe_image
+from ingest_raw import heic_to_jpg, ingest_file, is_logged, rename_ext, scan_raw
+
+NO_TOOLS = {"jhead": False, "heif-convert": False, "magick": False, "convert": False, "pillow_heif": False}
+
+def save(path, size=(40, 24), orientation=None):
+    kw = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        kw["exif"] = exif
+    Image.new("RGB", size, (10, 200, 30)).save(path, "JPEG", **kw)
+    return path
+
+def test_rename_ext(tmp_path):
+    assert rename_ext(save(tmp_path / "a.jpg")) == tmp_path / "a.JPG"
+    assert os.listdir(tmp_path) == ["a.JPG"]
+    assert rename_ext(tmp_path / "a.JPG") == tmp_path / "a.JPG"
+    save(tmp_path / "b.jpeg")
+    save(tmp_path / "b.JPG")
+    with pytest.raises(FileExistsError):
+        rename_ext(tmp_path / "b.jpeg")
+
+def test_rename_ext_finishes_an_interrupted_rename(tmp_path):
+    save(tmp_path / "a.jpeg")
+    os.link(tmp_path / "a.jpeg", tmp_path / "a.JPG")  # killed between link and unlink
+    assert rename_ext(tmp_path / "a.jpeg") == tmp_path / "a.JPG"
+    assert os.listdir(tmp_path) == ["a.JPG"]
+
+def test_same_stem_sources_never_overwrite_each_other(tmp_path):
+    srcs = [str(save(tmp_path / "a.png", size=(40, 24))), str(save(tmp_path / "a.jpg", size=(30, 20)))]
+    with ProcessPoolExecutor(max_workers=2) as ex:
+        recs = list(ex.map(ingest_file, srcs, [NO_TOOLS] * 2))
+    ok = [r for r in recs if "error" not in r]
+    failed = [r for r in recs if "error" in r]
+    assert len(ok) == 1 and len(failed) == 1
+    assert failed[0]["error"].startswith("FileExistsError")
+    assert sorted(os.listdir(tmp_path)) == sorted(["a.JPG", os.path.basename(failed[0]["src"])])
+    info = probe_image(tmp_path / "a.JPG")
+    assert (info["w"], info["h"]) == (ok[0]["w"], ok[0]["h"])
+
+def test_ingest_renames_and_rotates(tmp_path):
+    src = save(tmp_path / "r.jpeg", orientation=6)
+    rec = ingest_file(str(src), NO_TOOLS)
+    assert "error" not in rec, rec
+    assert rec["path"] == str(tmp_path / "r.JPG")
+    assert rec["actions"] == ["rename .jpeg->.JPG", "autorot 6 reencoded(q=95)"]
+    assert (rec["w"], rec["h"]) == (24, 40)
+    info = probe_image(tmp_path / "r.JPG")
+    assert (info["w"], info["h"], info["orientation"]) == (24, 40, 1)
+    assert sorted(os.listdir(tmp_path)) == ["r.JPG"]
+
+def test_ingest_reports_failures(tmp_path):
+    heic = tmp_path / "x.HEIC"
+    heic.write_bytes(b"\x00" * 16)
+    rec = ingest_file(str(heic), NO_TOOLS)
+    assert "no HEIC decoder" in rec["error"]
+    assert heic.exists()
+
+def test_scan_and_log(tmp_path):
+    (tmp_path / "a" / ".hidden").mkdir(parents=True)
+    save(tmp_path / "a" / "1.JPG")
+    (tmp_path / "a" / "2.heic").write_bytes(b"")
+    (tmp_path / "a" / ".hidden" / "3.jpg").write_bytes(b"")
+    (tmp_path / "a" / "notes.txt").write_text("x")
+    files = scan_raw(tmp_path)
+    assert [os.path.relpath(f, tmp_path) for f in files] == [os.path.join("a", "1.JPG"), os.path.join("a", "2.heic")]
+
+    st = os.stat(files[0])
+    log = {os.path.join("a", "1.JPG"): {"size": st.st_size, "mtime_ns": st.st_mtime_ns}}
+    assert is_logged(files[0], tmp_path, log)
+    assert not is_logged(files[1], tmp_path, log)
+    os.utime(files[0], ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert not is_logged(files[0], tmp_path, log)
+
+def fake_converter(tmp_path, monkeypatch, fail=False):
+    """An ImageMagick stand-in on PATH: `magick SRC DST` writes a small JPEG to DST (or fails)."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    stub = bin_dir / "magick"
+    body = "sys.exit(1)" if fail else "Image.new('RGB', (8, 6)).save(sys.argv[2], 'JPEG')"
+    stub.write_text(f"#!{sys.executable}\nimport sys\nfrom PIL import Image\n{body}\n")
+    stub.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return dict(NO_TOOLS, magick=True)
+
+def test_heic_conversion_keeps_the_mtime(tmp_path, monkeypatch):
+    tools = fake_converter(tmp_path, monkeypatch)
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    heic = raw / "x.HEIC"
+    heic.write_bytes(b"heic")
+    os.utime(heic, ns=(1, 1_600_000_000_000_000_000))
+    assert heic_to_jpg(heic, tools) == raw / "x.JPG"
+    assert os.listdir(raw) == ["x.JPG"]
+    assert os.stat(raw / "x.JPG").st_mtime_ns == 1_600_000_000_000_000_000
+
+def test_interrupted_heic_conversion_is_resumed(tmp_path):
+    heic = tmp_path / "x.HEIC"
+    heic.write_bytes(b"heic")
+    jpg = save(tmp_path / "x.JPG")
+    st = os.stat(heic)
+    os.utime(jpg, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert heic_to_jpg(heic, NO_TOOLS) == jpg  # no decoder needed: the earlier output is reused
+    assert os.listdir(tmp_path) == ["x.JPG"]
+
+    heic.write_bytes(b"heic")
+    os.utime(jpg, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    with pytest.raises(FileExistsError):
+        heic_to_jpg(heic, NO_TOOLS)
+
+def test_failed_conversion_leaves_no_temporaries(tmp_path, monkeypatch):
+    tools = fake_converter(tmp_path, monkeypatch, fail=True)
+    heic = tmp_path / "raw" / "x.heic"
+    heic.parent.mkdir()
+    heic.write_bytes(b"heic")
+    rec = ingest_file(str(heic), tools)
+    assert "CalledProcessError" in rec["error"]
+    assert os.listdir(heic.parent) == ["x.heic"]
+    (heic.parent / ".x.JPG.abc.tmp.JPG").write_bytes(b"")  # a temp left by a killed run
+    assert scan_raw(heic.parent) == [str(heic)]
@@ -0,0 +1,87 @@
+import os
+
+import make_all
+from make_all import link_folder, plan_links, scan_images, scan_names, unique_name
+
+def test_unique_name():
+    assert unique_name("a.jpg", set()) == "a.jpg"
+    assert unique_name("a.jpg", {"a.jpg", "a_dup1.jpg"}) == "a_dup2.jpg"
+
+def test_default_mode_renames_collisions():
+    images = [("/s/a.jpg", "a.jpg", 1), ("/s/sub/a.jpg", "a.jpg", 2), ("/s/b.jpg", "b.jpg", 3)]
+    existing = {"x_b.jpg": 99}
+    todo, stale, renamed, uptodate, planned = plan_links(images, "x_", existing, sync=False)
+    assert todo == [("/s/a.jpg", "x_a.jpg"), ("/s/sub/a.jpg", "x_a_dup1.jpg"), ("/s/b.jpg", "x_b_dup1.jpg")]
+    assert (stale, renamed, uptodate) == ([], 2, 0)
+    assert planned == {"x_a.jpg", "x_a_dup1.jpg", "x_b_dup1.jpg"}
+    assert existing == {"x_b.jpg": 99, "x_a.jpg": 1, "x_a_dup1.jpg": 2, "x_b_dup1.jpg": 3}
+
+def test_sync_mode_keeps_links_and_reports_stale():
+    images = [("/s/a.jpg", "a.jpg", 1), ("/s/b.jpg", "b.jpg", 2), ("/s/c.jpg", "c.jpg", 3)]
+    existing = {"x_a.jpg": 1, "x_b.jpg": 42}
+    todo, stale, renamed, uptodate, planned = plan_links(images, "x_", existing, sync=True)
+    assert todo == [("/s/c.jpg", "x_c.jpg")]
+    assert (stale, renamed, uptodate) == (["x_b.jpg"], 0, 1)
+    assert planned == {"x_a.jpg", "x_b.jpg", "x_c.jpg"}
+
+def test_sync_mode_renames_collisions_within_the_run():
+    images = [("/s/a.jpg", "a.jpg", 1), ("/s/sub/a.jpg", "a.jpg", 2), ("/s/sub2/a.jpg", "a.jpg", 3)]
+    existing = {}
+    todo, stale, renamed, uptodate, _ = plan_links(images, "x_", existing, sync=True)
+    assert todo == [("/s/a.jpg", "x_a.jpg"), ("/s/sub/a.jpg", "x_a_dup1.jpg"), ("/s/sub2/a.jpg", "x_a_dup2.jpg")]
+    assert (stale, renamed, uptodate) == ([], 2, 0)
+    # the next run finds the same names and links, and reports a _dupN entry of another file as stale
+    existing = {"x_a.jpg": 1, "x_a_dup1.jpg": 2, "x_a_dup2.jpg": 99}
+    todo, stale, renamed, uptodate, _ = plan_links(images, "x_", existing, sync=True)
+    assert (todo, stale, renamed, uptodate) == ([], ["x_a_dup2.jpg"], 2, 2)
+
+def test_link_folder_is_idempotent_in_sync_mode(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(make_all, "RECURSIVE", True)
+    src, dst = tmp_path / "src", tmp_path / "All"
+    (src / "sub").mkdir(parents=True)
+    dst.mkdir()
+    (src / "a.jpg").write_bytes(b"a")
+    (src / "sub" / "b.PNG").write_bytes(b"b")
+    (src / "sub" / "a.jpg").write_bytes(b"a2")
+    (src / "notes.txt").write_text("skip")
+    assert [n for _, n, _ in scan_images(src)] == ["a.jpg", "a.jpg", "b.PNG"]
+
+    expected = link_folder(src, "Clean", "extra_", dst, scan_names(dst), sync=True, workers=2)
+    assert expected == {"extra_a.jpg", "extra_a_dup1.jpg", "extra_b.PNG"}
+    assert sorted(os.listdir(dst)) == ["extra_a.jpg", "extra_a_dup1.jpg", "extra_b.PNG"]
+    assert os.path.samefile(dst / "extra_a.jpg", src / "a.jpg")
+    assert os.path.samefile(dst / "extra_a_dup1.jpg", src / "sub" / "a.jpg")
+
+    assert link_folder(src, "Clean", "extra_", dst, scan_names(dst), sync=True, workers=2) == expected
+    assert sorted(os.listdir(dst)) == ["extra_a.jpg", "extra_a_dup1.jpg", "extra_b.PNG"]
+    assert "stale: 0" in capsys.readouterr().out.splitlines()[-1]
+    link_folder(src, "Clean", "extra_", dst, scan_names(dst), sync=False, workers=2)
+    assert len(os.listdir(dst)) == 6
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr("sys.argv", ["make_all.py", *map(str, argv)])
+    make_all.main()
+
+def test_main_relinks_deleted_links_and_sync_skips_the_cache(tmp_path, monkeypatch, capsys):
+    base = tmp_path / "S"
+    for part, name in (("Clean", "a.jpg"), ("Clutter", "b.jpg")):
+        (base / f"S-{part}" / "images").mkdir(parents=True)
+        (base / f"S-{part}" / "images" / name).write_bytes(name.encode())
+    out = base / "S-All" / "images"
+    run_main(monkeypatch, base)
+    assert sorted(os.listdir(out)) == ["clutter_b.jpg", "extra_a.jpg"]
+    run_main(monkeypatch, base)
+    assert "up to date" in capsys.readouterr().out
+
+    (out / "extra_a.jpg").unlink()
+    run_main(monkeypatch, base, "--explain")
+    assert "links changed" in capsys.readouterr().out
+    assert sorted(os.listdir(out)) == ["clutter_b.jpg", "extra_a.jpg"]
+
+    (out / "extra_old.jpg").write_bytes(b"x")
+    run_main(monkeypatch, base)
+    capsys.readouterr()
+    run_main(monkeypatch, base, "--sync")
+    printed = capsys.readouterr().out
+    assert "[cache]" not in printed
+    assert "[STALE]" in printed and "extra_old.jpg" in printed
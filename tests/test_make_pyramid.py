@@ -0,0 +1,70 @@
+import json
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from make_pyramid import INDEX_NAME, build_levels, is_source_name, make_pyramid, scan_mtimes, target_size
+
+def write_image(path, w, h, seed=0):
+    img = np.random.default_rng(seed).integers(0, 255, (h, w, 3), dtype=np.uint8)
+    assert cv2.imwrite(str(path), img)
+    return img
+
+def test_target_size_rounds_like_mogrify():
+    assert target_size(101, 67, 2) == (50, 34)
+    assert target_size(101, 67, 8) == (13, 8)
+    assert target_size(3, 3, 8) == (1, 1)
+
+@pytest.mark.parametrize("ext", [".jpg", ".png"])
+def test_build_levels(tmp_path, ext):
+    src = tmp_path / f"a{ext}"
+    img = write_image(src, 101, 67)
+    dsts = [str(tmp_path / f"a_{f}{ext}") for f in (2, 4, 8)]
+    sizes = build_levels(str(src), dsts, [2, 4, 8])
+    assert sizes == [target_size(101, 67, f) for f in (2, 4, 8)]
+    for dst, (w, h) in zip(dsts, sizes):
+        out = cv2.imread(dst)
+        assert out.shape == (h, w, 3)
+    assert sorted(os.listdir(tmp_path)) == sorted([f"a{ext}"] + [os.path.basename(d) for d in dsts])
+    if ext == ".png":
+        # lossless source: the first level is a plain INTER_AREA resize
+        assert np.array_equal(cv2.imread(dsts[0]), cv2.resize(img, sizes[0], interpolation=cv2.INTER_AREA))
+
+def test_make_pyramid_skips_up_to_date_images(tmp_path):
+    src = tmp_path / "undistortion_images"
+    src.mkdir()
+    for i in range(3):
+        write_image(src / f"{i}.jpg", 64, 48, seed=i)
+
+    index = make_pyramid(tmp_path, workers=2)
+    assert index["source_count"] == 3 and index["failed"] == []
+    assert index["levels"]["images_4"] == {"factor": 4, "count": 3, "resolution": "16x12"}
+    assert json.loads((tmp_path / INDEX_NAME).read_text())["levels"] == index["levels"]
+
+    stamp = {f: os.stat(tmp_path / "images_2" / f).st_mtime_ns for f in os.listdir(tmp_path / "images_2")}
+    st = os.stat(src / "1.jpg")
+    os.utime(src / "1.jpg", ns=(st.st_atime_ns, st.st_mtime_ns + 10**10))
+    index = make_pyramid(tmp_path, workers=2)
+    changed = {f for f in stamp if os.stat(tmp_path / "images_2" / f).st_mtime_ns != stamp[f]}
+    assert changed == {"1.jpg"}
+    # nothing rebuilt: the resolution comes from the previous index
+    index = make_pyramid(tmp_path, workers=2)
+    assert index["levels"]["images_8"]["resolution"] == "8x6"
+
+def test_make_pyramid_records_failures(tmp_path):
+    src = tmp_path / "undistortion_images"
+    src.mkdir()
+    write_image(src / "good.png", 16, 16)
+    (src / "bad.png").write_bytes(b"not a png")
+    index = make_pyramid(tmp_path, factors=(2,), workers=1)
+    assert index["failed"] == [str(src / "bad.png")]
+    assert index["levels"]["images_2"]["count"] == 1
+
+def test_scan_skips_temporaries_and_masks(tmp_path):
+    for name in ("a.JPG", "b.png", ".a.JPG.x1.tmp.JPG", "dynamic_mask_a.png", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    assert sorted(scan_mtimes(tmp_path)) == ["a.JPG", "b.png"]
+    assert not is_source_name("dynamic_mask_b.png") and is_source_name("mask_b.png")
+    assert scan_mtimes(tmp_path / "missing") == {}
@@ -0,0 +1,82 @@
+import os
+import json
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+import colmap2nerf
+from colmap2nerf import MASK_INDEX_NAME, mask_frames, mask_path
+
+CATEGORIES = {"person": 0, "car": 2, "dog": 16}
+
+class StubPredictor:
+    """Stands in for MaskPredictor: a person on the left half and a car on the bottom rows of every image."""
+
+    def __init__(self):
+        self.batches = []
+
+    def prepare(self, img):
+        return img.shape[:2]
+
+    def __call__(self, inputs):
+        self.batches.append(len(inputs))
+        out = []
+        for h, w in inputs:
+            masks = np.zeros((2, h, w), dtype=bool)
+            masks[0, :, : w // 2] = True
+            masks[1, h - 2:, :] = True
+            out.append((np.array([0, 2]), masks))
+        return out
+
+def stub_categories(tmp_path, monkeypatch):
+    scripts = tmp_path / "scripts"
+    scripts.mkdir()
+    (scripts / "category2id.json").write_text(json.dumps(CATEGORIES))
+    monkeypatch.setattr(colmap2nerf, "scripts_folder", lambda: str(scripts))
+
+@pytest.fixture
+def images(tmp_path, monkeypatch):
+    stub_categories(tmp_path, monkeypatch)
+    folder = tmp_path / "images"
+    folder.mkdir()
+    paths = []
+    for i in range(11):
+        p = folder / f"clutter_{i:02d}.JPG"
+        cv2.imwrite(str(p), np.full((12, 16, 3), 20 * i, np.uint8))
+        paths.append(str(p))
+    return paths
+
+def test_batches_and_union(images):
+    pred = StubPredictor()
+    assert mask_frames(images, ["person"], batch_size=4, workers=2, predictor=pred, verbose=False) == 11
+    assert pred.batches == [4, 4, 3]
+    mask = cv2.imread(mask_path(images[0]), cv2.IMREAD_GRAYSCALE)
+    assert mask_path(images[0]).endswith("dynamic_mask_clutter_00.png")
+    assert (mask[:, :8] == 255).all() and (mask[:, 8:] == 0).all()
+    assert json.load(open(os.path.join(os.path.dirname(images[0]), MASK_INDEX_NAME))) == {"categories": ["person"]}
+    assert not [f for f in os.listdir(os.path.dirname(images[0])) if f.startswith(".")]  # no temporaries left
+
+def test_only_stale_masks_are_redone(images):
+    pred = StubPredictor()
+    mask_frames(images, ["person"], predictor=pred, verbose=False)
+    assert mask_frames(images, ["person"], predictor=pred, verbose=False) == 0
+
+    st = os.stat(mask_path(images[3]))
+    os.utime(images[3], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert mask_frames(images, ["person"], predictor=pred, verbose=False) == 1
+
+    # other categories invalidate every mask of the folder
+    assert mask_frames(images, ["car", "person"], predictor=pred, verbose=False) == 11
+    mask = cv2.imread(mask_path(images[5]), cv2.IMREAD_GRAYSCALE)
+    assert (mask[10:, :] == 255).all() and (mask[:10, 8:] == 0).all()
+
+def test_convert_masks_only_the_extra_frames(tmp_path, monkeypatch):
+    from test_incremental_state import write_scene
+    stub_categories(tmp_path, monkeypatch)
+    write_scene(tmp_path, 6)
+    monkeypatch.chdir(tmp_path)
+    colmap2nerf.convert("images", "model", "transforms.json", mask_categories=["person"], mask_predictor=StubPredictor(),
+                        sharpness_workers=1, verbose=False)
+    assert sorted(f for f in os.listdir("images") if f.startswith("dynamic_mask_") and f.endswith(".png")) == [
+        "dynamic_mask_extra_000.png", "dynamic_mask_extra_002.png", "dynamic_mask_extra_004.png"]
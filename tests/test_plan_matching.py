@@ -0,0 +1,74 @@
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from plan_matching import (PAIRS_NAME, PLAN_NAME, choose_matcher, matcher_command, prefix_of, retrieval_pairs,
+                           sequential_pairs)
+
+ROOT = Path(__file__).resolve().parents[1]
+
+def test_choose_matcher():
+    small = [f"clutter_{i:03d}.jpg" for i in range(10)]
+    one = [f"clutter_{i:04d}.jpg" for i in range(400)]
+    two = one[:200] + [f"extra_{i:04d}.jpg" for i in range(200)]
+    assert choose_matcher(small)[0] == "exhaustive"
+    assert choose_matcher(two, vocab_tree="tree.bin")[0] == "vocab_tree"
+    assert choose_matcher(one)[0] == "sequential"
+    assert choose_matcher(two)[0] == "pairs"
+
+def test_sequential_pairs_stay_within_a_capture():
+    names = [f"clutter_{i}.jpg" for i in range(5)] + [f"extra_{i}.jpg" for i in range(5)]
+    pairs = sequential_pairs(names, window=2)
+    assert len(pairs) == 2 * (4 + 3)
+    assert all(prefix_of(names[i]) == prefix_of(names[j]) and i < j for i, j in pairs)
+
+def test_retrieval_pairs():
+    rng = np.random.default_rng(0)
+    desc = rng.normal(size=(40, 16)).astype(np.float32)
+    desc /= np.linalg.norm(desc, axis=1, keepdims=True)
+    groups = np.repeat([0, 1], 20)
+    # a block smaller than N gives the same pairs
+    pairs = retrieval_pairs(desc, groups, k=3, cross_k=2, block=7)
+    assert pairs == retrieval_pairs(desc, groups, k=3, cross_k=2)
+    sims = desc @ desc.T
+    np.fill_diagonal(sims, -np.inf)
+    for i in range(40):
+        for j in np.argsort(-sims[i])[:3]:
+            assert (min(i, j), max(i, j)) in pairs
+        other = np.where(groups != groups[i], sims[i], -np.inf)
+        for j in np.argsort(-other)[:2]:
+            assert (min(i, j), max(i, j)) in pairs
+    assert len(pairs) < 40 * 39 // 2
+    # a single group has no cross pairs to add
+    assert retrieval_pairs(desc, np.zeros(40, int), k=3, cross_k=2) == retrieval_pairs(desc, np.zeros(40, int), k=3, cross_k=0)
+
+def test_matcher_command():
+    cmd = matcher_command("colmap", "pairs", Path("/s"), "0", 10, pairs_path=Path("/s/p.txt"))
+    assert cmd[:2] == ["colmap", "matches_importer"] and "--match_list_path" in cmd and cmd[-1] == "0"
+    with pytest.raises(ValueError):
+        matcher_command("colmap", "spatial", Path("/s"), "1", 10)
+
+def test_pairs_plan_dry_run(tmp_path):
+    cv2 = pytest.importorskip("cv2")
+    images = tmp_path / "images"
+    images.mkdir()
+    rng = np.random.default_rng(1)
+    for prefix in ("clutter_", "extra_"):
+        for i in range(12):
+            cv2.imwrite(str(images / f"{prefix}{i:03d}.jpg"), rng.integers(0, 255, (64, 64, 3), dtype=np.uint8))
+    proc = subprocess.run([sys.executable, str(ROOT / "plan_matching.py"), str(tmp_path), "--exhaustive_max", "10",
+                           "--window", "2", "--retrieval_k", "2", "--cross_k", "1", "--dry_run"],
+                          capture_output=True, text=True, env={"TELEMETRY_LOG": str(tmp_path / "t.jsonl"), "PATH": ""})
+    assert proc.returncode == 0, proc.stderr
+    plan = json.loads((tmp_path / PLAN_NAME).read_text())
+    assert plan["matcher"] == "pairs" and plan["images"] == 24
+    lines = (tmp_path / PAIRS_NAME).read_text().splitlines()
+    assert len(lines) == plan["pairs"] < plan["exhaustive_pairs"]
+    names = {p.name for p in images.iterdir()}
+    assert all(set(line.split()) <= names for line in lines)
+    assert any(prefix_of(a) != prefix_of(b) for a, b in map(str.split, lines))  # the captures are tied together
+    assert "matches_importer" in proc.stdout
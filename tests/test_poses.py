@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from colmap2nerf import poses_from_colmap, qvec2rotmat, qvec2rotmat_batch
+
+def random_poses(n, seed=0):
+    rng = np.random.default_rng(seed)
+    q = rng.normal(size=(n, 4))
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return q, rng.normal(0, 3, (n, 3))
+
+def baseline(qvec, tvec, keep_colmap_coords):
+    # the per-image loop colmap2nerf.py had before the batched pipeline
+    m = np.concatenate([np.concatenate([qvec2rotmat(-qvec), tvec.reshape([3, 1])], 1), [[0.0, 0.0, 0.0, 1.0]]], 0)
+    c2w = np.linalg.inv(m)
+    if not keep_colmap_coords:
+        c2w[0:3, 2] *= -1
+        c2w[0:3, 1] *= -1
+        c2w = c2w[[1, 0, 2, 3], :]
+        c2w[2, :] *= -1
+    return c2w
+
+def test_qvec2rotmat_batch():
+    q, _ = random_poses(20)
+    assert np.allclose(qvec2rotmat_batch(q), [qvec2rotmat(x) for x in q], rtol=0, atol=1e-15)
+
+@pytest.mark.parametrize("keep", [False, True])
+def test_matches_the_per_image_loop(keep):
+    q, t = random_poses(50, seed=1)
+    c2w = poses_from_colmap(q, t, keep)
+    assert c2w.shape == (50, 4, 4)
+    assert np.allclose(c2w, [baseline(a, b, keep) for a, b in zip(q, t)], rtol=0, atol=1e-12)
@@ -0,0 +1,69 @@
+import sys
+import json
+import threading
+import subprocess
+from types import SimpleNamespace
+
+import run_pipeline
+from atomic_io import LOCK_DIR, file_lock
+from run_pipeline import PipelineState, run_scene
+from telemetry import LOG_NAME
+
+STAGES = [("first", "io"), ("second", "cpu")]
+
+def pools():
+    return {p: threading.BoundedSemaphore(1) for p in ("colmap", "cpu", "io")}
+
+def fake_commands(monkeypatch, calls, fail=()):
+    def stage_command(stage, base, scene, args):
+        calls.append(stage)
+        return [sys.executable, "-c", f"print('{stage}'); raise SystemExit({1 if stage in fail else 0})"]
+    monkeypatch.setattr(run_pipeline, "stage_command", stage_command)
+
+def test_state_round_trip(tmp_path):
+    path = tmp_path / "state.json"
+    state = PipelineState(path)
+    state.record("s", "first", "done")
+    state.record("s", "second", "failed", returncode=3)
+    again = PipelineState(path)
+    assert again.is_done("s", "first")
+    assert not again.is_done("s", "second")
+    assert again.data["s"]["second"]["returncode"] == 3
+    again.reset("s")
+    assert not again.is_done("s", "first")
+
+def test_unreadable_state_is_ignored(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("{not json")
+    assert PipelineState(path).data == {}
+
+def test_resume_skips_finished_stages(tmp_path, monkeypatch):
+    base = tmp_path / "scene"
+    state = PipelineState(tmp_path / "state.json")
+    args = SimpleNamespace(colmap="colmap")
+
+    calls = []
+    fake_commands(monkeypatch, calls, fail={"second"})
+    assert not run_scene(base, STAGES, pools(), state, args)
+    assert calls == ["first", "second"]
+    saved = json.loads((tmp_path / "state.json").read_text())
+    assert saved["scene"]["first"]["status"] == "done"
+    assert saved["scene"]["second"] == dict(saved["scene"]["second"], status="failed", returncode=1)
+
+    calls.clear()
+    fake_commands(monkeypatch, calls)
+    assert run_scene(base, STAGES, pools(), PipelineState(tmp_path / "state.json"), args)
+    assert calls == ["second"]
+    log = (base / "scene-All" / "pose_log.txt").read_text()
+    assert log.count("second\n") == 2 and log.count("first\n") == 1
+    recs = [json.loads(line) for line in (base / "scene-All" / LOG_NAME).read_text().splitlines()]
+    assert [(r["stage"], r["phase"], r["status"]) for r in recs] == [
+        ("first", "total", "ok"), ("second", "total", "exit 1"), ("second", "total", "ok")]
+
+def test_second_runner_on_the_same_root_stops(tmp_path):
+    (tmp_path / "scene").mkdir()
+    with file_lock(tmp_path / LOCK_DIR / "run_pipeline.lock"):
+        proc = subprocess.run([sys.executable, run_pipeline.__file__, str(tmp_path)], capture_output=True, text=True)
+    assert proc.returncode == 1
+    assert "Another run_pipeline.py is running" in proc.stderr
+    assert not (tmp_path / "scene" / "scene-All").exists()
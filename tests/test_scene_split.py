@@ -0,0 +1,23 @@
+import json
+
+from scene_split import SPLIT_INDEX_NAME, SPLIT_NAME, frame_kinds, split_indices, write_split
+
+NAMES = ["./images/clutter_b.jpg", "./images/extra_a.jpg", "./images/clutter_a.jpg", "./images/other.jpg", "./images/extra_c.jpg"]
+
+def test_frame_kinds():
+    assert frame_kinds("images/clutter_0001.jpg") == ["all", "clutter"]
+    assert frame_kinds("images/0001.jpg") == ["all"]
+
+def test_split_indices():
+    assert split_indices(NAMES) == {"all": [0, 1, 2, 3, 4], "clutter": [0, 2], "extra": [1, 4]}
+    assert split_indices([]) == {"all": [], "clutter": [], "extra": []}
+
+def test_write_split(tmp_path):
+    split_path, index_path, counts = write_split(tmp_path, NAMES)
+    assert (split_path, index_path) == (tmp_path / SPLIT_NAME, tmp_path / SPLIT_INDEX_NAME)
+    assert counts == {"train": 2, "test": 2}
+    assert json.loads(split_path.read_text()) == {"train": ["clutter_a.jpg", "clutter_b.jpg"], "test": ["extra_a.jpg", "extra_c.jpg"]}
+    assert json.loads(index_path.read_text()) == {"num_frames": 5, "train": [0, 2], "test": [1, 4]}
+    # a precomputed index is used as given
+    write_split(tmp_path, NAMES, {"all": [], "clutter": [2], "extra": []})
+    assert json.loads(index_path.read_text())["train"] == [2]
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+import colmap2nerf
+from colmap2nerf import compute_sharpness, sharpness
+
+@pytest.fixture
+def images(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(6):
+        img = cv2.GaussianBlur(rng.integers(0, 255, (64, 80, 3), dtype=np.uint8), (0, 0), 0.5 + i)
+        p = tmp_path / f"{i}.jpg"
+        cv2.imwrite(str(p), img)
+        paths.append(str(p))
+    return paths
+
+def baseline(path):
+    return cv2.Laplacian(cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2GRAY), cv2.CV_64F).var()
+
+def test_scores_in_order(images):
+    scores = compute_sharpness(images, workers=3)
+    assert scores == [baseline(p) for p in images]
+    assert scores == sorted(scores, reverse=True)  # blurrier images score lower
+    reduced = compute_sharpness(images, reduce=2)
+    assert reduced == [cv2.Laplacian(cv2.imread(p, cv2.IMREAD_REDUCED_GRAYSCALE_2), cv2.CV_64F).var() for p in images]
+
+def test_cache(images, tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(colmap2nerf, "sharpness", lambda p, reduce=1: calls.append(p) or sharpness(p, reduce))
+    cache = str(tmp_path / "sharpness_cache.json")
+    first = compute_sharpness(images, cache_path=cache)
+    assert len(calls) == 6
+
+    calls.clear()
+    assert compute_sharpness(images, cache_path=cache) == first and calls == []
+
+    st = os.stat(images[2])
+    os.utime(images[2], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert compute_sharpness(images, cache_path=cache) == first and calls == [images[2]]
+
+    calls.clear()
+    compute_sharpness(images, reduce=4, cache_path=cache)  # another reduce factor is another score
+    assert len(calls) == 6
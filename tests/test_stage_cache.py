@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import types
+
+from stage_cache import MANIFEST_NAME, StageCache, fingerprint_files, fingerprint_tree, module_version, tool_versions
+
+def make_tree(root):
+    (root / "sub").mkdir(parents=True)
+    (root / "a.jpg").write_bytes(b"aaaa")
+    (root / "sub" / "b.JPG").write_bytes(b"bbbb")
+    (root / "notes.txt").write_text("x")
+    (root / "dynamic_mask_a.png").write_bytes(b"m")
+
+def test_fingerprint_tree_filters_and_tracks_changes(tmp_path):
+    make_tree(tmp_path)
+    fp = fingerprint_tree(tmp_path, exts={".jpg"})
+    assert fp["files"] == 2
+    assert fingerprint_tree(tmp_path, exts={".jpg", ".png"}, exclude_prefix=("dynamic_mask_",)) == fp
+
+    st = os.stat(tmp_path / "a.jpg")
+    os.utime(tmp_path / "a.jpg", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert fingerprint_tree(tmp_path, exts={".jpg"}) != fp
+    # content mode only sees the bytes
+    before = fingerprint_tree(tmp_path, content=True)
+    os.utime(tmp_path / "a.jpg", ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert fingerprint_tree(tmp_path, content=True) == before
+    (tmp_path / "a.jpg").write_bytes(b"aaab")
+    assert fingerprint_tree(tmp_path, content=True) != before
+
+def test_fingerprint_missing_inputs(tmp_path):
+    assert fingerprint_tree(tmp_path / "nope") == fingerprint_tree(tmp_path)
+    (tmp_path / "images.bin").write_bytes(b"1")
+    fp = fingerprint_files([tmp_path / "images.bin", tmp_path / "images.txt"])
+    assert fp["images.txt"] is None and fp["images.bin"] is not None
+
+def test_tool_versions_follow_the_script(tmp_path):
+    script = tmp_path / "stage.py"
+    script.write_text("print(1)\n")
+    v1 = tool_versions(script)
+    assert v1["stage.py"] is not None and "python" in v1
+    script.write_text("print(2)\n")
+    assert tool_versions(script)["stage.py"] != v1["stage.py"]
+
+def test_module_version_does_not_import(monkeypatch):
+    import importlib.metadata
+    code = "import sys, stage_cache; v = stage_cache.module_version('cv2'); print(v, 'cv2' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(__file__)),
+                         capture_output=True, text=True, check=True).stdout.split()
+    assert out[1] == "False"
+    import cv2
+    assert out[0].startswith(cv2.__version__.split(".")[0])
+    assert module_version("numpy") == importlib.metadata.version("numpy")
+    monkeypatch.setitem(sys.modules, "not_a_dist", types.SimpleNamespace(__version__="1.2"))
+    assert module_version("not_a_dist") == "1.2"
+    assert module_version("missing_module") is None
+    assert tool_versions(modules=["missing_module"])["missing_module"] is None
+
+def test_cache_invalidation(tmp_path, capsys):
+    out = tmp_path / "out.json"
+    cache = StageCache(tmp_path, "stage")
+    inputs = {"images": {"files": 2, "digest": "d1"}, "params": {"scale": 2}}
+    assert cache.reasons(inputs, [out]) == ["no previous run recorded"]
+
+    out.write_text("{}")
+    cache.record(inputs, [out])
+    assert (tmp_path / MANIFEST_NAME).is_file()
+    assert cache.check(inputs, [out])
+    assert not cache.check(inputs, [out], force=True)
+
+    assert StageCache(tmp_path, "other").reasons(inputs, [out]) == ["no previous run recorded"]
+    changed = {"images": {"files": 3, "digest": "d2"}, "tools": {}}
+    assert cache.reasons(changed, [out]) == ["images changed: digest, files", "input 'params' dropped", "new input 'tools'"]
+    assert cache.reasons(dict(inputs, params={"scale": 4}), [out]) == ["params changed: scale"]
+
+    out.unlink()
+    assert cache.reasons(inputs, [out]) == [f"output missing: {out}"]
+    capsys.readouterr()
+    assert not cache.check(inputs, [out], explain=True)
+    assert "rerun because output missing" in capsys.readouterr().out
+
+def test_corrupt_manifest_reruns(tmp_path):
+    (tmp_path / MANIFEST_NAME).write_text("{broken")
+    assert StageCache(tmp_path, "stage").reasons({}, []) == ["no previous run recorded"]
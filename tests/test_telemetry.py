@@ -0,0 +1,123 @@
+import json
+import os
+import sys
+
+import pytest
+
+from telemetry import ENV_LOG, LOG_NAME, Telemetry, find_logs, load_records, scene_name, summarize
+
+@pytest.fixture(autouse=True)
+def no_env_log(monkeypatch):
+    monkeypatch.delenv(ENV_LOG, raising=False)
+
+def test_phase_records(tmp_path):
+    log = tmp_path / LOG_NAME
+    tel = Telemetry(log, "040625-Bin", "colmap2nerf")
+    with tel.phase("sharpness", files=3) as rec:
+        rec["cached"] = 1
+    with pytest.raises(RuntimeError):
+        with tel.phase():
+            raise RuntimeError("boom")
+    with pytest.raises(SystemExit):
+        with tel.phase("exit"):
+            sys.exit(0)
+    first, second, third = load_records([log])
+    assert (first["scene"], first["stage"], first["phase"], first["status"]) == ("040625-Bin", "colmap2nerf", "sharpness", "ok")
+    assert (first["files"], first["cached"]) == (3, 1)
+    assert first["wall_s"] >= 0 and "peak_rss_mb" in first and "read_bytes" in first
+    assert (second["phase"], second["status"]) == ("total", "error")
+    assert third["status"] == "ok"
+
+def test_run_records_the_child(tmp_path):
+    log = tmp_path / LOG_NAME
+    tel = Telemetry(log, "s", "colmap")
+    assert tel.run([sys.executable, "-c", "pass"], "feature_extractor") == 0
+    assert tel.run([sys.executable, "-c", "raise SystemExit(3)"]) == 3
+    ok, bad = load_records([log])
+    assert (ok["phase"], ok["status"]) == ("feature_extractor", "ok")
+    assert ok["cmd"].endswith("-c pass")
+    assert bad["status"] == "exit 3" and bad["phase"] == os.path.basename(sys.executable)
+
+def test_env_log_wins_and_no_log_is_a_no_op(tmp_path, monkeypatch):
+    Telemetry(None).write({"phase": "x"})
+    monkeypatch.setenv(ENV_LOG, str(tmp_path / "shared.jsonl"))
+    Telemetry(tmp_path / "own.jsonl").write({"phase": "x"})
+    assert not (tmp_path / "own.jsonl").exists()
+    assert len(load_records([tmp_path / "shared.jsonl"])) == 1
+
+def test_scene_name(tmp_path):
+    assert scene_name(tmp_path / "040625-Bin" / "040625-Bin-All") == "040625-Bin"
+    assert scene_name(tmp_path / "040625-Bin") == "040625-Bin"
+
+def test_summarize_and_find_logs(tmp_path):
+    recs = [
+        {"scene": "a", "stage": "colmap", "phase": "total", "status": "ok", "wall_s": 10.0, "cpu_s": 30.0, "peak_rss_mb": 900.0},
+        {"scene": "a", "stage": "colmap2nerf", "phase": "total", "status": "error", "wall_s": 2.0, "cpu_s": 2.0, "peak_rss_mb": 100.0},
+        {"scene": "b", "stage": "colmap", "phase": "total", "status": "ok", "wall_s": 20.0, "cpu_s": 50.0, "peak_rss_mb": 800.0},
+        {"scene": "b", "stage": "colmap", "phase": "mapper", "status": "ok", "wall_s": 15.0},
+    ]
+    for scene in ("a", "b"):
+        d = tmp_path / scene / f"{scene}-All"
+        d.mkdir(parents=True)
+        (d / LOG_NAME).write_text("".join(json.dumps(r) + "\n" for r in recs if r["scene"] == scene) + "not json\n")
+    logs = find_logs([tmp_path])
+    assert len(logs) == 2
+    summary = summarize(load_records(logs), top=10)
+    assert summary["records"] == 4
+    assert [s["name"] for s in summary["scenes"]] == ["b", "a"]
+    assert summary["scenes"][1] == {"name": "a", "wall_s": 12.0, "cpu_s": 32.0, "peak_rss_mb": 900.0, "stages": 2, "errors": 1}
+    assert summary["stages"][0] == {"name": "colmap", "wall_s": 30.0, "cpu_s": 80.0, "runs": 2, "max_wall_s": 20.0, "peak_rss_mb": 900.0}
+    assert summary["phases"] == [{"name": "colmap:mapper", "wall_s": 15.0, "runs": 1}]
+    assert len(summarize(load_records(logs), top=1)["scenes"]) == 1
+
+def test_without_wait4_or_resource_only_wall_time_is_recorded(tmp_path, monkeypatch):
+    import telemetry
+    monkeypatch.delattr(os, "wait4")
+    monkeypatch.setattr(telemetry, "resource", None)
+    log = tmp_path / LOG_NAME
+    tel = Telemetry(log, "s", "colmap")
+    assert tel.run([sys.executable, "-c", "raise SystemExit(2)"], "mapper") == 2
+    with tel.phase("sharpness"):
+        pass
+    run, phase = load_records([log])
+    assert run["status"] == "exit 2" and run["wall_s"] >= 0
+    assert [run[k] for k in ("cpu_s", "peak_rss_mb", "read_bytes", "write_bytes")] == [None] * 4
+    assert phase["status"] == "ok" and phase["peak_rss_mb"] is None
+
+def test_summarize_treats_null_fields_as_zero():
+    recs = [{"scene": "a", "stage": "colmap", "phase": "total", "status": "ok", "wall_s": 3.0, "cpu_s": None, "peak_rss_mb": None},
+            {"scene": "a", "stage": "colmap", "phase": "mapper", "status": "ok", "wall_s": None}]
+    summary = summarize(recs)
+    assert summary["scenes"] == [{"name": "a", "wall_s": 3.0, "cpu_s": 0.0, "peak_rss_mb": 0.0, "stages": 1, "errors": 0}]
+    assert summary["phases"] == [{"name": "colmap:mapper", "wall_s": 0.0, "runs": 1}]
+
+def test_run_records_a_command_that_cannot_start(tmp_path):
+    log = tmp_path / LOG_NAME
+    tel = Telemetry(log, "s", "colmap")
+    assert tel.run([str(tmp_path / "no-such-colmap"), "mapper"], "mapper") == 127
+    (rec,) = load_records([log])
+    assert (rec["phase"], rec["status"], rec["cpu_s"]) == ("mapper", "exit 127", None)
+    assert rec["error"].startswith("FileNotFoundError")
+
+def test_run_leaves_no_unreaped_popen(tmp_path, monkeypatch):
+    import subprocess
+    procs = []
+    real = subprocess.Popen
+    monkeypatch.setattr(subprocess, "Popen", lambda *a, **kw: procs.append(real(*a, **kw)) or procs[-1])
+    assert Telemetry(tmp_path / LOG_NAME).run([sys.executable, "-c", "raise SystemExit(4)"]) == 4
+    assert procs[0].returncode == 4 and procs[0].poll() == 4
+
+def test_summarize_sums_the_phases_of_stages_without_a_total():
+    recs = [
+        {"scene": "a", "stage": "colmap", "phase": "feature_extractor_gpu", "status": "ok", "wall_s": 100.0, "cpu_s": 20.0, "peak_rss_mb": 300.0},
+        {"scene": "a", "stage": "colmap", "phase": "mapper", "status": "ok", "wall_s": 500.0, "cpu_s": 400.0, "peak_rss_mb": 700.0},
+        {"scene": "a", "stage": "colmap2nerf", "phase": "total", "status": "ok", "wall_s": 5.0, "cpu_s": 4.0, "peak_rss_mb": 200.0},
+        {"scene": "a", "stage": "colmap2nerf", "phase": "sharpness", "status": "ok", "wall_s": 3.0},
+        {"scene": "b", "stage": "colmap", "phase": "mapper", "status": "exit 1", "wall_s": 50.0},
+        {"scene": None, "stage": "create_meta_data", "phase": "dataset", "status": "ok", "wall_s": 9.0},
+    ]
+    summary = summarize(recs)
+    assert summary["scenes"][0] == {"name": "a", "wall_s": 605.0, "cpu_s": 424.0, "peak_rss_mb": 700.0, "stages": 2, "errors": 0}
+    assert summary["scenes"][1] == {"name": "b", "wall_s": 50.0, "cpu_s": 0.0, "peak_rss_mb": 0.0, "stages": 1, "errors": 1}
+    assert [g["name"] for g in summary["stages"]] == ["colmap", "colmap2nerf"]
+    assert summary["stages"][0]["wall_s"] == 650.0 and summary["stages"][0]["runs"] == 2
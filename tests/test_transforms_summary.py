@@ -0,0 +1,43 @@
+import json
+import os
+
+import pytest
+
+from transforms_summary import SUMMARY_NAME, count_frames, count_frames_stream, summary_count, write_summary
+
+def tricky_doc(n):
+    # brackets and escaped quotes inside strings, a nested "frames" key before the real one
+    return {
+        "camera": {"frames": [[1], [2], [3]], "note": 'a "[quoted]" {brace} \\'},
+        "frames": [{"file_path": f'./images/x_{i}\\"[{{.jpg', "transform_matrix": [[i, 0], [0, 1]]} for i in range(n)],
+        "after": [{"not": "a frame"}],
+    }
+
+@pytest.mark.parametrize("n", [0, 1, 7])
+@pytest.mark.parametrize("chunk", [1, 3, 64, 1 << 20])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_stream_count_matches_json(tmp_path, n, chunk, indent):
+    p = tmp_path / "transforms.json"
+    doc = tricky_doc(n)
+    p.write_text(json.dumps(doc, indent=indent))
+    assert json.loads(p.read_text())["frames"] == doc["frames"]
+    assert count_frames_stream(p, chunk=chunk) == n
+
+def test_missing_frames_key(tmp_path):
+    p = tmp_path / "transforms.json"
+    p.write_text(json.dumps({"w": 1, "list": [{}, {}]}))
+    assert count_frames_stream(p) == 0
+
+def test_sidecar_is_used_until_the_file_changes(tmp_path):
+    p = tmp_path / "transforms.json"
+    p.write_text(json.dumps(tricky_doc(3)))
+    assert summary_count(p) is None
+
+    write_summary(tmp_path, {"all": p}, {"all": 99})  # deliberately wrong to see which path is taken
+    assert json.loads((tmp_path / SUMMARY_NAME).read_text())["files"]["transforms.json"]["frames"] == 99
+    assert count_frames(p) == 99
+
+    st = os.stat(p)
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert summary_count(p) is None
+    assert count_frames(p) == 3
@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+from PIL import Image
+
+from colmap2nerf import write_transforms
+from scene_split import write_split
+from validate_dataset import validate_scene
+
+NAMES = ["clutter_0.jpg", "clutter_1.jpg", "extra_0.jpg", "extra_1.jpg"]
+
+def make_scene(root, names=NAMES, inputs=NAMES, size=(32, 24)):
+    base = root / "040625-Bin"
+    scene = base / "040625-Bin-All"
+    for folder, files in (("images", inputs), ("undistortion_images", names)):
+        (scene / folder).mkdir(parents=True)
+        for n in files:
+            Image.new("RGB", size).save(scene / folder / n)
+    frames = [{"file_path": f"./undistortion_images/{n}", "sharpness": 1.0, "transform_matrix": np.eye(4)} for n in names]
+    write_transforms(str(scene / "transforms.json"), {"w": float(size[0]), "h": float(size[1])}, frames)
+    write_split(scene, [f["file_path"] for f in frames])
+    return base, scene
+
+def test_consistent_scene_is_ok(tmp_path):
+    base, _ = make_scene(tmp_path)
+    report = validate_scene(base, probe_workers=2)
+    assert report["status"] == "ok", report
+    assert report["counts"]["transforms"] == 4
+    assert report["counts"]["registered_clutter"] == report["counts"]["inputs_clutter"] == 2
+    assert report["unregistered"] == []
+    assert report["undistorted_images"]["sizes"] == {"32x24": 4}
+
+def test_low_registration_warns(tmp_path):
+    base, _ = make_scene(tmp_path, names=NAMES[:3], inputs=NAMES)
+    report = validate_scene(base, probe_workers=2)
+    assert report["status"] == "warn"
+    assert report["unregistered"] == ["extra_1.jpg"]
+    assert report["warnings"] == ["only 3/4 all images registered", "only 1/2 extra images registered"]
+
+def test_inconsistent_artifacts_fail(tmp_path):
+    base, scene = make_scene(tmp_path)
+    (scene / "split.json").write_text(json.dumps({"train": ["clutter_0.jpg", "extra_0.jpg"], "test": ["extra_0.jpg"]}))
+    (scene / "split_index.json").write_text(json.dumps({"num_frames": 3, "train": [0], "test": [2]}))
+    subset = json.loads((scene / "transforms_extra.json").read_text())
+    subset["frames"] = subset["frames"][:1]
+    (scene / "transforms_extra.json").write_text(json.dumps(subset))
+    Image.new("RGB", (16, 16)).save(scene / "undistortion_images" / "extra_1.jpg")
+    report = validate_scene(base, probe_workers=2)
+    assert report["status"] == "fail"
+    errors = "\n".join(report["errors"])
+    for part in ("transforms_extra.json (1 frames) does not match",
+                 "1 train entries missing 'clutter_'",
+                 "1 images are in both train and test",
+                 "split_index.json is not aligned",
+                 "undistorted_images: mismatched sizes",
+                 "!= camera 32x24"):
+        assert part in errors
+
+def test_missing_scene_folder(tmp_path):
+    report = validate_scene(tmp_path / "040625-Bin")
+    assert report["status"] == "fail" and "scene folder not found" in report["errors"][0]
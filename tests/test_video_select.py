@@ -0,0 +1,60 @@
+import io
+import sys
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+from colmap2nerf import iter_ppm_frames, select_frames, stream_select_frames
+
+def frame(i, sharp):
+    """Flat gray frame, with a checkerboard of contrast `sharp` (sharper = higher Laplacian variance)."""
+    img = np.full((32, 48, 3), 100, np.uint8)
+    img[::2, ::2] += np.uint8(sharp)
+    img[0, 0] = i  # tells the frames apart
+    return img
+
+def ppm(img):
+    h, w = img.shape[:2]
+    return b"P6\n%d %d\n255\n" % (w, h) + img.tobytes()
+
+SHARPNESS = [1, 9, 3, 2, 8, 1, 5, 7, 0, 6, 4]
+
+def test_iter_ppm_frames():
+    frames = [frame(i, s) for i, s in enumerate(SHARPNESS)]
+    out = list(iter_ppm_frames(io.BytesIO(b"".join(map(ppm, frames)))))
+    assert len(out) == len(frames) and all((a == b).all() for a, b in zip(out, frames))
+    with pytest.raises(ValueError):
+        list(iter_ppm_frames(io.BytesIO(ppm(frames[0])[:-5])))
+
+def test_window_and_topk():
+    frames = [frame(i, s) for i, s in enumerate(SHARPNESS)]
+    # the sharpest of every 3 consecutive frames, and the tail group
+    assert [i for i, _, _ in select_frames(iter(frames), "window", per_window=3, reduce=1)] == [1, 4, 7, 9]
+    top = list(select_frames(iter(frames), "topk", topk=3, reduce=1))
+    assert [i for i, _, _ in top] == [1, 4, 7]  # the 3 sharpest, in stream order
+    assert all(isinstance(jpeg, bytes) and jpeg[:2] == b"\xff\xd8" for _, _, jpeg in top)
+
+def test_stream_select_frames(tmp_path):
+    # an ffmpeg stand-in writing the frames as image2pipe PPM to stdout
+    script = tmp_path / "fake_ffmpeg.py"
+    script.write_text(
+        "import sys, numpy as np\n"
+        f"sys.path.insert(0, {str(tmp_path)!r})\n"
+        "from frames import make\n"
+        "sys.stdout.buffer.write(make())\n")
+    (tmp_path / "frames.py").write_text(
+        "import numpy as np\n"
+        f"S = {SHARPNESS!r}\n"
+        "def make():\n"
+        "    out = b''\n"
+        "    for i, s in enumerate(S):\n"
+        "        img = np.full((32, 48, 3), 100, np.uint8); img[::2, ::2] += np.uint8(s); img[0, 0] = i\n"
+        "        out += b'P6\\n48 32\\n255\\n' + img.tobytes()\n"
+        "    return out\n")
+    out = tmp_path / "images"
+    out.mkdir()
+    assert stream_select_frames([sys.executable, str(script)], str(out), "window", per_window=3, reduce=1, workers=2) == 4
+    assert sorted(p.name for p in out.iterdir()) == ["0001.jpg", "0002.jpg", "0003.jpg", "0004.jpg"]
+    assert stream_select_frames([sys.executable, str(script)], str(tmp_path), "topk", topk=2, reduce=1) == 2
+    assert (tmp_path / "0002.jpg").exists() and (tmp_path / "0005.jpg").exists()  # candidates 1 and 4, numbered from 1
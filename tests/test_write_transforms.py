@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pytest
+
+from colmap2nerf import transforms_paths, write_pose_npz, write_transforms
+
+HEADER = {"camera_angle_x": 0.9, "w": 640.0, "h": 480.0, "aabb_scale": 32}
+NAMES = ["./images/a.jpg", "./images/clutter_b.jpg", "./images/extra_c.jpg", "./images/d.jpg"]
+
+def make_frames(seed=0):
+    rng = np.random.default_rng(seed)
+    return [{"file_path": name, "sharpness": float(rng.uniform(10, 500)), "transform_matrix": rng.normal(size=(4, 4))}
+            for name in NAMES]
+
+def reference(header, frames):
+    # what the old code dumped: the whole dict at once
+    out = dict(header)
+    out["frames"] = [dict(f, transform_matrix=np.asarray(f["transform_matrix"]).tolist()) for f in frames]
+    return json.dumps(out, indent=2)
+
+def test_default_layout_is_byte_identical(tmp_path):
+    out = str(tmp_path / "transforms.json")
+    frames = make_frames()
+    index = write_transforms(out, HEADER, frames)
+    assert index == {"all": [0, 1, 2, 3], "clutter": [1], "extra": [2]}
+    paths = transforms_paths(out)
+    with open(paths["all"]) as f:
+        assert f.read() == reference(HEADER, frames)
+    with open(paths["clutter"]) as f:
+        assert f.read() == reference(HEADER, [frames[1]])
+    with open(paths["extra"]) as f:
+        assert f.read() == reference(HEADER, [frames[2]])
+
+def test_empty_subset_is_valid_json(tmp_path):
+    out = str(tmp_path / "transforms.json")
+    frames = [make_frames()[0]]
+    write_transforms(out, HEADER, iter(frames))
+    with open(transforms_paths(out)["extra"]) as f:
+        assert f.read() == reference(HEADER, [])
+
+def test_compact_and_precision(tmp_path):
+    out = str(tmp_path / "transforms.json")
+    frames = make_frames()
+    write_transforms(out, HEADER, frames, compact=True, precision=4)
+    with open(out) as f:
+        text = f.read()
+    assert "\n" not in text
+    data = json.loads(text)
+    assert {k: v for k, v in data.items() if k != "frames"} == HEADER
+    for got, want in zip(data["frames"], frames):
+        assert got["file_path"] == want["file_path"]
+        assert got["sharpness"] == round(want["sharpness"], 4)
+        assert got["transform_matrix"] == np.round(want["transform_matrix"], 4).tolist()
+
+def test_compact_without_precision_round_trips(tmp_path):
+    out = str(tmp_path / "transforms.json")
+    frames = make_frames()
+    write_transforms(out, HEADER, frames, compact=True)
+    with open(out) as f:
+        assert json.load(f) == json.loads(reference(HEADER, frames))
+
+def test_pose_npz(tmp_path):
+    out = str(tmp_path / "transforms.json")
+    frames = make_frames()
+    c2w = np.stack([f["transform_matrix"] for f in frames])
+    npz_path = write_pose_npz(out, c2w, NAMES, [f["sharpness"] for f in frames])
+    assert npz_path == str(tmp_path / "transforms.npz")
+    with np.load(npz_path) as z:
+        assert np.array_equal(z["transform_matrix"], c2w)
+        assert list(z["file_path"]) == NAMES
+        assert z["sharpness"] == pytest.approx([f["sharpness"] for f in frames])
+        assert list(z["clutter_index"]) == [1]
+        assert list(z["extra_index"]) == [2]
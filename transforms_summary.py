@@ -0,0 +1,90 @@
+import re
+import json
+from pathlib import Path
+
+from atomic_io import write_json_atomic
+
+# ---------- config ----------
+SUMMARY_NAME = "transforms_summary.json"
+READ_CHUNK = 1 << 20
+
+# structural bytes of a JSON document; everything else (numbers, plain string content) is skipped
+_TOKENS = re.compile(rb'[\[\]{}"\\]')
+_FRAMES_KEY = re.compile(rb'"frames"\s*:\s*$')
+
+# ---------- sidecar ----------
+def _stat_key(path: Path):
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+def write_summary(out_dir, paths: dict, counts: dict) -> Path:
+    """
+    Write out_dir/transforms_summary.json: frame count of every transforms*.json written
+    (paths: kind -> path, counts: kind -> frames) plus their size/mtime, so a reader can tell
+    whether the summary still describes the files on disk.
+    """
+    files = {}
+    for kind, p in paths.items():
+        p = Path(p)
+        files[p.name] = {"kind": kind, "frames": int(counts[kind]), "stat": _stat_key(p)}
+    out = Path(out_dir) / SUMMARY_NAME
+    write_json_atomic(out, {"files": files})
+    return out
+
+def summary_count(json_path: Path):
+    """Frame count of json_path from the sidecar next to it, None if absent or stale."""
+    json_path = Path(json_path)
+    try:
+        files = json.loads((json_path.parent / SUMMARY_NAME).read_text(encoding="utf-8"))["files"]
+        rec = files[json_path.name]
+        if rec["stat"] == _stat_key(json_path):
+            return rec["frames"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+# ---------- streaming ----------
+def count_frames_stream(json_path: Path, chunk: int = READ_CHUNK) -> int:
+    """
+    Number of elements of the top-level "frames" array, found by scanning the structural bytes
+    chunk by chunk (no document is built). Stops at the end of the array.
+    """
+    depth, in_str, in_frames, count = 0, False, False, 0
+    skip = -1   # absolute offset of a character escaped by a backslash
+    base, tail = 0, b""
+    with open(json_path, "rb") as f:
+        while True:
+            buf = f.read(chunk)
+            if not buf:
+                break
+            for m in _TOKENS.finditer(buf):
+                pos = base + m.start()
+                if pos == skip:
+                    continue
+                c = m.group()
+                if in_str:
+                    if c == b"\\":
+                        skip = pos + 1
+                    elif c == b'"':
+                        in_str = False
+                    continue
+                if c == b'"':
+                    in_str = True
+                elif c in (b"{", b"["):
+                    if depth == 1 and c == b"[" and not in_frames and _FRAMES_KEY.search((tail + buf[:m.start()])[-64:]):
+                        in_frames = True
+                    elif in_frames and depth == 2:
+                        count += 1
+                    depth += 1
+                else:
+                    depth -= 1
+                    if in_frames and depth == 1:
+                        return count
+            tail = (tail + buf)[-64:]
+            base += len(buf)
+    return count
+
+def count_frames(json_path: Path) -> int:
+    """Frame count of a transforms*.json: sidecar summary when it is current, else a streaming scan."""
+    n = summary_count(json_path)
+    return n if n is not None else count_frames_stream(json_path)
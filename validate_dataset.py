@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from atomic_io import write_json_atomic
+from image_probe import IMG_EXTS, probe_images
+from scene_split import SPLIT_KEYWORDS, SPLIT_ROLES, SPLIT_NAME, SPLIT_INDEX_NAME, split_indices
+
+# ---------- config ----------
+REPORT_NAME = "validation_report.json"
+MIN_REGISTERED = 0.9      # warn when fewer input images than this made it into transforms.json
+PROBE_WORKERS = 16
+
+# ---------- helpers ----------
+def load_json(path: Path):
+    """(data, None) or (None, reason) for a missing or unreadable file."""
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f), None
+    except FileNotFoundError:
+        return None, "missing"
+    except (OSError, ValueError) as e:
+        return None, f"unreadable ({type(e).__name__}: {e})"
+
+def image_names(folder: Path) -> list:
+    """Image file names in folder (no masks), sorted; empty if the folder does not exist."""
+    try:
+        with os.scandir(folder) as it:
+            return sorted(e.name for e in it if e.is_file() and not e.name.startswith(("dynamic_mask_", "."))
+                          and os.path.splitext(e.name)[1].lower() in IMG_EXTS)
+    except FileNotFoundError:
+        return []
+
+def frame_names(transforms: dict) -> list:
+    return [os.path.basename(f["file_path"]) for f in transforms.get("frames", [])]
+
+def size_histogram(folder: Path, names: list, workers: int) -> dict:
+    """Header-only probe of every image: {"sizes": {WxH: n}, "rotated": n, "errors": [...]}"""
+    infos = probe_images([folder / n for n in names], workers)
+    sizes = Counter(f"{i['w']}x{i['h']}" for i in infos if "error" not in i)
+    return {
+        "sizes": dict(sizes.most_common()),
+        "rotated": sum(1 for i in infos if i.get("orientation", 1) != 1),
+        "errors": [f"{n}: {i['error']}" for n, i in zip(names, infos) if "error" in i],
+    }
+
+# ---------- checks ----------
+def check_images(report: dict, scene: Path, transforms, probe_workers: int):
+    """Input images (make_all output) and undistorted images: uniform size, EXIF, match the camera."""
+    for key, folder in (("input_images", scene / "images"), ("undistorted_images", scene / "undistortion_images")):
+        names = image_names(folder)
+        report["counts"][key] = len(names)
+        if not names:
+            report["errors"].append(f"{key}: no images in {folder}")
+            continue
+        hist = size_histogram(folder, names, probe_workers)
+        report[key] = hist
+        if len(hist["sizes"]) > 1:
+            report["errors"].append(f"{key}: mismatched sizes {hist['sizes']}")
+        if hist["rotated"]:
+            report["warnings"].append(f"{key}: {hist['rotated']} images with EXIF orientation != 1")
+        report["errors"].extend(f"{key}: {e}" for e in hist["errors"])
+
+    if transforms is not None and "w" in transforms and report.get("undistorted_images", {}).get("sizes"):
+        cam = f"{int(transforms['w'])}x{int(transforms['h'])}"
+        if set(report["undistorted_images"]["sizes"]) != {cam}:
+            report["errors"].append(f"undistorted image size {list(report['undistorted_images']['sizes'])} != camera {cam} in transforms.json")
+
+def check_registration(report: dict, scene: Path, frames: list, min_registered: float):
+    """Frames in transforms.json vs images fed to COLMAP, overall and per kind."""
+    inputs = image_names(scene / "images")
+    if not inputs:
+        return
+    registered = set(frames)
+    missing_frames = sorted(set(frames) - set(inputs))
+    if missing_frames:
+        report["errors"].append(f"{len(missing_frames)} frames have no input image (e.g. {missing_frames[0]})")
+    in_idx, fr_idx = split_indices(inputs), split_indices(frames)
+    for kind in ["all", *SPLIT_KEYWORDS]:
+        n_in, n_reg = len(in_idx[kind]), len(fr_idx[kind])
+        report["counts"][f"registered_{kind}"] = n_reg
+        report["counts"][f"inputs_{kind}"] = n_in
+        if n_in and n_reg / n_in < min_registered:
+            report["warnings"].append(f"only {n_reg}/{n_in} {kind} images registered")
+    report["unregistered"] = [n for n in inputs if n not in registered]
+    uncategorized = [frames[i] for i in set(fr_idx["all"]) - set().union(*(fr_idx[k] for k in SPLIT_KEYWORDS))]
+    if uncategorized:
+        report["warnings"].append(f"{len(uncategorized)} frames are neither {' nor '.join(SPLIT_KEYWORDS)} (e.g. {uncategorized[0]})")
+
+def check_subsets(report: dict, scene: Path, frames: list):
+    """transforms_<kind>.json hold exactly the frames of transforms.json with that keyword, in order."""
+    expected = split_indices(frames)
+    for kind in SPLIT_KEYWORDS:
+        data, err = load_json(scene / f"transforms_{kind}.json")
+        if err:
+            report["errors"].append(f"transforms_{kind}.json {err}")
+            continue
+        got = frame_names(data)
+        report["counts"][f"transforms_{kind}"] = len(got)
+        if got != [frames[i] for i in expected[kind]]:
+            report["errors"].append(f"transforms_{kind}.json ({len(got)} frames) does not match the "
+                                    f"{len(expected[kind])} {kind} frames of transforms.json")
+
+def check_split(report: dict, scene: Path, frames):
+    """split.json keywords, disjointness and agreement with the frames; split_index.json alignment."""
+    split, err = load_json(scene / SPLIT_NAME)
+    if err:
+        report["errors"].append(f"{SPLIT_NAME} {err}")
+        return
+    names = {}
+    for role, kind in SPLIT_ROLES.items():
+        names[role] = split.get(role, [])
+        report["counts"][f"split_{role}"] = len(names[role])
+        wrong = [n for n in names[role] if SPLIT_KEYWORDS[kind] not in n]
+        if wrong:
+            report["errors"].append(f"{len(wrong)} {role} entries missing '{SPLIT_KEYWORDS[kind]}' (e.g. {wrong[0]})")
+    both = set(names["train"]) & set(names["test"])
+    if both:
+        report["errors"].append(f"{len(both)} images are in both train and test")
+    if frames is None:
+        return
+
+    expected = split_indices(frames)
+    for role, kind in SPLIT_ROLES.items():
+        if sorted(names[role]) != sorted(frames[i] for i in expected[kind]):
+            report["errors"].append(f"{SPLIT_NAME} {role} ({len(names[role])}) != {kind} frames of transforms.json ({len(expected[kind])})")
+    index, err = load_json(scene / SPLIT_INDEX_NAME)
+    if err:
+        report["warnings"].append(f"{SPLIT_INDEX_NAME} {err}")
+        return
+    if index.get("num_frames") != len(frames) or any(index.get(role) != expected[kind] for role, kind in SPLIT_ROLES.items()):
+        report["errors"].append(f"{SPLIT_INDEX_NAME} is not aligned with transforms.json")
+
+def validate_scene(base: Path, probe_workers: int = PROBE_WORKERS, min_registered: float = MIN_REGISTERED) -> dict:
+    """All checks of one scene; every artifact is read once."""
+    scene = base / f"{base.name}-All"
+    report = {"scene": base.name, "path": str(scene), "errors": [], "warnings": [], "counts": {}}
+    if not scene.is_dir():
+        report["errors"].append(f"scene folder not found: {scene}")
+    else:
+        transforms, err = load_json(scene / "transforms.json")
+        frames = None
+        if err:
+            report["errors"].append(f"transforms.json {err}")
+        else:
+            frames = frame_names(transforms)
+            report["counts"]["transforms"] = len(frames)
+            check_registration(report, scene, frames, min_registered)
+            check_subsets(report, scene, frames)
+        check_split(report, scene, frames)
+        check_images(report, scene, transforms, probe_workers)
+    report["status"] = "fail" if report["errors"] else ("warn" if report["warnings"] else "ok")
+    return report
+
+def find_scenes(root: Path) -> list:
+    return sorted(p for p in root.iterdir() if p.is_dir() and (p / f"{p.name}-All").is_dir())
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="Validate every scene under a dataset root (split, image sizes, registration, "
+                                             "clutter/extra coverage) and write one JSON report")
+    ap.add_argument("root", type=Path, nargs="?", default=Path("."))
+    ap.add_argument("--scenes", nargs="*", default=None, help="Only these scene folder names")
+    ap.add_argument("--workers", type=int, default=None, help="Scenes validated in parallel (default: CPU count)")
+    ap.add_argument("--probe_workers", type=int, default=PROBE_WORKERS, help="Header-probe threads per scene")
+    ap.add_argument("--min_registered", type=float, default=MIN_REGISTERED, help="Warn below this registered/input ratio")
+    ap.add_argument("--out", type=Path, default=None, help=f"Report path (default: ROOT/{REPORT_NAME})")
+    args = ap.parse_args()
+
+    root = args.root.resolve()
+    bases = find_scenes(root)
+    if args.scenes is not None:
+        bases = [b for b in bases if b.name in set(args.scenes)]
+    if not bases:
+        sys.exit(f"No scenes found under {root}")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        reports = list(ex.map(validate_scene, bases, [args.probe_workers] * len(bases), [args.min_registered] * len(bases)))
+
+    status = Counter(r["status"] for r in reports)
+    out = {
+        "root": str(root),
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "summary": {"scenes": len(reports), **{s: status.get(s, 0) for s in ("ok", "warn", "fail")}},
+        "scenes": {r["scene"]: r for r in reports},
+    }
+    out_path = args.out or root / REPORT_NAME
+    write_json_atomic(out_path, out)
+
+    for r in reports:
+        for e in r["errors"]:
+            print(f"[{r['scene']}] ❌ {e}")
+        for w in r["warnings"]:
+            print(f"[{r['scene']}] ⚠️  {w}")
+    print()
+    print("================ SUMMARY ================")
+    print(f"OK:        {status.get('ok', 0)}")
+    print(f"Warnings:  {status.get('warn', 0)}")
+    print(f"Failed:    {status.get('fail', 0)}")
+    for r in reports:
+        if r["status"] == "fail":
+            print(f"  ✖ {r['scene']}")
+    print(f"Report: {out_path}")
+    if status.get("fail"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()